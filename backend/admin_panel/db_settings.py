@@ -0,0 +1,119 @@
+"""
+admin_panel/db_settings.py
+Database settings helpers:
+- default_database: the 'default' alias (Django auth, sessions, admin, jobs). DEFAULT_DB_ENGINE=postgres
+  points it at PostgreSQL (DEFAULT_DB_* falling back to POSTGRES_*), optionally in its own schema
+  (DEFAULT_DB_SCHEMA) on the Supabase database; otherwise SQLite (sqlite_database).
+- sqlite_database: SQLite in WAL mode with a busy timeout and BEGIN IMMEDIATE transactions, so
+  concurrent workers wait for the write lock instead of failing with "database is locked".
+  Data is moved from SQLite to PostgreSQL with python manage.py migrate_default_db.
+
+Connection settings applied to every alias in DATABASES at the end of settings.py
+(after local_settings, so its DATABASES is covered too):
+- persistent connections: CONN_MAX_AGE / CONN_HEALTH_CHECKS (DB_CONN_MAX_AGE, DB_CONN_HEALTH_CHECKS)
+- Django's native psycopg connection pool for PostgreSQL aliases (DB_POOL, DB_POOL_*)
+- routing the aliases listed in DB_POOLER_ALIASES (default: supabase) through the Supavisor
+  pooler (docker/volumes/db/pooler.sql) when DB_POOLER_HOST is set; other aliases, such as a
+  PostgreSQL default alias with a search_path startup option, keep their direct connection
+
+The native pool and persistent connections are mutually exclusive in Django, so
+CONN_MAX_AGE is forced to 0 when DB_POOL is enabled.
+"""
+
+import os
+from typing import Any, Dict
+
+POSTGRESQL_ENGINE = 'django.db.backends.postgresql'
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() == 'true'
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def sqlite_database(name) -> Dict[str, Any]:
+    """تنظیمات SQLite با WAL (خواندن همزمان با نوشتن) و انتظار برای قفل نوشتن به جای خطا"""
+    return {
+        'ENGINE': SQLITE_ENGINE,
+        'NAME': name,
+        'OPTIONS': {
+            'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 20),
+            # قفل نوشتن در ابتدای تراکنش گرفته می‌شود؛ ارتقای قفل خواندن به نوشتن در میانه تراکنش بدون انتظار شکست می‌خورد
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    }
+
+
+def default_database(base_dir) -> Dict[str, Any]:
+    """تنظیمات alias پیش‌فرض بر اساس DEFAULT_DB_ENGINE (sqlite یا postgres)"""
+    engine = os.environ.get('DEFAULT_DB_ENGINE', 'sqlite').lower()
+    if engine not in ('postgres', 'postgresql'):
+        return sqlite_database(os.environ.get('DEFAULT_DB_PATH') or base_dir / 'db.sqlite3')
+
+    config = {
+        'ENGINE': POSTGRESQL_ENGINE,
+        'NAME': os.environ.get('DEFAULT_DB_NAME') or os.getenv('POSTGRES_DB', 'postgres'),
+        'USER': os.environ.get('DEFAULT_DB_USER') or os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DEFAULT_DB_PASSWORD') or os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('DEFAULT_DB_HOST') or os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('DEFAULT_DB_PORT') or os.getenv('POSTGRES_PORT', '5432'),
+    }
+    schema = os.environ.get('DEFAULT_DB_SCHEMA')
+    if schema:
+        # جداول Django در schema جداگانه ساخته می‌شوند و با جداول public در Supabase تداخل ندارند
+        config['OPTIONS'] = {'options': f'-c search_path={schema}'}
+    return config
+
+
+def _route_through_pooler(config: Dict[str, Any]) -> None:
+    """اتصال به Supavisor به جای Postgres؛ نام کاربر به شکل user.tenant"""
+    config['HOST'] = os.environ['DB_POOLER_HOST']
+    config['PORT'] = os.environ.get('DB_POOLER_PORT', '6543')
+    tenant = os.environ.get('POOLER_TENANT_ID')
+    user = config.get('USER', '')
+    if tenant and not user.endswith(f".{tenant}"):
+        config['USER'] = f"{user}.{tenant}"
+    # در حالت transaction پایگاه داده پشت pooler بین تراکنش‌ها عوض می‌شود و cursor سمت سرور معتبر نمی‌ماند
+    # (prepared statementها در psycopg 3 به صورت پیش‌فرض در Django غیرفعال هستند)
+    config['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+def apply_connection_settings(databases: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    اعمال تنظیمات اتصال پایدار / استخر اتصال روی DATABASES
+    مقادیری که صریحاً در DATABASES تنظیم شده‌اند (مثلاً در local_settings) تغییر نمی‌کنند
+    """
+    conn_max_age = _env_int('DB_CONN_MAX_AGE', 60)
+    health_checks = _env_bool('DB_CONN_HEALTH_CHECKS', True)
+    use_pool = _env_bool('DB_POOL', False)
+    # فقط aliasهای این فهرست از Supavisor عبور می‌کنند؛ حالت transaction پارامترهای startup (مانند search_path) را نگه نمی‌دارد
+    pooler_aliases = {
+        alias.strip() for alias in os.environ.get('DB_POOLER_ALIASES', 'supabase').split(',') if alias.strip()
+    } if os.environ.get('DB_POOLER_HOST') else set()
+
+    for alias, config in databases.items():
+        config.setdefault('CONN_HEALTH_CHECKS', health_checks)
+        if config.get('ENGINE') != POSTGRESQL_ENGINE:
+            config.setdefault('CONN_MAX_AGE', conn_max_age)
+            continue
+
+        if alias in pooler_aliases:
+            _route_through_pooler(config)
+
+        options = config.setdefault('OPTIONS', {})
+        if use_pool and 'pool' not in options:
+            options['pool'] = {
+                'min_size': _env_int('DB_POOL_MIN_SIZE', 2),
+                'max_size': _env_int('DB_POOL_MAX_SIZE', 10),
+                'timeout': _env_int('DB_POOL_TIMEOUT', 10),
+            }
+        if options.get('pool'):
+            config['CONN_MAX_AGE'] = 0
+        else:
+            config.setdefault('CONN_MAX_AGE', conn_max_age)
+    return databases
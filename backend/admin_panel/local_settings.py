@@ -6,15 +6,14 @@
 import os
 from pathlib import Path
 
+from .db_settings import default_database
+
 # مسیر اصلی پروژه - مشابه تعریف در settings.py
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # تنظیمات پایگاه داده با استفاده از Kong
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    },
+    'default': default_database(BASE_DIR),
     'supabase': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'postgres',
@@ -0,0 +1,148 @@
+"""
+admin_panel/logging_config.py
+LOGGING for settings.py, with the volume chosen per environment:
+- LOG_LEVEL: root/console level (default DEBUG when DJANGO_DEBUG is on, otherwise INFO)
+- LOG_FORMAT: text or json (one JSON object per line, for log shippers)
+- LOG_ASYNC: records are handed to a queue and written by a background thread
+  (QueueListenerHandler), so the request thread never blocks on log I/O
+- LOG_BODY_MAX_CHARS / LOG_SAMPLE_RATE: read by console/log.py for request/response bodies
+
+As with the stdlib QueueHandler, the message (%-style arguments and console/log.py previews)
+and the traceback are rendered when the record is queued, so arguments mutated or closed later by
+the request do not change what is logged; the formatter and the stream write run on the listener thread.
+"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict
+
+# صفات استاندارد LogRecord؛ بقیه صفات (extra=...) به عنوان فیلدهای ساختاریافته در خروجی json می‌آیند
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_DEFAULT_FORMATTER = logging.Formatter()
+
+
+class JSONFormatter(logging.Formatter):
+    """هر رکورد یک خط JSON با زمان، سطح، logger، پیام و فیلدهای extra"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler که رکوردها را بدون قالب‌بندی در صف می‌گذارد و یک QueueListener با StreamHandler
+    آن‌ها را در thread جداگانه قالب‌بندی و روی stderr می‌نویسد
+    listener پس از fork شدن worker (gunicorn --preload) دوباره ساخته می‌شود
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # قالب‌بندی روی thread شنونده انجام می‌شود
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._listener is not None and self._pid == pid:
+            return
+        with self._start_lock:
+            if self._listener is None or self._pid != pid:
+                self.queue = queue.SimpleQueue()
+                self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=False)
+                self._listener.start()
+                self._pid = pid
+
+    def prepare(self, record):
+        # مانند QueueHandler: پیام و traceback در thread درخواست ساخته می‌شوند تا args و exc_info
+        # (که ممکن است بعداً تغییر کنند یا قابل pickle نباشند) به thread شنونده نرسند؛ قالب خط در شنونده اعمال می‌شود
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.target.formatter or _DEFAULT_FORMATTER).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+
+
+def build_logging(debug: bool) -> Dict[str, Any]:
+    """تنظیمات LOGGING بر اساس متغیرهای محیطی"""
+    level = os.environ.get('LOG_LEVEL', 'DEBUG' if debug else 'INFO').upper()
+    log_format = os.environ.get('LOG_FORMAT', 'text').lower()
+    use_queue = os.environ.get('LOG_ASYNC', 'True').lower() == 'true'
+
+    handler: Dict[str, Any] = {'formatter': 'json' if log_format == 'json' else 'verbose'}
+    if use_queue:
+        handler['()'] = 'admin_panel.logging_config.QueueListenerHandler'
+    else:
+        handler['class'] = 'logging.StreamHandler'
+
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'verbose': {
+                'format': '{levelname} {asctime} {name} {message}',
+                'style': '{',
+            },
+            'json': {
+                '()': 'admin_panel.logging_config.JSONFormatter',
+            },
+        },
+        'handlers': {
+            'console': handler,
+        },
+        'loggers': {
+            'django': {
+                'handlers': ['console'],
+                'level': 'INFO' if level == 'DEBUG' else level,
+                'propagate': False,
+            },
+            # کتابخانه‌های HTTP در سطح DEBUG هر اتصال و هدر را لاگ می‌کنند
+            'urllib3': {'level': 'WARNING'},
+            'httpx': {'level': 'WARNING'},
+            'httpcore': {'level': 'WARNING'},
+        },
+        'root': {
+            'handlers': ['console'],
+            'level': level,
+        },
+    }
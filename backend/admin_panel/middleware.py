@@ -1,102 +1,165 @@
+"""
+admin_panel/middleware.py
+Project middleware:
+- CustomCsrfMiddleware: CSRF exemption for the login and /api/users/ paths (prefix tuple and
+  regex compiled once at import time).
+- SessionRefreshMiddleware: sliding session expiry without a write on every request; an
+  accessed session is saved again only once settings.SESSION_REFRESH_FRACTION of
+  SESSION_COOKIE_AGE has passed since its last save (SESSION_SAVE_EVERY_REQUEST is off).
+- RequestTracingMiddleware: opt-in request tracing. Disabled (removed from the middleware chain
+  by Django) unless settings.REQUEST_TRACE_SAMPLE_RATE > 0; when enabled, a sampled fraction of
+  /api/ and admin requests gets one record with method, path, status and duration. The user is
+  only reported when the view already loaded it, so tracing never causes a session/user query.
+SessionRefreshMiddleware and RequestTracingMiddleware are sync and async capable: under ASGI they
+run on the event loop instead of forcing Django to adapt the chain through a thread.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils.deprecation import MiddlewareMixin
-from django.views.decorators.csrf import csrf_exempt
 import logging
+import random
 import re
+import time
 
 logger = logging.getLogger(__name__)
 
+# مسیرهایی که باید از بررسی CSRF معاف شوند
+CSRF_EXEMPT_PREFIXES = (
+    '/backend/admin/login/',
+    '/api/auth/login/',
+    '/admin/login/',
+)
+# الگوی مسیرهایی که باید معاف شوند (تمام زیرمسیرهای /api/users/)
+CSRF_EXEMPT_RE = re.compile(r'^/api/users/')
+UNSAFE_METHODS = frozenset({'POST', 'PUT', 'DELETE', 'PATCH'})
+
+# مسیرهایی که ردیابی می‌شوند
+TRACED_PATH_RE = re.compile(r'^/(?:api/|admin|backend/(?:api/|admin))')
+
+
 class CustomCsrfMiddleware(MiddlewareMixin):
     """
     میدل‌ور سفارشی برای مدیریت CSRF در مسیرهای خاص
     """
     def process_view(self, request, callback, callback_args, callback_kwargs):
-        # مسیرهایی که باید از بررسی CSRF معاف شوند
-        exempt_exact_paths = [
-            '/backend/admin/login/',
-            '/api/auth/login/',
-            '/admin/login/',
-        ]
-        
-        # الگوهای regex برای مسیرهایی که باید معاف شوند
-        exempt_patterns = [
-            r'^/api/users/.*$',  # تمام زیرمسیرهای /api/users/
-        ]
-        
-        # اگر مسیر درخواست دقیقاً در لیست معاف‌ها باشد، CSRF بررسی نشود
-        if any(request.path.startswith(path) for path in exempt_exact_paths) or any(re.match(pattern, request.path) for pattern in exempt_patterns):
-            logger.debug(f"مسیر {request.path} از بررسی CSRF معاف شد")
-            setattr(request, '_dont_enforce_csrf_checks', True)
+        path = request.path
+        # اگر مسیر درخواست با یکی از مسیرهای معاف شروع شود یا با الگو تطابق داشته باشد، CSRF بررسی نشود
+        if path.startswith(CSRF_EXEMPT_PREFIXES) or CSRF_EXEMPT_RE.match(path):
+            logger.debug("مسیر %s از بررسی CSRF معاف شد", path)
+            request._dont_enforce_csrf_checks = True
             return None
-            
-        # لاگ کردن اطلاعات CSRF برای دیباگ
-        if request.method in ('POST', 'PUT', 'DELETE', 'PATCH'):
-            logger.debug(f"CSRF token in cookie: {request.COOKIES.get('csrftoken', 'None')}")
-            logger.debug(f"CSRF token in header: {request.META.get('HTTP_X_CSRFTOKEN', 'None')}")
-            
+
+        # لاگ کردن وجود توکن CSRF برای دیباگ (بدون مقدار توکن)
+        if request.method in UNSAFE_METHODS and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "CSRF token برای %s: cookie=%s header=%s", path,
+                'csrftoken' in request.COOKIES, 'HTTP_X_CSRFTOKEN' in request.META,
+            )
+
         # در غیر این صورت، بگذارید میدل‌ور بعدی آن را پردازش کند
         return None
-    
-    def process_response(self, request, response):
-        # از تنظیم هدرهای CORS خودداری می‌کنیم چون در nginx تنظیم شده‌اند
-        # فقط لاگ می‌کنیم برای دیباگ
-        if re.match(r'^/(api|backend)/', request.path):
-            # لاگ کردن هدرهای موجود
-            logger.debug(f"Response headers for {request.path}: {dict(response.headers)}")
-                
-            # بررسی Origin برای دیباگ
-            origin = request.META.get('HTTP_ORIGIN')
-            if origin:
-                logger.debug(f"Origin header: {origin}")
-        
+
+
+class _SyncAndAsyncMiddleware:
+    """پایه میدل‌ورهای sync و async؛ با get_response ناهمگام __call__ یک coroutine برمی‌گرداند"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.handle(request, await self.get_response(request))
+
+    def handle(self, request, response):
+        raise NotImplementedError
+
+
+class SessionRefreshMiddleware(_SyncAndAsyncMiddleware):
+    """
+    تمدید لغزان سشن؛ باید پس از SessionMiddleware در MIDDLEWARE بیاید تا پیش از ذخیره سشن اجرا شود
+    سشن‌هایی که در این درخواست خوانده نشده‌اند بارگذاری نمی‌شوند (بدون I/O، در حالت async هم روی event loop اجرا می‌شود)
+    """
+    REFRESHED_AT_KEY = '_session_refreshed_at'
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        fraction = float(getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1))
+        self.refresh_after = max(fraction, 0) * settings.SESSION_COOKIE_AGE
+
+    def handle(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return response
+        if settings.SESSION_EXPIRE_AT_BROWSER_CLOSE:
+            return response
+
+        now = int(time.time())
+        refreshed_at = session.get(self.REFRESHED_AT_KEY)
+        # سشن تغییر کرده به هر حال ذخیره می‌شود؛ زمان آخرین ذخیره هم‌زمان ثبت می‌شود
+        if session.modified or not isinstance(refreshed_at, int) or now - refreshed_at >= self.refresh_after:
+            # تغییر سشن باعث می‌شود SessionMiddleware آن را ذخیره و انقضای کوکی را تمدید کند
+            session[self.REFRESHED_AT_KEY] = now
         return response
 
-class SessionDebugMiddleware(MiddlewareMixin):
+
+class RequestTracingMiddleware(_SyncAndAsyncMiddleware):
     """
-    میدل‌ور برای دیباگ اطلاعات سشن و احراز هویت
-    همچنین تنظیم مسیر درخواست با توجه به هدر X-Script-Name
+    ردیابی نمونه‌ای درخواست‌ها
+    با REQUEST_TRACE_SAMPLE_RATE=0 (پیش‌فرض) MiddlewareNotUsed برمی‌گرداند و Django آن را از زنجیره حذف می‌کند
     """
-    def process_request(self, request):
-        # لاگ کردن اطلاعات درخواست مرتبط با مسیر admin
-        if request.path.startswith('/admin') or request.path.startswith('/backend/admin'):
-            logger.debug(f"درخواست به مسیر ادمین: {request.path}")
-            logger.debug(f"وضعیت احراز هویت: {request.user.is_authenticated}")
-            logger.debug(f"کوکی‌های درخواست: {request.COOKIES}")
-            logger.debug(f"هدرهای درخواست: {dict(request.headers)}")
-            
-            # لاگ هدر X-Script-Name اگر موجود باشد
-            if 'HTTP_X_SCRIPT_NAME' in request.META:
-                logger.debug(f"X-Script-Name هدر: {request.META['HTTP_X_SCRIPT_NAME']}")
-            
-            if hasattr(request, 'session'):
-                logger.debug(f"کلیدهای سشن: {list(request.session.keys())}")
-        
-        # لاگ کردن اطلاعات درخواست برای مسیرهای API نیز
-        if request.path.startswith('/api/'):
-            logger.debug(f"درخواست API: {request.path}, متد: {request.method}")
-            logger.debug(f"وضعیت احراز هویت: {request.user.is_authenticated}")
-            logger.debug(f"کوکی‌های درخواست: {request.COOKIES}")
-            if 'HTTP_X_CSRFTOKEN' in request.META:
-                logger.debug(f"CSRF Token در هدر: {request.META['HTTP_X_CSRFTOKEN']}")
-            
-        return None
-    
-    def process_response(self, request, response):
-        # لاگ کردن اطلاعات پاسخ مرتبط با مسیر admin
-        if request.path.startswith('/admin') or request.path.startswith('/backend/admin'):
-            logger.debug(f"پاسخ به مسیر ادمین: {request.path}")
-            logger.debug(f"هدرهای پاسخ: {dict(response.headers)}")
-            logger.debug(f"کوکی‌های پاسخ: {response.cookies}")
-            logger.debug(f"کد وضعیت: {response.status_code}")
-            
-            # لاگ کردن مسیر ریدایرکت اگر موجود باشد
-            if 'Location' in response:
-                logger.debug(f"مسیر ریدایرکت: {response['Location']}")
-        
-        # لاگ کردن اطلاعات پاسخ API
-        if request.path.startswith('/api/'):
-            logger.debug(f"پاسخ API: {request.path}, کد وضعیت: {response.status_code}")
-            logger.debug(f"هدرهای پاسخ: {dict(response.headers)}")
-            if 'Set-Cookie' in response:
-                logger.debug(f"کوکی‌های تنظیم شده: {response['Set-Cookie']}")
-        
-        return response 
\ No newline at end of file
+    def __init__(self, get_response):
+        self.sample_rate = float(getattr(settings, 'REQUEST_TRACE_SAMPLE_RATE', 0) or 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def _sampled(self, request) -> bool:
+        if not TRACED_PATH_RE.match(request.path):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled(request):
+            return self.get_response(request)
+        started = time.perf_counter()
+        return self.handle(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        if not self._sampled(request):
+            return await self.get_response(request)
+        started = time.perf_counter()
+        return self.handle(request, await self.get_response(request), started)
+
+    def handle(self, request, response, started):
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        # کاربر فقط اگر view قبلاً آن را بارگذاری کرده باشد گزارش می‌شود (بدون کوئری اضافه سشن/کاربر)
+        user = getattr(request, '_cached_user', None)
+        trace = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': duration_ms,
+            'user': getattr(user, 'pk', None) if user is not None and user.is_authenticated else None,
+            'script_name': request.META.get('HTTP_X_SCRIPT_NAME'),
+        }
+        if 'Location' in response:
+            trace['location'] = response['Location']
+        logger.info(
+            "%s %s -> %s (%sms)", trace['method'], trace['path'], trace['status'], duration_ms,
+            extra={'trace': trace},
+        )
+        return response
@@ -4,12 +4,25 @@ Project settings for Django admin_panel:
 - CORS configuration to allow requests from React dev server
 - CSRF and session cookie settings for cross-site auth in development
 - REST framework default auth/permission classes enforcing session auth
+- CONSOLE_ROW_CACHE row cache backend and optional Redis CACHES (REDIS_URL)
+- CONSOLE_ASYNC_VIEWS toggle for the async channel/user views (ASGI)
+- CONSOLE_REPOSITORY data-access backend (PostgREST or direct SQL on the supabase alias)
+- default database: SQLite in WAL mode or PostgreSQL via DEFAULT_DB_ENGINE (admin_panel/db_settings.py)
+- persistent DB connections / psycopg pool / Supavisor routing (admin_panel/db_settings.py)
+- JOBS background job queue (jobs app, run_jobs worker command)
+- LOGGING built per environment by admin_panel/logging_config.py (LOG_LEVEL, LOG_FORMAT, LOG_ASYNC)
+- PASSWORD_HASHER (pbkdf2 or argon2) and LOGIN_USER_CACHE for the super admin login (console/login.py)
+- SESSION_BACKEND/SESSION_ENGINE and SESSION_REFRESH_FRACTION (sliding expiry, no write per request)
+- REQUEST_TRACE_SAMPLE_RATE for the opt-in RequestTracingMiddleware (off by default)
 """
 
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from .db_settings import apply_connection_settings, default_database
+from .logging_config import build_logging
+
 # Load environment variables
 load_dotenv()
 
@@ -64,9 +77,12 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_PATH = '/'
 SESSION_COOKIE_DOMAIN = None
 SESSION_COOKIE_NAME = 'sessionid'
-SESSION_SAVE_EVERY_REQUEST = True  # ذخیره سشن در هر درخواست
+# سشن فقط هنگام تغییر یا تمدید لغزان (SessionRefreshMiddleware) ذخیره می‌شود، نه در هر درخواست
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_AGE = 1209600  # دو هفته
+# سشن فعال پس از گذشت این کسر از SESSION_COOKIE_AGE از آخرین ذخیره دوباره ذخیره و تمدید می‌شود
+SESSION_REFRESH_FRACTION = float(os.environ.get('SESSION_REFRESH_FRACTION', '0.1'))
 
 CSRF_COOKIE_SAMESITE = 'Lax'  # بازگشت به Lax برای محیط توسعه
 CSRF_COOKIE_SECURE = False
@@ -81,40 +97,11 @@ CSRF_FAILURE_VIEW = 'django.views.csrf.csrf_failure'
 # امکان درخواست به ادمین بدون CSRF
 CSRF_EXEMPT_PATHS = ['/admin/login/', '/api/auth/login/']
 
-# بهبود پیکربندی لاگینگ
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-    },
-    'handlers': {
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-    },
-    'loggers': {
-        'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
-            'propagate': True,
-        },
-        'admin_panel': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
-        },
-    },
-    'root': {
-        'handlers': ['console'],
-        'level': 'DEBUG',
-    },
-}
+# پیکربندی لاگینگ (سطح، قالب text/json و نوشتن غیرهمزمان از طریق صف) از متغیرهای محیطی
+LOGGING = build_logging(DEBUG)
+
+# نسبت درخواست‌های /api/ و ادمین که ردیابی می‌شوند (0 = غیرفعال، 1 = همه)
+REQUEST_TRACE_SAMPLE_RATE = float(os.environ.get('REQUEST_TRACE_SAMPLE_RATE', '0'))
 
 # تنظیمات احراز هویت
 AUTHENTICATION_BACKENDS = [
@@ -137,19 +124,22 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     'rest_framework',
     'console',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     # "corsheaders.middleware.CorsMiddleware",  # حذف شده چون CORS توسط nginx مدیریت می‌شود
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "admin_panel.middleware.SessionRefreshMiddleware",
     "django.middleware.common.CommonMiddleware",
     "admin_panel.middleware.CustomCsrfMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "admin_panel.middleware.SessionDebugMiddleware",
+    # فقط با REQUEST_TRACE_SAMPLE_RATE > 0 فعال می‌شود
+    "admin_panel.middleware.RequestTracingMiddleware",
 ]
 
 ROOT_URLCONF = "admin_panel.urls"
@@ -177,10 +167,8 @@ WSGI_APPLICATION = "admin_panel.wsgi.application"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    },
+    # SQLite (WAL) یا PostgreSQL با DEFAULT_DB_ENGINE=postgres (admin_panel/db_settings.py)
+    'default': default_database(BASE_DIR),
     'supabase': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'postgres'),
@@ -212,6 +200,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# hasher رمزهای جدید: pbkdf2 (پیش‌فرض Django) یا argon2 (نیاز به argon2-cffi)
+# hashهای قدیمی همچنان بررسی می‌شوند و در ورود بعدی سوپر ادمین با hasher اول بازنویسی می‌شوند (console/login.py)
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2').lower()
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
+# cache نگاشت سوپر ادمین به کاربر Django در ورود (alias از CACHES، TTL به ثانیه)
+LOGIN_USER_CACHE = {
+    'ALIAS': os.environ.get('LOGIN_USER_CACHE_ALIAS', 'default'),
+    'TTL': int(os.environ.get('LOGIN_USER_CACHE_TTL', '300')),
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -258,8 +265,74 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Redis به عنوان cache مشترک workerها در صورت تنظیم REDIS_URL
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# cache سطرهای کانال و کاربر (console/cache.py)
+# BACKEND: memory (داخل هر worker)، django (alias از CACHES، مثلاً Redis) یا none
+# حذف سطرها پس از نوشتن فقط به cache همان worker می‌رسد، پس memory فقط برای یک worker پیش‌فرض است؛
+# با REDIS_URL پیش‌فرض django (مشترک بین workerها) و در غیر این صورت none است
+if REDIS_URL:
+    _DEFAULT_ROW_CACHE_BACKEND = 'django'
+elif int(os.environ.get('GUNICORN_WORKERS', '3')) == 1:
+    _DEFAULT_ROW_CACHE_BACKEND = 'memory'
+else:
+    _DEFAULT_ROW_CACHE_BACKEND = 'none'
+CONSOLE_ROW_CACHE = {
+    'BACKEND': os.environ.get('CONSOLE_ROW_CACHE_BACKEND', _DEFAULT_ROW_CACHE_BACKEND),
+    'ALIAS': os.environ.get('CONSOLE_ROW_CACHE_ALIAS', 'default'),
+    'TTL': int(os.environ.get('CONSOLE_ROW_CACHE_TTL', '30')),
+    'MAX_ENTRIES': int(os.environ.get('CONSOLE_ROW_CACHE_MAX_ENTRIES', '1024')),
+}
+
+# موتور سشن: db، cached_db (خواندن از CACHES و نوشتن در پایگاه داده)، cache (فقط CACHES، مثلاً Redis)
+# یا signed_cookies (بدون ذخیره در سرور)؛ پیش‌فرض cached_db با Redis و در غیر این صورت db
+# cache داخل هر worker (locmem) بین workerها مشترک نیست، پس cached_db و cache فقط با REDIS_URL استفاده شوند
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db' if REDIS_URL else 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}.get(SESSION_BACKEND, SESSION_BACKEND)
+
+# مسیرهای async کانال‌ها و کاربران (console/async_views.py) برای اجرای ASGI با uvicorn
+CONSOLE_ASYNC_VIEWS = os.environ.get('CONSOLE_ASYNC_VIEWS', 'False').lower() == 'true'
+
+# backend دسترسی به داده کانال‌ها و کاربران در console/views.py
+# BACKEND: rest (Kong/PostgREST) یا direct (SQL مستقیم روی alias پایگاه داده، پیش‌فرض supabase)
+CONSOLE_REPOSITORY = {
+    'BACKEND': os.environ.get('CONSOLE_REPOSITORY_BACKEND', 'rest'),
+    'ALIAS': os.environ.get('CONSOLE_REPOSITORY_ALIAS', 'supabase'),
+}
+
+# کلید جایگشت شناسه‌های 7 رقمی کانال و سوپر ادمین (console/ids.py)؛ پس از صدور شناسه‌ها نباید تغییر کند
+# در صورت خالی بودن از SECRET_KEY استفاده می‌شود
+CONSOLE_PUBLIC_ID_KEY = os.environ.get('CONSOLE_PUBLIC_ID_KEY', '')
+
+# صف کارهای پس‌زمینه روی alias پیش‌فرض (jobs/)؛ worker با python manage.py run_jobs اجرا می‌شود
+# ENABLED: تغییرات عضویت هنگام ساخت/حذف کانال و کاربر در صف اجرا می‌شوند و API پاسخ 202 با شناسه کار برمی‌گرداند
+# RETRY_DELAY: تأخیر پایه تلاش دوباره (ثانیه، نمایی)، LOCK_TIMEOUT: پس از این مدت کار در حال اجرا دوباره قابل برداشت است
+JOBS = {
+    'ENABLED': os.environ.get('JOBS_ENABLED', 'False').lower() == 'true',
+    'MAX_ATTEMPTS': int(os.environ.get('JOBS_MAX_ATTEMPTS', '5')),
+    'RETRY_DELAY': float(os.environ.get('JOBS_RETRY_DELAY', '5')),
+    'LOCK_TIMEOUT': float(os.environ.get('JOBS_LOCK_TIMEOUT', '300')),
+    'POLL_INTERVAL': float(os.environ.get('JOBS_POLL_INTERVAL', '1')),
+}
+
 # وارد کردن تنظیمات محلی
 try:
     from .local_settings import *
 except ImportError:
     pass
+
+# اتصال پایدار یا استخر اتصال برای همه aliasها (پس از local_settings تا DATABASES آن هم پوشش داده شود)
+apply_connection_settings(DATABASES)
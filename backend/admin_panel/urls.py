@@ -3,6 +3,7 @@ admin_panel/urls.py
 Root URL configuration for the Django project:
 - /admin/ → Django admin interface
 - /api/   → API endpoints from console app
+- /api/jobs/ → background job status (jobs app)
 """
 
 from django.contrib import admin
@@ -19,6 +20,8 @@ urlpatterns = [
     # Django admin site
     path('admin/login/', AdminLoginView.as_view(), name='admin_login'),
     path('admin/', admin.site.urls),
+    # Background job status
+    path('api/jobs/', include('jobs.urls')),
     # Console app API routes
     path('api/', include('console.urls')),
 ]
@@ -0,0 +1,97 @@
+"""
+console/async_client.py
+Async counterpart of console/transport.py for the ASGI list/export views (console/async_views.py):
+- get_client: pooled keep-alive httpx.AsyncClient, one per event loop.
+- request: sends a request through the shared client with the default timeouts.
+- make_request: same contract as views._make_request (None on error, True on an empty
+  success body, parsed JSON otherwise).
+Writes are not sent from here; the async views delegate them to the DRF viewsets.
+
+Pool size, keep-alive and timeouts reuse the SUPABASE_HTTP_* settings of transport.py.
+Under uvicorn every worker runs one event loop, so each worker keeps a single pool.
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import transport
+from .log import Preview
+
+logger = logging.getLogger(__name__)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=transport.POOL_SIZE,
+        max_keepalive_connections=transport.POOL_SIZE if transport.KEEPALIVE else 0,
+        keepalive_expiry=transport.KEEPALIVE_IDLE,
+    )
+    timeout = httpx.Timeout(transport.READ_TIMEOUT, connect=transport.CONNECT_TIMEOUT)
+    return httpx.AsyncClient(
+        base_url=transport.BASE_URL,
+        limits=limits,
+        timeout=timeout,
+        transport=httpx.AsyncHTTPTransport(retries=transport.MAX_RETRIES),
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    بازگرداندن AsyncClient مشترک event loop فعلی
+    اتصال‌های httpx به event loop سازنده وابسته هستند، بنابراین هر loop استخر خود را دارد
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_client()
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """بستن AsyncClient مربوط به event loop فعلی"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    ارسال درخواست از طریق AsyncClient مشترک
+    اگر url با / شروع شود، به BASE_URL اضافه می‌شود
+    """
+    return await get_client().request(method, url, **kwargs)
+
+
+async def make_request(method: str, path: str, data: Optional[Any] = None,
+                       headers: Optional[Dict[str, str]] = None) -> Optional[Any]:
+    """
+    ارسال درخواست به Supabase API (نسخه async از views._make_request)
+    headers: هدرهای کامل درخواست (شامل هدرهای service role)
+    """
+    try:
+        logger.debug("ارسال درخواست async %s به %s", method, path)
+        response = await request(method, path, headers=headers, json=data)
+
+        if response.status_code >= 400:
+            logger.error("خطا در درخواست به Supabase: %s - %s", response.status_code, Preview(response.text))
+            return None
+
+        # اگر درخواست موفق بود و پاسخ خالی است، True برگردان
+        if response.status_code in [200, 201, 204] and not response.text.strip():
+            return True
+
+        try:
+            return response.json()
+        except ValueError:
+            return True
+    except Exception as e:
+        logger.error("خطا در ارسال درخواست async به Supabase: %s", e)
+        return None
+
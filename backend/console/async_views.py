@@ -0,0 +1,179 @@
+"""
+console/async_views.py
+Async (ASGI) entry points for the channel and user endpoints:
+- channel_collection / user_collection: GET lists natively on the event loop (pooled httpx.AsyncClient
+  from console/async_client.py); POST is delegated to the DRF viewset.
+- channel_export / user_export: streamed exports without holding a thread for the whole download.
+- channel_detail / user_detail: delegated to the DRF viewsets.
+
+Only the list and export reads are implemented here. Every other operation (retrieve, create, update,
+destroy) runs the ChannelViewSet/UserViewSet code through sync_to_async, so validation, the repository
+backend, UnitOfWork, the job queue, the row cache and the quota behave exactly as under WSGI.
+With CONSOLE_REPOSITORY_BACKEND other than rest the lists are delegated as well.
+They are routed in console/urls.py when CONSOLE_ASYNC_VIEWS is enabled.
+"""
+
+import asyncio
+import logging
+from functools import wraps
+from typing import Any
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from . import async_client
+from .export import astream_table
+from .log import Preview
+from .pagination import KeysetPagination, PaginationError, parse_fields, select_clause
+from .repository import get_repository
+from .views import ChannelViewSet, UserViewSet, _service_headers
+
+logger = logging.getLogger(__name__)
+
+_channel_collection_view = ChannelViewSet.as_view({'get': 'list', 'post': 'create'})
+_channel_detail_view = ChannelViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+_user_collection_view = UserViewSet.as_view({'get': 'list', 'post': 'create'})
+_user_detail_view = UserViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+
+
+def _response(data: Any, status: int = 200) -> JsonResponse:
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def _login_required(view):
+    """معادل SessionAuthentication + IsAuthenticated در viewset ها"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return _response({"detail": "Authentication credentials were not provided."}, status=403)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _method_not_allowed(request) -> JsonResponse:
+    return _response({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+
+async def _delegate(view, request, **kwargs):
+    """اجرای view همگام DRF در thread؛ پاسخ را Django پس از بازگشت render می‌کند"""
+    return await sync_to_async(view)(request, **kwargs)
+
+
+def _native_lists() -> bool:
+    """لیست‌ها فقط برای backend rest مستقیماً روی event loop از PostgREST خوانده می‌شوند"""
+    return get_repository().backend == 'rest'
+
+
+async def _list(request, table: str, pagination: KeysetPagination) -> JsonResponse:
+    """
+    نسخه async از views._list_response برای backend rest
+    خطای شبکه، timeout یا پاسخ نامعتبر PostgREST مانند نسخه همگام به پاسخ JSON تبدیل می‌شود
+    """
+    try:
+        return await _fetch_list(request, table, pagination)
+    except PaginationError as e:
+        return _response({"detail": str(e)}, status=400)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error("خطا در دریافت %s از Supabase: %r", table, e)
+        return _response({"detail": f"Error fetching {table} from Supabase API"}, status=502)
+    except Exception:
+        logger.exception("خطا در دریافت %s از Supabase", table)
+        return _response({"detail": f"Error fetching {table} from Supabase API"}, status=500)
+
+
+async def _fetch_list(request, table: str, pagination: KeysetPagination) -> JsonResponse:
+    query_params = request.GET
+    if not pagination.is_requested(query_params):
+        fields = parse_fields(query_params.get('fields'))
+        path = f"/rest/v1/{table}?select={select_clause(fields)}" if fields else f"/rest/v1/{table}"
+        response = await async_client.make_request('GET', path, headers=_service_headers())
+        if not isinstance(response, list):
+            logger.warning("پاسخی از Supabase REST API دریافت نشد")
+            return _response([])
+        return _response(response)
+
+    page = pagination.parse(query_params)
+    query, extra_headers = pagination.build_query(page)
+    requests_to_send = [async_client.request('GET', f"/rest/v1/{table}?{query}", headers=_service_headers(extra_headers))]
+    if page.count and page.cursor:
+        count_query, count_headers = pagination.count_query(page)
+        requests_to_send.append(
+            async_client.request('HEAD', f"/rest/v1/{table}?{count_query}", headers=_service_headers(count_headers))
+        )
+    # صفحه و شمارش کل مستقل از هم هستند
+    responses = await asyncio.gather(*requests_to_send)
+    response = responses[0]
+    if response.status_code >= 400:
+        logger.error("خطا در دریافت صفحه %s از Supabase: %s - %s", table, response.status_code, Preview(response.text))
+        return _response({"detail": f"Error fetching {table} from Supabase API"}, status=502)
+
+    rows = response.json()
+    if not isinstance(rows, list):
+        raise ValueError(f"unexpected {table} page body: {type(rows).__name__}")
+    total = None
+    if page.count:
+        total = pagination.parse_total(responses[-1].headers.get('Content-Range'))
+    return _response(pagination.page_body(page, rows, total))
+
+
+async def _export(request, table: str, pagination: KeysetPagination):
+    """نسخه async از views._export_response (پارامتر format=ndjson|csv)"""
+    export_format = request.GET.get('format') or 'ndjson'
+    if export_format not in ('ndjson', 'csv'):
+        return _response({"detail": "Not found."}, status=404)
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except PaginationError as e:
+        return _response({"detail": str(e)}, status=400)
+
+    response = await astream_table(table, export_format, fields, _service_headers(), pagination.ordering)
+    if response is None:
+        return _response({"detail": f"Error exporting {table} from Supabase API"}, status=502)
+    return response
+
+
+# ---------------------------------------------------------------- channels
+
+async def channel_collection(request):
+    """GET: لیست کانال‌ها، POST: ایجاد کانال (ChannelViewSet.create)"""
+    if request.method == 'GET' and _native_lists():
+        return await _login_required(_list)(request, 'channels', ChannelViewSet.keyset_pagination)
+    return await _delegate(_channel_collection_view, request)
+
+
+@_login_required
+async def channel_export(request):
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    return await _export(request, 'channels', ChannelViewSet.keyset_pagination)
+
+
+async def channel_detail(request, pk):
+    """دریافت، به‌روزرسانی و حذف کانال (ChannelViewSet)"""
+    return await _delegate(_channel_detail_view, request, pk=str(pk))
+
+
+# ------------------------------------------------------------------- users
+
+async def user_collection(request):
+    """GET: لیست کاربران، POST: ایجاد کاربر (UserViewSet.create)"""
+    if request.method == 'GET' and _native_lists():
+        return await _list(request, 'users', UserViewSet.keyset_pagination)
+    return await _delegate(_user_collection_view, request)
+
+
+async def user_export(request):
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    return await _export(request, 'users', UserViewSet.keyset_pagination)
+
+
+async def user_detail(request, pk):
+    """دریافت، به‌روزرسانی و حذف کاربر (UserViewSet)"""
+    return await _delegate(_user_detail_view, request, pk=str(pk))
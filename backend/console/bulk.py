@@ -0,0 +1,514 @@
+"""
+console/bulk.py
+Bulk provisioning of PTT users (POST /api/users/bulk/, UserViewSet.bulk) and batch channel
+operations (POST /api/channels/batch/, ChannelViewSet.batch).
+
+Users:
+- CSVParser: accepts text/csv bodies (header row: username,password,role,active,allowed_channels
+  with channels separated by ';').
+- parse_rows: normalizes a JSON array / {"users": [...]} body or parsed CSV rows.
+- provision_users: creates the users and returns one result per input row.
+
+Instead of one create_user call per user (Auth POST + users POST + membership calls), the
+import runs in a fixed number of round trips:
+1. all channel ids of the batch are validated with one uid=in.(...) lookup,
+2. quota slots for the whole batch are reserved in one conditional UPDATE (users.created_by
+   records the charged super admin; a request without one is rejected),
+3. Auth users are created concurrently on the fan_out pool, in batches of BULK_AUTH_BATCH_SIZE
+   (a request still running at the fan_out deadline is waited for, so no Auth user goes unrecorded),
+4. the users rows are written with one multi-row INSERT (repository.insert_many),
+5. channel memberships are added with one set-based INSERT (repository.add_memberships).
+Auth users whose users row could not be written are deleted again and their quota slots
+are released.
+
+Channels:
+- parse_channel_operations: normalizes a JSON array / {"operations": [...]} body of
+  create / update / delete operations.
+- apply_channel_operations: applies the batch and returns one result per operation.
+
+The batch reads the touched channels with one uid=in.(...) lookup and checks name uniqueness
+for the whole batch with one name=in.(...) lookup. Inserts, renames and deletes are one
+multi-row request each (delete_many, the rename_channels RPC, insert_many), run in that order:
+a name held by a channel deleted or renamed in the same batch is only reused once that write
+has succeeded, and operations depending on a name that was never freed fail. Memberships
+are reconciled once for the union of affected channels (one memberships_in read, one
+remove_memberships RPC and one add_memberships insert).
+"""
+
+import codecs
+import csv
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from . import quota, transport
+from .fanout import fan_out
+from .quota import OWNER_COLUMN
+from .repository import get_repository
+from .supabase_client import auth_user_payload
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_ROWS = 10000
+# تعداد درخواست‌های Auth در هر fan_out
+BULK_AUTH_BATCH_SIZE = 200
+CSV_LIST_SEPARATOR = ';'
+MAX_CHANNEL_OPERATIONS = 1000
+CHANNEL_OPERATIONS = ('create', 'update', 'delete')
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+class CSVParser(BaseParser):
+    """پارسر بدنه text/csv؛ خروجی لیست dict با کلیدهای سطر سرستون"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            return [row for row in reader if any((value or '').strip() for value in row.values())]
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError(f"CSV parse error - {e}")
+
+
+def _views():
+    # views این ماژول را import می‌کند؛ import تنبل از حلقه جلوگیری می‌کند
+    from . import views
+    return views
+
+
+def _as_bool(value: Any, default: bool = True) -> bool:
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _as_channels(value: Any) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [uid.strip() for uid in value.split(CSV_LIST_SEPARATOR) if uid.strip()]
+    if isinstance(value, list):
+        return [str(uid) for uid in value]
+    return []
+
+
+def parse_rows(data: Any) -> list:
+    """
+    تبدیل بدنه درخواست به لیست سطرها
+    ورودی: آرایه JSON، {"users": [...]} یا سطرهای CSV
+    """
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        raise ValueError("بدنه درخواست باید آرایه‌ای از کاربران یا {\"users\": [...]} باشد")
+    if len(data) > MAX_BULK_ROWS:
+        raise ValueError(f"حداکثر {MAX_BULK_ROWS} کاربر در هر درخواست مجاز است")
+
+    rows = []
+    for item in data:
+        item = item if isinstance(item, dict) else {}
+        rows.append({
+            'username': (item.get('username') or '').strip(),
+            'password': item.get('password') or '',
+            'role': (item.get('role') or 'regular').strip(),
+            'active': _as_bool(item.get('active')),
+            'allowed_channels': list(dict.fromkeys(_as_channels(item.get('allowed_channels')))),
+        })
+    return rows
+
+
+def _error(index: int, username: str, detail: str) -> Dict[str, Any]:
+    return {'row': index, 'username': username, 'status': 'error', 'detail': detail}
+
+
+def _create_auth_user(row: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """ساخت یک کاربر در Auth؛ خروجی (شناسه، None) یا (None، پیام خطا)"""
+    headers = _views()._service_headers()
+    if headers is None:
+        return None, "SERVICE_ROLE_KEY is not configured"
+    payload = auth_user_payload(row['username'], row['password'], row['role'], row['active'], row['allowed_channels'])
+    response = transport.request('POST', f"{transport.BASE_URL}/auth/v1/admin/users", headers=headers, json=payload)
+    if response.status_code not in (200, 201):
+        try:
+            body = response.json()
+            detail = body.get('msg') or body.get('message') or body.get('error_description') or response.text
+        except ValueError:
+            detail = response.text
+        return None, f"Auth error {response.status_code}: {detail}"
+    user_id = response.json().get('id')
+    if not user_id:
+        return None, "Auth response has no user id"
+    return user_id, None
+
+
+def _delete_auth_users(user_ids: list) -> None:
+    """حذف کاربران Auth که سطر users آن‌ها ساخته نشد"""
+    if not user_ids:
+        return
+    make_request = _views()._make_request
+    calls = {
+        user_id: (lambda user_id=user_id: make_request('DELETE', f"/auth/v1/admin/users/{user_id}"))
+        for user_id in user_ids
+    }
+    for user_id, result in fan_out(calls).items():
+        if not result.ok or result.value is None:
+            logger.error("کاربر %s پس از شکست درج گروهی از Auth حذف نشد", user_id)
+
+
+def _create_auth_users(rows: Dict[int, Dict[str, Any]]) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    """
+    ساخت همزمان کاربران Auth در دسته‌های BULK_AUTH_BATCH_SIZE تایی روی pool مشترک fan_out
+    درخواستی که پس از مهلت fan_out در حال اجراست ممکن است کاربر را بسازد؛ نتیجه واقعی آن منتظر
+    می‌ماند تا کاربر ساخته شده ثبت شود (و در صورت شکست درج users حذف شود) و کاربر یتیم در Auth نماند
+    """
+    created = {}
+    indexes = list(rows)
+    for i in range(0, len(indexes), BULK_AUTH_BATCH_SIZE):
+        batch = indexes[i:i + BULK_AUTH_BATCH_SIZE]
+        results = fan_out(
+            {index: (lambda row=rows[index]: _create_auth_user(row)) for index in batch}, wait_running=True,
+        )
+        for index, result in results.items():
+            created[index] = result.value if result.ok else (None, f"Auth error: {result.error}")
+    return created
+
+
+def provision_users(rows: list, quota_owner: Optional[str]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    ساخت گروهی کاربران
+    خروجی: (پیام خطای کل درخواست یا None، نتیجه هر سطر به ترتیب ورودی)
+    خطای کل درخواست فقط وقتی برگردانده می‌شود که سهمیه سوپر ادمین برای همه سطرهای معتبر کافی نباشد
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+
+    # اعتبارسنجی سطرها و نام‌های کاربری تکراری در همین درخواست
+    pending: Dict[int, Dict[str, Any]] = {}
+    seen = set()
+    for index, row in enumerate(rows):
+        username = row['username']
+        if not username or not row['password']:
+            results[index] = _error(index, username, "نام کاربری و رمز عبور الزامی است")
+        elif username.lower() in seen:
+            results[index] = _error(index, username, "نام کاربری در این درخواست تکراری است")
+        else:
+            seen.add(username.lower())
+            pending[index] = row
+
+    # مرحله 1: اعتبارسنجی همه کانال‌های دسته با یک جستجو
+    requested_channels = list(dict.fromkeys(uid for row in pending.values() for uid in row['allowed_channels']))
+    unknown_channels = set()
+    if requested_channels:
+        _, unknown = _views()._validate_channel_ids(requested_channels)
+        unknown_channels = set(unknown)
+    for row in pending.values():
+        row['unknown_channels'] = [uid for uid in row['allowed_channels'] if uid in unknown_channels]
+        row['allowed_channels'] = [uid for uid in row['allowed_channels'] if uid not in unknown_channels]
+
+    # مرحله 2: سهمیه کل دسته با یک UPDATE شرطی
+    if pending and not quota_owner:
+        return "ساخت کاربر فقط برای سوپر ادمین وارد شده ممکن است", []
+    if pending and not quota.reserve(quota_owner, count=len(pending)):
+        return f"سهمیه کاربران برای ساخت {len(pending)} کاربر جدید کافی نیست", []
+
+    # مرحله 3: ساخت همزمان کاربران در Auth
+    auth_results = _create_auth_users(pending)
+    created: Dict[int, str] = {}
+    for index, (user_id, error) in auth_results.items():
+        if user_id:
+            created[index] = user_id
+        else:
+            results[index] = _error(index, pending[index]['username'], error)
+
+    # مرحله 4: درج همه سطرهای users با INSERT چند سطری
+    # (allowed_channels از روی channel_membership توسط trigger پر می‌شود)
+    inserted_rows = {}
+    if created:
+        user_rows = [
+            {
+                'uid': user_id,
+                'username': pending[index]['username'],
+                'role': pending[index]['role'],
+                'active': pending[index]['active'],
+                'allowed_channels': [],
+                OWNER_COLUMN: quota_owner,
+            }
+            for index, user_id in created.items()
+        ]
+        inserted_rows = {str(row.get('uid')): row for row in get_repository().insert_many('users', user_rows)}
+
+    orphaned = [user_id for user_id in created.values() if str(user_id) not in inserted_rows]
+    for index, user_id in list(created.items()):
+        if str(user_id) not in inserted_rows:
+            results[index] = _error(index, pending[index]['username'], "خطا در ذخیره کاربر در جدول users")
+            del created[index]
+    _delete_auth_users(orphaned)
+
+    failed = len(pending) - len(created)
+    if failed:
+        quota.release(quota_owner, failed)
+
+    # مرحله 5: همه عضویت‌ها با یک INSERT مجموعه‌ای
+    pairs = [(channel_uid, created[index]) for index in created for channel_uid in pending[index]['allowed_channels']]
+    memberships_applied = get_repository().add_memberships(pairs) if pairs else True
+    if not memberships_applied:
+        logger.error("خطا در افزودن %s عضویت کانال برای کاربران ساخته شده", len(pairs))
+
+    for index, user_id in created.items():
+        row = pending[index]
+        results[index] = {
+            'row': index,
+            'username': row['username'],
+            'status': 'created',
+            'uid': str(user_id),
+            'allowed_channels': row['allowed_channels'] if memberships_applied else [],
+            'unknown_channels': row['unknown_channels'],
+        }
+        if not memberships_applied and row['allowed_channels']:
+            results[index]['detail'] = "کاربر ساخته شد اما عضویت کانال‌ها اعمال نشد"
+
+    logger.info("ساخت گروهی کاربران: %s موفق، %s ناموفق", len(created), len(rows) - len(created))
+    return None, results
+
+
+def parse_channel_operations(data: Any) -> list:
+    """
+    تبدیل بدنه درخواست به لیست عملیات کانال
+    ورودی: آرایه JSON یا {"operations": [...]}؛ هر عملیات {"op": "create|update|delete", "uid", "name", "allowed_users"}
+    """
+    if isinstance(data, dict):
+        data = data.get('operations')
+    if not isinstance(data, list):
+        raise ValueError("بدنه درخواست باید آرایه‌ای از عملیات یا {\"operations\": [...]} باشد")
+    if len(data) > MAX_CHANNEL_OPERATIONS:
+        raise ValueError(f"حداکثر {MAX_CHANNEL_OPERATIONS} عملیات در هر درخواست مجاز است")
+
+    operations = []
+    for item in data:
+        item = item if isinstance(item, dict) else {}
+        allowed_users = item.get('allowed_users')
+        operations.append({
+            'op': item.get('op'),
+            'uid': str(item['uid']) if item.get('uid') else None,
+            'name': item['name'].strip() if isinstance(item.get('name'), str) else None,
+            'allowed_users': list(dict.fromkeys(str(uid) for uid in allowed_users)) if isinstance(allowed_users, list) else None,
+        })
+    return operations
+
+
+def _channel_error(index: int, operation: Dict[str, Any], detail: str) -> Dict[str, Any]:
+    return {'index': index, 'op': operation['op'], 'uid': operation['uid'], 'status': 'error', 'detail': detail}
+
+
+def _validate_channel_operations(operations: list, results: list) -> Dict[int, Dict[str, Any]]:
+    """بررسی ساختار عملیات؛ خروجی عملیات معتبر بر اساس اندیس"""
+    pending = {}
+    seen_uids = set()
+    for index, operation in enumerate(operations):
+        op = operation['op']
+        if op not in CHANNEL_OPERATIONS:
+            results[index] = _channel_error(index, operation, f"op باید یکی از {CHANNEL_OPERATIONS} باشد")
+        elif op == 'create' and not operation['name']:
+            results[index] = _channel_error(index, operation, "نام کانال الزامی است")
+        elif op != 'create' and not operation['uid']:
+            results[index] = _channel_error(index, operation, "uid کانال الزامی است")
+        elif op != 'create' and operation['uid'] in seen_uids:
+            results[index] = _channel_error(index, operation, "برای هر کانال فقط یک عملیات در هر درخواست مجاز است")
+        else:
+            if op != 'create':
+                seen_uids.add(operation['uid'])
+            pending[index] = operation
+    return pending
+
+
+def _check_channel_names(pending: Dict[int, Dict[str, Any]], current: Dict[str, Dict[str, Any]],
+                         results: list) -> Dict[int, str]:
+    """
+    یکتایی نام همه کانال‌های ساخته یا تغییر نام داده شده با یک جستجوی name=in.(...)
+    نام کانالی که در همین دسته حذف یا تغییر نام داده می‌شود فقط به شرط موفقیت همان نوشتن آزاد است
+    خروجی: اندیس عملیات -> uid کانالی که نام را آزاد می‌کند (وابستگی عملیات)
+    """
+    targets = {}
+    for index, operation in pending.items():
+        if operation['op'] == 'create' or (
+            operation['op'] == 'update' and operation['name'] and operation['name'] != current[operation['uid']].get('name')
+        ):
+            targets[index] = operation['name']
+    if not targets:
+        return {}
+
+    released = {
+        operation['uid'] for operation in pending.values()
+        if operation['op'] == 'delete' or (operation['op'] == 'update' and operation['uid'] in current
+                                          and operation['name'] and operation['name'] != current[operation['uid']].get('name'))
+    }
+    existing = get_repository().rows_in('channels', 'name', list(dict.fromkeys(targets.values())), select='uid,name')
+    if existing is None:
+        raise _views().IdLookupError("Error checking channel names in Supabase")
+    taken, releasing = {}, {}
+    for row in existing:
+        uid = str(row.get('uid'))
+        if uid in released:
+            releasing[row.get('name')] = uid
+        else:
+            taken[row.get('name')] = uid
+
+    claimed = set()
+    depends = {}
+    for index, name in targets.items():
+        operation = pending[index]
+        if name in taken and taken[name] != operation['uid']:
+            results[index] = _channel_error(index, operation, f"کانالی با نام '{name}' از قبل وجود دارد")
+        elif name in claimed:
+            results[index] = _channel_error(index, operation, f"نام '{name}' در این درخواست تکراری است")
+        else:
+            claimed.add(name)
+            if name in releasing and releasing[name] != operation['uid']:
+                depends[index] = releasing[name]
+            continue
+        del pending[index]
+    return depends
+
+
+def apply_channel_operations(operations: list) -> List[Dict[str, Any]]:
+    """
+    اجرای گروهی عملیات ساخت، ویرایش و حذف کانال‌ها
+    خروجی: نتیجه هر عملیات به ترتیب ورودی
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+    pending = _validate_channel_operations(operations, results)
+    repository = get_repository()
+
+    # سطرهای فعلی همه کانال‌های ویرایش یا حذف شده با یک جستجو
+    existing_uids = [operation['uid'] for operation in pending.values() if operation['op'] != 'create']
+    existing = repository.rows_in('channels', 'uid', existing_uids) if existing_uids else []
+    if existing is None:
+        raise _views().IdLookupError("Error fetching channels from Supabase")
+    current = {str(row.get('uid')): row for row in existing}
+    for index, operation in list(pending.items()):
+        if operation['op'] != 'create' and operation['uid'] not in current:
+            results[index] = _channel_error(index, operation, "Channel not found")
+            del pending[index]
+
+    depends = _check_channel_names(pending, current, results)
+
+    # اعتبارسنجی کاربران همه عملیات با یک جستجو (کاربران ناشناخته مانند ساخت تکی کنار گذاشته می‌شوند)
+    requested_users = list(dict.fromkeys(
+        uid for operation in pending.values() if operation['op'] != 'delete' for uid in (operation['allowed_users'] or [])
+    ))
+    valid_users = set(_views()._validate_user_ids(requested_users)[0]) if requested_users else set()
+    for operation in pending.values():
+        if operation['allowed_users'] is not None:
+            operation['allowed_users'] = [uid for uid in operation['allowed_users'] if uid in valid_users]
+
+    creates = {index: operation for index, operation in pending.items() if operation['op'] == 'create'}
+    for operation in creates.values():
+        operation['uid'] = str(uuid.uuid4())
+    renames = {
+        index: operation for index, operation in pending.items()
+        if operation['op'] == 'update' and operation['name'] and operation['name'] != current[operation['uid']].get('name')
+    }
+    deletes = {index: operation for index, operation in pending.items() if operation['op'] == 'delete'}
+    delete_uids = [operation['uid'] for operation in deletes.values()]
+
+    def name_unavailable(index: int) -> None:
+        results[index] = _channel_error(index, pending[index], f"نام '{pending[index]['name']}' آزاد نشد")
+        del pending[index]
+
+    # ترتیب نوشتن: حذف، تغییر نام و سپس درج؛ نامی که حذف یا تغییر نام کانال دیگری آزاد می‌کند
+    # فقط پس از موفقیت همان نوشتن دوباره استفاده می‌شود
+    freed = set()
+    rows = dict(current)
+    if deletes:
+        # مانند destroy: ابتدا عضویت‌ها و سپس سطرهای کانال
+        deleted = repository.delete_memberships_in('channel_uid', delete_uids) and repository.delete_many('channels', delete_uids)
+        for index, operation in deletes.items():
+            if deleted:
+                freed.add(operation['uid'])
+                results[index] = {'index': index, 'op': 'delete', 'uid': operation['uid'], 'status': 'deleted'}
+            else:
+                results[index] = _channel_error(index, operation, "Failed to delete channel")
+            del pending[index]
+
+    # تغییر نام‌ها با یک دستور؛ تغییر نامی که به نام کانال دیگری در همان دستور وابسته است با آن اعمال می‌شود
+    renaming = set(renames)
+    while True:
+        blocked = {
+            index for index in renaming
+            if index in depends and depends[index] not in freed
+            and depends[index] not in {renames[other]['uid'] for other in renaming}
+        }
+        if not blocked:
+            break
+        renaming -= blocked
+    for index in set(renames) - renaming:
+        name_unavailable(index)
+    if renaming:
+        renamed = {
+            str(row.get('uid')): row
+            for row in repository.rename_channels({renames[index]['uid']: renames[index]['name'] for index in sorted(renaming)}) or []
+        }
+        rows.update(renamed)
+        for index in sorted(renaming):
+            if renames[index]['uid'] in renamed:
+                freed.add(renames[index]['uid'])
+            else:
+                results[index] = _channel_error(index, pending[index], "Failed to update channel in Supabase")
+                del pending[index]
+
+    for index in [index for index in creates if index in depends and depends[index] not in freed]:
+        name_unavailable(index)
+        del creates[index]
+    if creates:
+        inserted = {
+            str(row.get('uid')): row
+            for row in repository.insert_many('channels', [
+                {'name': operation['name'], 'uid': operation['uid'], 'allowed_users': []} for operation in creates.values()
+            ]) or []
+        }
+        rows.update(inserted)
+        for index, operation in creates.items():
+            if operation['uid'] not in inserted:
+                results[index] = _channel_error(index, operation, "Failed to create channel in Supabase")
+                del pending[index]
+
+    # هماهنگ‌سازی عضویت‌ها یک بار برای همه کانال‌های باقی‌مانده
+    membership_ok = True
+    reconciled = {operation['uid']: operation['allowed_users'] for operation in pending.values() if operation['allowed_users'] is not None}
+    if reconciled:
+        updated_uids = [operation['uid'] for operation in pending.values() if operation['op'] == 'update' and operation['uid'] in reconciled]
+        current_pairs = set(repository.memberships_in('channel_uid', updated_uids) or []) if updated_uids else set()
+        desired_pairs = {(channel_uid, user_uid) for channel_uid, users in reconciled.items() for user_uid in users}
+        changes = {}
+        removed = sorted(current_pairs - desired_pairs)
+        added = sorted(desired_pairs - current_pairs)
+        if removed:
+            changes['remove'] = lambda: repository.remove_memberships(removed)
+        if added:
+            changes['add'] = lambda: repository.add_memberships(added)
+        for key, result in fan_out(changes).items():
+            if not result.ok or not result.value:
+                membership_ok = False
+                logger.error("خطا در هماهنگ‌سازی عضویت کانال‌ها (%s): %s", key, result.error)
+
+    for index, operation in pending.items():
+        channel = dict(rows.get(operation['uid']) or {})
+        if operation['allowed_users'] is not None and membership_ok:
+            channel['allowed_users'] = operation['allowed_users']
+        results[index] = {
+            'index': index,
+            'op': operation['op'],
+            'uid': operation['uid'],
+            'status': 'created' if operation['op'] == 'create' else 'updated',
+            'channel': channel,
+        }
+        if not membership_ok and operation['allowed_users'] is not None:
+            results[index]['detail'] = "کانال ذخیره شد اما عضویت کاربران اعمال نشد"
+
+    logger.info("عملیات گروهی کانال‌ها: %s موفق از %s", sum(1 for r in results if r['status'] != 'error'), len(results))
+    return results
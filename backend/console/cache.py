@@ -0,0 +1,296 @@
+"""
+console/cache.py
+Read-through cache for single channel/user rows fetched from PostgREST by uid:
+- MemoryRowCache: per-process store with TTL and LRU eviction.
+- DjangoRowCache: stores rows in a Django cache alias (locmem, Redis, ...) shared by workers.
+- get_row_cache: the configured cache (settings.CONSOLE_ROW_CACHE).
+- invalidate_for_write: drops every entry a PostgREST write may have changed.
+
+Rows are cached only after a successful lookup; "not found" and upstream errors are never
+cached. Membership writes rewrite the allowed_users / allowed_channels arrays of both
+tables, so they invalidate rows on both sides.
+
+Invalidation only reaches the cache of the process that wrote. MemoryRowCache is therefore
+safe only with a single worker; with several workers the default is DjangoRowCache on
+Redis (REDIS_URL), or no caching when there is no shared cache.
+"""
+
+import copy
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import unquote
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CACHED_TABLES = ('channels', 'users')
+
+# توابع RPC نوشتن: پارامتر شناسه کانال و کاربر (None یعنی سطری از آن جدول تغییر نمی‌کند)
+_MEMBERSHIP_RPC_PARAMS = {
+    'append_channel_to_users': ('p_channel_uid', 'p_user_uids'),
+    'remove_channel_from_users': ('p_channel_uid', 'p_user_uids'),
+    'append_user_to_channels': ('p_channel_uids', 'p_user_uid'),
+    'remove_user_from_channels': ('p_channel_uids', 'p_user_uid'),
+    'remove_memberships': ('p_channel_uids', 'p_user_uids'),
+    'rename_channels': ('p_uids', None),
+}
+
+_EQ_FILTER_RE = r'(?:^|&){column}=eq\.([^&]+)'
+_IN_FILTER_RE = r'(?:^|&){column}=in\.\(([^)]*)\)'
+
+
+class RowCache:
+    """رابط مشترک backendهای cache سطرها"""
+    backend = 'none'
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, table: str, uid: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def set(self, table: str, uid: str, row: Dict[str, Any]) -> None:
+        pass
+
+    def delete(self, table: str, uids: Iterable[str]) -> None:
+        pass
+
+    def clear(self, table: Optional[str] = None) -> None:
+        pass
+
+    def lookup(self, table: str, uid: str) -> Optional[Dict[str, Any]]:
+        """مانند get، همراه با شمارش hit/miss"""
+        row = self.get(table, uid)
+        self._count('hits' if row is not None else 'misses')
+        return row
+
+    def fetch(self, table: str, uid: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        خواندن از cache و در صورت نبود، بارگذاری با loader و ذخیره نتیجه
+        loader باید سطر (dict) یا None برگرداند
+        """
+        row = self.lookup(table, uid)
+        if row is not None:
+            return row
+        row = loader()
+        if isinstance(row, dict):
+            self.set(table, uid, row)
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+class MemoryRowCache(RowCache):
+    """cache داخل پروسه با انقضای زمانی (TTL) و حذف قدیمی‌ترین استفاده (LRU)"""
+    backend = 'memory'
+
+    def __init__(self, ttl: float = 30, max_entries: int = 1024):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, table, uid):
+        key = (table, str(uid))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, row = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(row)
+
+    def set(self, table, uid, row):
+        key = (table, str(uid))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(row))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, table, uids):
+        with self._lock:
+            for uid in uids:
+                self._entries.pop((table, str(uid)), None)
+        self._count('invalidations')
+
+    def clear(self, table=None):
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == table]:
+                    del self._entries[key]
+        self._count('invalidations')
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update({'size': len(self._entries), 'max_entries': self.max_entries,
+                          'ttl': self.ttl, 'evictions': self.evictions})
+        return stats
+
+
+class DjangoRowCache(RowCache):
+    """
+    cache روی یک alias از Django cache framework (مثلاً Redis) که بین workerها مشترک است
+    پاک کردن یک جدول با افزایش نسخه کلیدهای آن جدول انجام می‌شود
+    """
+    backend = 'django'
+
+    def __init__(self, alias: str = 'default', ttl: float = 30, key_prefix: str = 'console:row'):
+        super().__init__()
+        self.alias = alias
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def _version_key(self, table):
+        return f"{self.key_prefix}:{table}:version"
+
+    def _key(self, table, uid):
+        version = self._cache.get_or_set(self._version_key(table), 1, timeout=None)
+        return f"{self.key_prefix}:{table}:{version}:{uid}"
+
+    def get(self, table, uid):
+        return self._cache.get(self._key(table, uid))
+
+    def set(self, table, uid, row):
+        self._cache.set(self._key(table, uid), row, timeout=self.ttl)
+
+    def delete(self, table, uids):
+        self._cache.delete_many([self._key(table, uid) for uid in uids])
+        self._count('invalidations')
+
+    def clear(self, table=None):
+        for name in ([table] if table else CACHED_TABLES):
+            key = self._version_key(name)
+            try:
+                self._cache.incr(key)
+            except ValueError:
+                self._cache.set(key, 2, timeout=None)
+        self._count('invalidations')
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'alias': self.alias, 'ttl': self.ttl})
+        return stats
+
+
+_cache_lock = threading.Lock()
+_row_cache: Optional[RowCache] = None
+
+
+def _build_row_cache() -> RowCache:
+    config = getattr(settings, 'CONSOLE_ROW_CACHE', {})
+    backend = config.get('BACKEND', 'none')
+    ttl = config.get('TTL', 30)
+    if backend == 'django':
+        return DjangoRowCache(alias=config.get('ALIAS', 'default'), ttl=ttl)
+    if backend == 'memory':
+        return MemoryRowCache(ttl=ttl, max_entries=config.get('MAX_ENTRIES', 1024))
+    return RowCache()
+
+
+def get_row_cache() -> RowCache:
+    global _row_cache
+    if _row_cache is None:
+        with _cache_lock:
+            if _row_cache is None:
+                _row_cache = _build_row_cache()
+    return _row_cache
+
+
+def reset_row_cache() -> None:
+    """ساخت دوباره cache بر اساس تنظیمات فعلی (برای تست‌ها)"""
+    global _row_cache
+    with _cache_lock:
+        _row_cache = None
+
+
+def _filter_values(query: str, column: str) -> Optional[list]:
+    """مقادیر فیلتر column=eq.x یا column=in.(a,b) در query string؛ None یعنی فیلتری روی column نیست"""
+    match = re.search(_EQ_FILTER_RE.format(column=column), query)
+    if match:
+        return [unquote(match.group(1))]
+    match = re.search(_IN_FILTER_RE.format(column=column), query)
+    if match:
+        return [unquote(value).strip('"') for value in match.group(1).split(',') if value]
+    return None
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def invalidate_for_write(method: str, path: str, data: Optional[Any] = None) -> None:
+    """
+    حذف سطرهایی از cache که یک درخواست نوشتن PostgREST ممکن است تغییر داده باشد
+    برای درخواست‌هایی که سطرهای تغییر کرده مشخص نیستند، کل جدول پاک می‌شود
+    """
+    if method.upper() in ('GET', 'HEAD', 'OPTIONS') or not path.startswith('/rest/v1/'):
+        return
+    row_cache = get_row_cache()
+    resource, _, query = path[len('/rest/v1/'):].partition('?')
+
+    if resource in CACHED_TABLES:
+        uids = _filter_values(query, 'uid')
+        if uids is not None:
+            row_cache.delete(resource, uids)
+        elif method.upper() != 'POST':
+            row_cache.clear(resource)
+        return
+
+    if resource == 'channel_membership':
+        channel_uids = _filter_values(query, 'channel_uid')
+        user_uids = _filter_values(query, 'user_uid')
+        if channel_uids is None and user_uids is None and isinstance(data, (dict, list)):
+            rows = data if isinstance(data, list) else [data]
+            channel_uids = [row.get('channel_uid') for row in rows if isinstance(row, dict)]
+            user_uids = [row.get('user_uid') for row in rows if isinstance(row, dict)]
+        for table, uids in (('channels', channel_uids), ('users', user_uids)):
+            if uids is None:
+                row_cache.clear(table)
+            else:
+                row_cache.delete(table, uids)
+        return
+
+    if resource.startswith('rpc/'):
+        params = _MEMBERSHIP_RPC_PARAMS.get(resource[len('rpc/'):])
+        if params is None or not isinstance(data, dict):
+            row_cache.clear()
+            return
+        channel_param, user_param = params
+        row_cache.delete('channels', _as_list(data.get(channel_param)))
+        row_cache.delete('users', _as_list(data.get(user_param)))
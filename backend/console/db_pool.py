@@ -0,0 +1,52 @@
+"""
+console/db_pool.py
+Connection statistics for the Django database aliases (served by views.metrics_view):
+- pool_stats: per alias, the persistent-connection settings and, when the native psycopg
+  pool is enabled (admin_panel/db_settings.py), its size, free connections and waiting
+  requests.
+
+A pool is saturated when every connection is in use and requests start to wait
+(`requests_waiting` > 0, `utilization` == 1).
+
+Only pools that already exist are reported: DatabaseWrapper.pool creates the pool of its
+alias on first access, so it is not read here.
+"""
+
+from typing import Any, Dict
+
+from django.db import connections
+
+# کلیدهای آمار psycopg_pool که گزارش می‌شوند
+POOL_STAT_KEYS = (
+    'pool_min', 'pool_max', 'pool_size', 'pool_available', 'requests_waiting',
+    'requests_num', 'requests_queued', 'requests_wait_ms', 'requests_errors',
+    'connections_num', 'connections_errors', 'connections_lost',
+)
+
+
+def _pool_stats(pool) -> Dict[str, Any]:
+    stats = pool.get_stats()
+    result = {key: stats.get(key, 0) for key in POOL_STAT_KEYS}
+    in_use = result['pool_size'] - result['pool_available']
+    result['in_use'] = in_use
+    result['utilization'] = round(in_use / result['pool_max'], 3) if result['pool_max'] else 0
+    return result
+
+
+def pool_stats() -> Dict[str, Any]:
+    """آمار اتصال هر alias پایگاه داده در worker فعلی"""
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        entry = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'connected': connection.connection is not None,
+        }
+        # DatabaseWrapper.pool استخر را در اولین دسترسی می‌سازد؛ فقط استخرهای ساخته شده خوانده می‌شوند
+        pool = getattr(connection, '_connection_pools', {}).get(alias)
+        if pool is not None:
+            entry['pool'] = _pool_stats(pool)
+        stats[alias] = entry
+    return stats
@@ -0,0 +1,249 @@
+"""
+console/export.py
+Streaming exports of PostgREST tables (users, channels) for very large result sets:
+- NDJSONRenderer / CSVRenderer: renderers that register the ndjson/csv formats with DRF
+  so ?format=ndjson|csv selects the export format.
+- iter_json_array: incremental parser yielding rows of a JSON array as its bytes arrive.
+- stream_table: StreamingHttpResponse that relays a table from PostgREST with stream=True.
+- astream_table: the same relay over httpx for the ASGI views, with an async body.
+
+Rows are never held in memory all at once: CSV is relayed byte-for-byte from PostgREST,
+NDJSON is produced row by row from the incrementally parsed JSON array.
+"""
+
+import codecs
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from . import async_client, transport
+from .log import Preview
+from .pagination import select_clause
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+
+
+class _ErrorAsJSONRenderer(BaseRenderer):
+    """خروجی واقعی به صورت stream ارسال می‌شود؛ این renderer فقط پاسخ‌های خطا را رندر می‌کند"""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class NDJSONRenderer(_ErrorAsJSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(_ErrorAsJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class _JSONArrayParser:
+    """
+    پارسر تدریجی آرایه JSON: هر بخش دریافتی با feed داده می‌شود و عناصر کامل شده برگردانده می‌شوند
+    فقط بخش ناقص انتهای بافر در حافظه نگه‌داشته می‌شود
+    """
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.opened = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> Iterator[Any]:
+        buffer = self.buffer[self.pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if not self.opened:
+                if char != '[':
+                    raise ValueError("پاسخ PostgREST آرایه JSON نیست")
+                self.opened = True
+                pos += 1
+                continue
+            if char == ',':
+                pos += 1
+                continue
+            if char == ']':
+                self.closed = True
+                break
+            try:
+                value, end = self.decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # عنصر هنوز کامل دریافت نشده است
+                break
+            if end >= len(buffer) and not isinstance(value, (dict, list)):
+                # یک عدد یا مقدار ساده در انتهای بافر ممکن است ناقص باشد
+                break
+            # موقعیت قبل از yield ذخیره می‌شود تا توقف مصرف‌کننده وضعیت را خراب نکند
+            self.buffer, self.pos = buffer, end
+            yield value
+            pos = end
+        self.buffer, self.pos = buffer, pos
+
+    def finish(self) -> None:
+        if not self.closed:
+            raise ValueError("آرایه JSON ناقص دریافت شد")
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    تجزیه تدریجی یک آرایه JSON و برگرداندن عناصر آن به محض کامل شدن
+    """
+    parser = _JSONArrayParser()
+    for chunk in chunks:
+        if parser.closed:
+            break
+        yield from parser.feed(chunk)
+    parser.finish()
+
+
+async def aiter_json_array(chunks: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """نسخه async از iter_json_array برای پاسخ‌های stream شده httpx"""
+    parser = _JSONArrayParser()
+    async for chunk in chunks:
+        if parser.closed:
+            break
+        for value in parser.feed(chunk):
+            yield value
+    parser.finish()
+
+
+def iter_ndjson(rows: Iterable[Any], batch_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """تبدیل سطرها به NDJSON و ارسال در بسته‌های تقریباً batch_size بایتی"""
+    batch: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        batch.append(line)
+        size += len(line)
+        if size >= batch_size:
+            yield ''.join(batch).encode('utf-8')
+            batch, size = [], 0
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+def _iter_text(response, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def _relay(response, body: Iterator[bytes]) -> Iterator[bytes]:
+    """ارسال بدنه و بستن اتصال upstream در پایان یا قطع شدن کلاینت"""
+    try:
+        yield from body
+    except Exception as e:
+        logger.error("خطا در ارسال خروجی: %s", e)
+        raise
+    finally:
+        response.close()
+
+
+def _export_request(table: str, export_format: str, fields: List[str], headers: Dict[str, str],
+                    ordering: tuple) -> Tuple[str, Dict[str, str], str]:
+    """مسیر PostgREST، هدرها و content type خروجی"""
+    request_headers = dict(headers or {})
+    request_headers['Accept'] = 'text/csv' if export_format == 'csv' else 'application/json'
+    order = ','.join(f'{key}.asc' for key in ordering)
+    path = f"/rest/v1/{table}?select={select_clause(fields)}&order={order}"
+    content_type = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+    return path, request_headers, content_type
+
+
+def _streaming_response(body, table: str, export_format: str, content_type: str) -> StreamingHttpResponse:
+    streaming = StreamingHttpResponse(body, content_type=content_type)
+    streaming['Content-Disposition'] = f'attachment; filename="{table}.{export_format}"'
+    streaming['X-Accel-Buffering'] = 'no'
+    return streaming
+
+
+def stream_table(table: str, export_format: str, fields: List[str], headers: Dict[str, str],
+                 ordering: tuple = ('created_at', 'uid')) -> Optional[StreamingHttpResponse]:
+    """
+    خروجی کامل یک جدول به صورت stream
+    در صورت خطای upstream مقدار None برمی‌گرداند
+    """
+    path, request_headers, content_type = _export_request(table, export_format, fields, headers, ordering)
+
+    response = transport.request('GET', path, headers=request_headers, stream=True)
+    if response.status_code >= 400:
+        logger.error("خطا در دریافت خروجی %s از Supabase: %s - %s", table, response.status_code, Preview(response.text))
+        response.close()
+        return None
+
+    if export_format == 'csv':
+        body = response.iter_content(chunk_size=CHUNK_SIZE)
+    else:
+        body = iter_ndjson(iter_json_array(_iter_text(response)))
+
+    return _streaming_response(_relay(response, body), table, export_format, content_type)
+
+
+async def aiter_ndjson(rows: AsyncIterable[Any], batch_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """نسخه async از iter_ndjson"""
+    batch: List[str] = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        batch.append(line)
+        size += len(line)
+        if size >= batch_size:
+            yield ''.join(batch).encode('utf-8')
+            batch, size = [], 0
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+async def _arelay(response, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """ارسال بدنه و بستن اتصال upstream (نسخه async)"""
+    try:
+        async for part in body:
+            yield part
+    except Exception as e:
+        logger.error("خطا در ارسال خروجی: %s", e)
+        raise
+    finally:
+        await response.aclose()
+
+
+async def astream_table(table: str, export_format: str, fields: List[str], headers: Dict[str, str],
+                        ordering: tuple = ('created_at', 'uid')) -> Optional[StreamingHttpResponse]:
+    """
+    نسخه async از stream_table برای اجرای ASGI
+    بدنه یک async iterator است تا Django آن را بدون بافر کردن کامل ارسال کند
+    """
+    path, request_headers, content_type = _export_request(table, export_format, fields, headers, ordering)
+
+    client = async_client.get_client()
+    response = await client.send(client.build_request('GET', path, headers=request_headers), stream=True)
+    if response.status_code >= 400:
+        await response.aread()
+        logger.error("خطا در دریافت خروجی %s از Supabase: %s - %s", table, response.status_code, Preview(response.text))
+        await response.aclose()
+        return None
+
+    if export_format == 'csv':
+        body = response.aiter_bytes(CHUNK_SIZE)
+    else:
+        body = aiter_ndjson(aiter_json_array(response.aiter_text()))
+
+    return _streaming_response(_arelay(response, body), table, export_format, content_type)
@@ -0,0 +1,131 @@
+"""
+console/fanout.py
+Bounded concurrent execution of independent Supabase calls:
+- fan_out: runs a mapping of key -> callable on a per-worker thread pool and returns
+  one FanOutResult per key (value or error). The timeout is one deadline shared by the
+  whole mapping, not a per-call limit. At the deadline, calls that have not started are
+  cancelled; calls already running cannot be stopped and keep running in the pool, so
+  their result is reported as a timeout unless wait_running=True (for calls with side
+  effects the caller must know about, e.g. creating Auth users).
+- FanOutResult: outcome of a single call (get() re-raises the call's error).
+
+The pool is shared by all requests of a worker process, so the number of concurrent
+calls a worker sends to Kong never exceeds SUPABASE_FANOUT_WORKERS. Calls may use Django
+database connections (DirectRepository); pool threads call close_old_connections() before
+and after each call, as Django does around a request, so broken or expired connections
+(CONN_MAX_AGE) are not reused.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str, default, cast):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+MAX_WORKERS = _env_number("SUPABASE_FANOUT_WORKERS", 8, int)
+DEFAULT_TIMEOUT = _env_number("SUPABASE_FANOUT_TIMEOUT", 30.0, float)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_local = threading.local()
+
+
+@dataclass
+class FanOutResult:
+    value: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def get(self) -> Any:
+        """مقدار فراخوانی؛ در صورت خطا همان خطا دوباره raise می‌شود"""
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """ThreadPool مشترک پروسه؛ بعد از fork شدن worker دوباره ساخته می‌شود"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="supabase-fanout")
+                _executor_pid = pid
+    return _executor
+
+
+def _run(fn: Callable[[], Any]) -> FanOutResult:
+    started = time.monotonic()
+    try:
+        return FanOutResult(value=fn(), elapsed=time.monotonic() - started)
+    except Exception as e:
+        return FanOutResult(error=e, elapsed=time.monotonic() - started)
+
+
+def _run_in_pool(fn: Callable[[], Any]) -> FanOutResult:
+    """اجرای یک فراخوانی در thread های pool؛ اتصال‌های پایگاه داده مانند ابتدا و انتهای درخواست مدیریت می‌شوند"""
+    _local.inside_pool = True
+    close_old_connections()
+    try:
+        return _run(fn)
+    finally:
+        close_old_connections()
+        _local.inside_pool = False
+
+
+def fan_out(calls: Dict[Hashable, Callable[[], Any]], timeout: Optional[float] = None,
+            wait_running: bool = False) -> Dict[Hashable, FanOutResult]:
+    """
+    اجرای همزمان فراخوانی‌های مستقل و جمع‌آوری نتایج
+    calls: نگاشت کلید به تابع بدون آرگومان
+    timeout: مهلت مشترک برای همه فراخوانی‌ها (ثانیه، از زمان ارسال)
+    wait_running: پس از پایان مهلت، منتظر نتیجه فراخوانی‌هایی که در حال اجرا هستند بماند
+    خطای هر فراخوانی در نتیجه همان کلید برگردانده می‌شود و بقیه را متوقف نمی‌کند
+    """
+    if not calls:
+        return {}
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+
+    # فراخوانی تو در تو از داخل pool یا فقط یک فراخوانی: اجرای ترتیبی برای جلوگیری از بن‌بست
+    if len(calls) == 1 or getattr(_local, "inside_pool", False):
+        return {key: _run(fn) for key, fn in calls.items()}
+
+    executor = _get_executor()
+    futures = {key: executor.submit(_run_in_pool, fn) for key, fn in calls.items()}
+    deadline = time.monotonic() + timeout
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError as e:
+            if future.cancel():
+                logger.error("فراخوانی %s تا پایان مهلت %s ثانیه شروع نشد و لغو شد", key, timeout)
+            elif wait_running:
+                # فراخوانی در حال اجرا متوقف نمی‌شود؛ نتیجه واقعی آن لازم است
+                logger.warning("فراخوانی %s پس از مهلت %s ثانیه هنوز در حال اجراست؛ انتظار برای نتیجه", key, timeout)
+                results[key] = future.result()
+                continue
+            else:
+                logger.error("پایان مهلت %s ثانیه؛ فراخوانی %s در pool ادامه می‌یابد و نتیجه آن نادیده گرفته می‌شود", timeout, key)
+            results[key] = FanOutResult(error=e, elapsed=timeout)
+    return results
@@ -0,0 +1,98 @@
+"""
+console/ids.py
+Public 7-digit identifiers (Channel.channel_id, SuperAdmin.super_admin_id):
+- FeistelPermutation: keyed bijection over [0, size) built from a balanced Feistel network
+  with cycle-walking, so consecutive inputs map to scattered, non-guessable outputs.
+- next_public_id: takes the next value of a Postgres sequence and maps it into
+  [MIN_ID, MAX_ID] through the permutation.
+- sequence_name: the sequence backing a model field.
+
+Distinct sequence values always give distinct ids, so a save needs no lookup query
+and concurrent saves cannot pick the same id. The permutation key
+(settings.CONSOLE_PUBLIC_ID_KEY) must never change once ids have been issued.
+"""
+
+import hashlib
+import hmac
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+MIN_ID = 1000000
+MAX_ID = 9999999
+
+
+class FeistelPermutation:
+    """
+    جایگشت کلیددار روی بازه [0, size)
+    شبکه Feistel روی کوچک‌ترین دامنه 2^(2k) بزرگ‌تر یا مساوی size ساخته می‌شود و خروجی‌های خارج از
+    بازه دوباره جایگشت داده می‌شوند (cycle-walking) تا نتیجه همیشه داخل بازه و یک به یک باشد
+    """
+
+    def __init__(self, key: bytes, size: int, rounds: int = 4):
+        if size < 2:
+            raise ValueError("size باید حداقل 2 باشد")
+        self.key = key
+        self.size = size
+        self.rounds = rounds
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def _round(self, round_index: int, value: int) -> int:
+        digest = hmac.new(self.key, f"{round_index}:{value}".encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_index in range(self.rounds):
+            left, right = right, left ^ self._round(round_index, right)
+        return (left << self.half_bits) | right
+
+    def _decrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_index in reversed(range(self.rounds)):
+            left, right = right ^ self._round(round_index, left), left
+        return (left << self.half_bits) | right
+
+    def permute(self, value: int) -> int:
+        if not 0 <= value < self.size:
+            raise ValueError(f"مقدار خارج از بازه [0, {self.size}) است: {value}")
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def invert(self, value: int) -> int:
+        if not 0 <= value < self.size:
+            raise ValueError(f"مقدار خارج از بازه [0, {self.size}) است: {value}")
+        value = self._decrypt(value)
+        while value >= self.size:
+            value = self._decrypt(value)
+        return value
+
+
+_permutation: Optional[FeistelPermutation] = None
+
+
+def get_permutation() -> FeistelPermutation:
+    global _permutation
+    if _permutation is None:
+        key = getattr(settings, 'CONSOLE_PUBLIC_ID_KEY', None) or settings.SECRET_KEY
+        _permutation = FeistelPermutation(key.encode(), MAX_ID - MIN_ID + 1)
+    return _permutation
+
+
+def sequence_name(model, field_name: str) -> str:
+    return f"{model._meta.db_table}_{field_name}_seq"
+
+
+def next_public_id(model, field_name: str, using: str) -> int:
+    """
+    شناسه بعدی برای model.field_name با یک nextval (بدون جستجوی مقدار تکراری)
+    sequence با MAXVALUE برابر اندازه بازه و بدون CYCLE ساخته شده است، پس پس از پر شدن بازه خطا می‌دهد
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [sequence_name(model, field_name)])
+        value = cursor.fetchone()[0]
+    return MIN_ID + get_permutation().permute(value - 1)
@@ -0,0 +1,70 @@
+"""
+console/log.py
+Helpers for logging Supabase calls on the request hot path:
+- Preview: lazy, truncated rendering of a request/response body; nothing is serialized
+  unless the record is actually written (pass it as a %-style argument).
+- redact_headers: copy of the headers with credentials masked.
+- sampled: True for a LOG_SAMPLE_RATE fraction of calls; bodies are only logged for those.
+- log_bodies: level guard + sampling in one check.
+
+Bodies are truncated to LOG_BODY_MAX_CHARS characters, so a 2 MB users list costs at most
+one short string when its DEBUG record is sampled and nothing otherwise.
+"""
+
+import json
+import logging
+import os
+import random
+from typing import Any, Dict, Optional
+
+SENSITIVE_HEADERS = frozenset({'apikey', 'authorization', 'cookie', 'x-csrftoken'})
+SENSITIVE_FIELDS = frozenset({'password', 'admin_super_password'})
+
+
+def _env_number(name: str, default, cast):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+BODY_MAX_CHARS = _env_number('LOG_BODY_MAX_CHARS', 1000, int)
+SAMPLE_RATE = _env_number('LOG_SAMPLE_RATE', 1.0, float)
+
+
+class Preview:
+    """بدنه برای لاگ؛ تبدیل به متن و کوتاه کردن فقط هنگام قالب‌بندی رکورد انجام می‌شود"""
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = BODY_MAX_CHARS if limit is None else limit
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, dict):
+            value = {key: ('***' if key in SENSITIVE_FIELDS else item) for key, item in value.items()}
+        if not isinstance(value, str):
+            try:
+                value = json.dumps(value, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                value = repr(value)
+        if len(value) > self.limit:
+            return f"{value[:self.limit]}... ({len(value)} chars)"
+        return value
+
+    __repr__ = __str__
+
+
+def redact_headers(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    return {key: ('***' if key.lower() in SENSITIVE_HEADERS else value) for key, value in (headers or {}).items()}
+
+
+def sampled(rate: Optional[float] = None) -> bool:
+    rate = SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_bodies(logger: logging.Logger) -> bool:
+    """آیا بدنه درخواست/پاسخ این فراخوانی لاگ شود (سطح DEBUG فعال و فراخوانی در نمونه باشد)"""
+    return logger.isEnabledFor(logging.DEBUG) and sampled()
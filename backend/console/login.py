@@ -0,0 +1,89 @@
+"""
+console/login.py
+Super admin login pipeline used by login_view:
+- authenticate_super_admin: verifies the password against SuperAdmin.admin_super_password with a
+  single hash. When the stored hash uses an older hasher or fewer iterations than settings.PASSWORD_HASHERS[0]
+  (e.g. PBKDF2 -> Argon2 with PASSWORD_HASHER=argon2), it is re-encoded once, on that login.
+- The Django user that carries the session is created with an unusable password (it is never
+  used to authenticate), so a first login no longer hashes the password a second time.
+- SuperAdmin -> Django user mapping is cached (settings.LOGIN_USER_CACHE, default Django cache),
+  so repeated logins skip the get_or_create on the default database.
+Unknown usernames still cost one hash, so response time does not reveal which admins exist.
+"""
+
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User as DjangoUser
+
+from .models import SuperAdmin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOGIN_USER_CACHE = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+
+def _login_cache_settings():
+    return {**DEFAULT_LOGIN_USER_CACHE, **getattr(settings, 'LOGIN_USER_CACHE', {})}
+
+
+def _user_cache():
+    from django.core.cache import caches
+    return caches[_login_cache_settings()['ALIAS']]
+
+
+def _user_cache_key(username: str) -> str:
+    return f"console:login-user:{username}"
+
+
+def _django_user(username: str) -> DjangoUser:
+    """کاربر Django متناظر با سوپر ادمین؛ از cache یا با یک get_or_create"""
+    cache = _user_cache()
+    key = _user_cache_key(username)
+    user = cache.get(key)
+    if user is not None:
+        return user
+
+    user = DjangoUser.objects.filter(username=username).first()
+    if user is None:
+        # رمز این کاربر هرگز بررسی نمی‌شود؛ احراز هویت با رمز سوپر ادمین انجام می‌شود
+        user = DjangoUser(username=username)
+        user.set_unusable_password()
+        user.save()
+    cache.set(key, user, timeout=_login_cache_settings()['TTL'])
+    return user
+
+
+def authenticate_super_admin(username: Optional[str], password: Optional[str]) -> Optional[DjangoUser]:
+    """
+    احراز هویت سوپر ادمین؛ خروجی کاربر Django برای login() یا None
+    رمز عبور در هر ورود فقط یک بار hash می‌شود (به جز یک بار بازنویسی hash هنگام ارتقای hasher)
+    """
+    if not username or not password:
+        return None
+
+    admin = (
+        SuperAdmin.objects.using('supabase')
+        .only('id', 'admin_super_user', 'admin_super_password')
+        .filter(admin_super_user=username)
+        .first()
+    )
+    if admin is None:
+        # هزینه یکسان با نام کاربری موجود
+        make_password(password)
+        return None
+
+    def rehash(raw_password):
+        SuperAdmin.objects.using('supabase').filter(pk=admin.pk).update(
+            admin_super_password=make_password(raw_password)
+        )
+        logger.info("hash رمز سوپر ادمین %s با hasher جدید بازنویسی شد", username)
+
+    if not check_password(password, admin.admin_super_password, setter=rehash):
+        return None
+    return _django_user(username)
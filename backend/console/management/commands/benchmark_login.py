@@ -0,0 +1,74 @@
+"""
+console/management/commands/benchmark_login.py
+Load test for the super admin login endpoint of a running backend:
+    python manage.py benchmark_login --username admin --password secret [--url ...] [--requests 500] [--concurrency 500]
+Every request uses its own HTTP session (like separate browsers at shift change); all workers start
+together behind a barrier. Reports throughput, failures and p50/p95/p99/max latency.
+"""
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, pct):
+    """صدک pct از مقادیر مرتب شده (nearest-rank)"""
+    if not values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent super admin logins against a running backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8010/api/auth/login/', help="login endpoint")
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--requests', type=int, default=500, help="total login requests")
+        parser.add_argument('--concurrency', type=int, default=500, help="logins in flight at the same time")
+        parser.add_argument('--timeout', type=float, default=60.0, help="per request timeout (seconds)")
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = min(options['concurrency'], total)
+        if total <= 0 or concurrency <= 0:
+            raise CommandError("--requests و --concurrency باید بزرگتر از صفر باشند")
+
+        payload = {'username': options['username'], 'password': options['password']}
+        barrier = threading.Barrier(concurrency)
+
+        def login_once(index):
+            # اولین دسته درخواست‌ها همزمان شروع می‌شوند
+            if index < concurrency:
+                barrier.wait()
+            started = time.perf_counter()
+            try:
+                with requests.Session() as session:
+                    response = session.post(options['url'], json=payload, timeout=options['timeout'])
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(login_once, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for ok, latency in results if ok)
+        failures = total - len(latencies)
+        self.stdout.write(f"درخواست‌ها: {total}، همزمانی: {concurrency}، ناموفق: {failures}")
+        self.stdout.write(f"توان عملیاتی: {total / elapsed:.1f} ورود در ثانیه ({elapsed:.2f} ثانیه)")
+        if latencies:
+            self.stdout.write(
+                f"تأخیر (ms): p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+                f"p99={percentile(latencies, 99):.1f} max={latencies[-1]:.1f} mean={statistics.mean(latencies):.1f}"
+            )
+        if failures:
+            self.stderr.write(self.style.WARNING(f"{failures} ورود ناموفق بود"))
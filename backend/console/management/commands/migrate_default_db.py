@@ -0,0 +1,108 @@
+"""
+console/management/commands/migrate_default_db.py
+Copies the 'default' database (Django auth, sessions, admin log, jobs) from the old SQLite file
+into the database 'default' now points at (e.g. DEFAULT_DB_ENGINE=postgres):
+    python manage.py migrate_default_db [--source db.sqlite3] [--force]
+- creates DEFAULT_DB_SCHEMA when configured and runs migrate on the target first;
+- copies every model routed to 'default' in one transaction, in batches, keeping primary keys
+  (rows created by migrate, e.g. content types and permissions, are replaced by the source rows);
+- resets the PostgreSQL sequences afterwards.
+The console app lives on the 'supabase' alias and is not touched.
+"""
+
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+from admin_panel.db_settings import sqlite_database
+
+SOURCE_ALIAS = 'sqlite_source'
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Copy the default database from the old SQLite file into the configured default database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / 'db.sqlite3'), help="path of the SQLite file")
+        parser.add_argument('--force', action='store_true', help="replace users and other rows already in the target")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = connections[DEFAULT_DB_ALIAS]
+        if not os.path.exists(source):
+            raise CommandError(f"فایل SQLite {source} وجود ندارد")
+        if target.vendor == 'sqlite' and os.path.abspath(str(target.settings_dict['NAME'])) == os.path.abspath(source):
+            raise CommandError("پایگاه داده default هنوز همان فایل SQLite است؛ DEFAULT_DB_ENGINE=postgres را تنظیم کنید")
+
+        self._prepare_target(target, options['verbosity'])
+        self._add_source_alias(source)
+        try:
+            models = self._models()
+            if not options['force'] and get_user_model()._default_manager.using(DEFAULT_DB_ALIAS).exists():
+                raise CommandError("پایگاه داده مقصد کاربر دارد؛ برای جایگزینی --force را اضافه کنید")
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                for model in reversed(models):
+                    model._base_manager.using(DEFAULT_DB_ALIAS).all().delete()
+                for model in models:
+                    copied = self._copy(model)
+                    self.stdout.write(f"{model._meta.label}: {copied} سطر")
+                self._reset_sequences(target, models)
+        finally:
+            connections[SOURCE_ALIAS].close()
+            del connections[SOURCE_ALIAS]
+            del connections.settings[SOURCE_ALIAS]
+        self.stdout.write(self.style.SUCCESS("انتقال پایگاه داده default انجام شد"))
+
+    def _prepare_target(self, target, verbosity):
+        schema = os.environ.get('DEFAULT_DB_SCHEMA')
+        if schema and target.vendor == 'postgresql':
+            with target.cursor() as cursor:
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {target.ops.quote_name(schema)}")
+        call_command('migrate', database=DEFAULT_DB_ALIAS, interactive=False, verbosity=verbosity)
+
+    def _add_source_alias(self, source):
+        # alias موقت با همان مقادیر پیش‌فرضی که Django برای aliasهای DATABASES تکمیل می‌کند
+        configured = connections.configure_settings({
+            DEFAULT_DB_ALIAS: dict(connections.settings[DEFAULT_DB_ALIAS]),
+            SOURCE_ALIAS: sqlite_database(source),
+        })
+        connections.settings[SOURCE_ALIAS] = configured[SOURCE_ALIAS]
+
+    def _models(self):
+        """مدل‌های alias پیش‌فرض (شامل جداول میانی many-to-many) که در فایل مبدأ جدول دارند"""
+        source_tables = set(connections[SOURCE_ALIAS].introspection.table_names())
+        return [
+            model for model in apps.get_models(include_auto_created=True)
+            if model._meta.managed and not model._meta.proxy
+            and router.allow_migrate_model(DEFAULT_DB_ALIAS, model)
+            and model._meta.db_table in source_tables
+        ]
+
+    def _copy(self, model):
+        copied = 0
+        batch = []
+        # کلیدهای خارجی در PostgreSQL و SQLite تا پایان تراکنش بررسی نمی‌شوند، پس ترتیب مدل‌ها مهم نیست
+        for obj in model._base_manager.using(SOURCE_ALIAS).order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                model._base_manager.using(DEFAULT_DB_ALIAS).bulk_create(batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            model._base_manager.using(DEFAULT_DB_ALIAS).bulk_create(batch)
+            copied += len(batch)
+        return copied
+
+    def _reset_sequences(self, target, models):
+        statements = target.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with target.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
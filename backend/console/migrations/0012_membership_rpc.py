@@ -0,0 +1,90 @@
+from django.db import migrations
+
+
+# توابع اتمیک برای افزودن/حذف یک شناسه به آرایه‌های عضویت
+# users.allowed_channels و channels.allowed_users (jsonb)
+# هر تابع تعداد سطرهای یافت شده را برمی‌گرداند
+MEMBERSHIP_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION public.append_channel_to_users(p_channel_uid text, p_user_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET allowed_channels = COALESCE(allowed_channels, '[]'::jsonb) || to_jsonb(p_channel_uid)
+        WHERE uid = ANY(p_user_uids::uuid[])
+          AND NOT COALESCE(allowed_channels, '[]'::jsonb) ? p_channel_uid
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.users WHERE uid = ANY(p_user_uids::uuid[]);
+$$;
+
+CREATE OR REPLACE FUNCTION public.remove_channel_from_users(p_channel_uid text, p_user_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET allowed_channels = allowed_channels - p_channel_uid
+        WHERE uid = ANY(p_user_uids::uuid[])
+          AND allowed_channels ? p_channel_uid
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.users WHERE uid = ANY(p_user_uids::uuid[]);
+$$;
+
+CREATE OR REPLACE FUNCTION public.append_user_to_channels(p_user_uid text, p_channel_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.channels
+        SET allowed_users = COALESCE(allowed_users, '[]'::jsonb) || to_jsonb(p_user_uid)
+        WHERE uid = ANY(p_channel_uids)
+          AND NOT COALESCE(allowed_users, '[]'::jsonb) ? p_user_uid
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.channels WHERE uid = ANY(p_channel_uids);
+$$;
+
+CREATE OR REPLACE FUNCTION public.remove_user_from_channels(p_user_uid text, p_channel_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.channels
+        SET allowed_users = allowed_users - p_user_uid
+        WHERE uid = ANY(p_channel_uids)
+          AND allowed_users ? p_user_uid
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.channels WHERE uid = ANY(p_channel_uids);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.append_channel_to_users(text, text[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.remove_channel_from_users(text, text[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.append_user_to_channels(text, text[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.remove_user_from_channels(text, text[]) TO service_role;
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+DROP_MEMBERSHIP_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS public.append_channel_to_users(text, text[]);
+DROP FUNCTION IF EXISTS public.remove_channel_from_users(text, text[]);
+DROP FUNCTION IF EXISTS public.append_user_to_channels(text, text[]);
+DROP FUNCTION IF EXISTS public.remove_user_from_channels(text, text[]);
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("console", "0011_channel_uid_alter_channel_table"),
+    ]
+
+    operations = [
+        migrations.RunSQL(MEMBERSHIP_FUNCTIONS_SQL, DROP_MEMBERSHIP_FUNCTIONS_SQL),
+    ]
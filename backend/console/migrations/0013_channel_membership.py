@@ -0,0 +1,190 @@
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+# پر کردن جدول عضویت از روی آرایه‌های قبلی (فقط زوج‌هایی که کانال و کاربر هر دو موجودند)
+# و یکسان‌سازی آرایه‌ها با جدول جدید
+BACKFILL_SQL = """
+INSERT INTO public.channel_membership (channel_uid, user_uid, created_at)
+SELECT pairs.channel_uid, pairs.user_uid, now()
+FROM (
+    SELECT member.value AS channel_uid, u.uid::text AS user_uid
+    FROM public.users u, jsonb_array_elements_text(COALESCE(u.allowed_channels, '[]'::jsonb)) AS member(value)
+    UNION
+    SELECT c.uid AS channel_uid, member.value AS user_uid
+    FROM public.channels c, jsonb_array_elements_text(COALESCE(c.allowed_users, '[]'::jsonb)) AS member(value)
+) AS pairs
+JOIN public.channels c ON c.uid = pairs.channel_uid
+JOIN public.users u ON u.uid::text = pairs.user_uid
+ON CONFLICT (channel_uid, user_uid) DO NOTHING;
+
+UPDATE public.users u
+SET allowed_channels = COALESCE(
+    (SELECT jsonb_agg(m.channel_uid ORDER BY m.id) FROM public.channel_membership m WHERE m.user_uid = u.uid::text),
+    '[]'::jsonb
+);
+
+UPDATE public.channels c
+SET allowed_users = COALESCE(
+    (SELECT jsonb_agg(m.user_uid ORDER BY m.id) FROM public.channel_membership m WHERE m.channel_uid = c.uid),
+    '[]'::jsonb
+);
+"""
+
+# آرایه‌های users.allowed_channels و channels.allowed_users برای سرویس Node
+# به صورت خودکار از روی جدول عضویت به‌روزرسانی می‌شوند (فقط سطرهای تغییر کرده)
+SYNC_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION public.channel_membership_sync_arrays()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.users u
+    SET allowed_channels = COALESCE(
+        (SELECT jsonb_agg(m.channel_uid ORDER BY m.id) FROM public.channel_membership m WHERE m.user_uid = u.uid::text),
+        '[]'::jsonb
+    )
+    WHERE u.uid IN (SELECT DISTINCT changed.user_uid::uuid FROM changed_rows changed);
+
+    UPDATE public.channels c
+    SET allowed_users = COALESCE(
+        (SELECT jsonb_agg(m.user_uid ORDER BY m.id) FROM public.channel_membership m WHERE m.channel_uid = c.uid),
+        '[]'::jsonb
+    )
+    WHERE c.uid IN (SELECT DISTINCT changed.channel_uid FROM changed_rows changed);
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER channel_membership_after_insert
+AFTER INSERT ON public.channel_membership
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.channel_membership_sync_arrays();
+
+CREATE TRIGGER channel_membership_after_delete
+AFTER DELETE ON public.channel_membership
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.channel_membership_sync_arrays();
+"""
+
+DROP_SYNC_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS channel_membership_after_insert ON public.channel_membership;
+DROP TRIGGER IF EXISTS channel_membership_after_delete ON public.channel_membership;
+DROP FUNCTION IF EXISTS public.channel_membership_sync_arrays();
+"""
+
+# توابع RPC مهاجرت 0012 با همان امضا، این بار روی جدول عضویت
+MEMBERSHIP_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION public.append_channel_to_users(p_channel_uid text, p_user_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH targets AS (
+        SELECT u.uid::text AS user_uid FROM public.users u WHERE u.uid = ANY(p_user_uids::uuid[])
+    ), inserted AS (
+        INSERT INTO public.channel_membership (channel_uid, user_uid, created_at)
+        SELECT p_channel_uid, targets.user_uid, now() FROM targets
+        ON CONFLICT (channel_uid, user_uid) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM targets;
+$$;
+
+CREATE OR REPLACE FUNCTION public.remove_channel_from_users(p_channel_uid text, p_user_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM public.channel_membership
+        WHERE channel_uid = p_channel_uid AND user_uid = ANY(p_user_uids)
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.users WHERE uid = ANY(p_user_uids::uuid[]);
+$$;
+
+CREATE OR REPLACE FUNCTION public.append_user_to_channels(p_user_uid text, p_channel_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH targets AS (
+        SELECT c.uid AS channel_uid FROM public.channels c WHERE c.uid = ANY(p_channel_uids)
+    ), inserted AS (
+        INSERT INTO public.channel_membership (channel_uid, user_uid, created_at)
+        SELECT targets.channel_uid, p_user_uid, now() FROM targets
+        ON CONFLICT (channel_uid, user_uid) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM targets;
+$$;
+
+CREATE OR REPLACE FUNCTION public.remove_user_from_channels(p_user_uid text, p_channel_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM public.channel_membership
+        WHERE user_uid = p_user_uid AND channel_uid = ANY(p_channel_uids)
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM public.channels WHERE uid = ANY(p_channel_uids);
+$$;
+"""
+
+GRANTS_SQL = """
+GRANT SELECT, INSERT, DELETE ON public.channel_membership TO service_role;
+GRANT USAGE, SELECT ON SEQUENCE public.channel_membership_id_seq TO service_role;
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+
+def _previous_membership_functions_sql():
+    return import_module("console.migrations.0012_membership_rpc").MEMBERSHIP_FUNCTIONS_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("console", "0012_membership_rpc"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChannelMembership",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("channel_uid", models.CharField(max_length=50)),
+                ("user_uid", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "channel_membership",
+                "indexes": [
+                    models.Index(
+                        fields=["user_uid", "channel_uid"],
+                        name="channel_membership_user_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("channel_uid", "user_uid"),
+                        name="channel_membership_channel_user_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(SYNC_TRIGGERS_SQL, DROP_SYNC_TRIGGERS_SQL),
+        migrations.RunSQL(MEMBERSHIP_FUNCTIONS_SQL, _previous_membership_functions_sql()),
+        migrations.RunSQL(GRANTS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+# sequenceهای شناسه‌های عمومی 7 رقمی (console/ids.py)
+# هر مقدار sequence با یک جایگشت Feistel به یک شناسه یکتا در بازه 1000000 تا 9999999 نگاشت می‌شود؛
+# MAXVALUE برابر اندازه بازه است و NO CYCLE از تکرار شناسه پس از پر شدن بازه جلوگیری می‌کند
+PUBLIC_ID_SEQUENCES_SQL = """
+CREATE SEQUENCE IF NOT EXISTS public.console_channel_channel_id_seq
+    AS integer MINVALUE 1 MAXVALUE 9000000 NO CYCLE;
+CREATE SEQUENCE IF NOT EXISTS public.super_admin_super_admin_id_seq
+    AS integer MINVALUE 1 MAXVALUE 9000000 NO CYCLE;
+"""
+
+DROP_PUBLIC_ID_SEQUENCES_SQL = """
+DROP SEQUENCE IF EXISTS public.console_channel_channel_id_seq;
+DROP SEQUENCE IF EXISTS public.super_admin_super_admin_id_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("console", "0013_channel_membership"),
+    ]
+
+    operations = [
+        migrations.RunSQL(PUBLIC_ID_SEQUENCES_SQL, DROP_PUBLIC_ID_SEQUENCES_SQL),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+# توابع RPC عملیات گروهی کانال‌ها (ChannelViewSet.batch):
+# - rename_channels: تغییر نام چند کانال با یک UPDATE (آرایه‌های هم‌اندازه uid و نام)
+# - remove_memberships: حذف زوج‌های (کانال، کاربر) با یک DELETE؛ تریگر عضویت آرایه‌ها را یک بار بازنویسی می‌کند
+BATCH_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION public.rename_channels(p_uids text[], p_names text[])
+RETURNS SETOF public.channels
+LANGUAGE sql
+AS $$
+    UPDATE public.channels c
+    SET name = renamed.name
+    FROM unnest(p_uids, p_names) AS renamed(uid, name)
+    WHERE c.uid = renamed.uid
+    RETURNING c.*;
+$$;
+
+CREATE OR REPLACE FUNCTION public.remove_memberships(p_channel_uids text[], p_user_uids text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM public.channel_membership m
+        USING unnest(p_channel_uids, p_user_uids) AS pairs(channel_uid, user_uid)
+        WHERE m.channel_uid = pairs.channel_uid AND m.user_uid = pairs.user_uid
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM deleted;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.rename_channels(text[], text[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.remove_memberships(text[], text[]) TO service_role;
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+DROP_BATCH_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS public.rename_channels(text[], text[]);
+DROP FUNCTION IF EXISTS public.remove_memberships(text[], text[]);
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("console", "0014_public_id_sequences"),
+    ]
+
+    operations = [
+        migrations.RunSQL(BATCH_FUNCTIONS_SQL, DROP_BATCH_FUNCTIONS_SQL),
+    ]
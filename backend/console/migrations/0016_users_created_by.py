@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+# صاحب سهمیه هر کاربر (نام کاربری سوپر ادمین)؛ حذف کاربر سهمیه همین سوپر ادمین را آزاد می‌کند
+# کاربران قدیمی مقدار NULL دارند
+OWNER_COLUMN_SQL = """
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS created_by varchar(150);
+CREATE INDEX IF NOT EXISTS users_created_by_idx ON public.users (created_by);
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+DROP_OWNER_COLUMN_SQL = """
+DROP INDEX IF EXISTS public.users_created_by_idx;
+ALTER TABLE public.users DROP COLUMN IF EXISTS created_by;
+
+NOTIFY pgrst, 'reload schema';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("console", "0015_channel_batch_rpc"),
+    ]
+
+    operations = [
+        migrations.RunSQL(OWNER_COLUMN_SQL, DROP_OWNER_COLUMN_SQL),
+    ]
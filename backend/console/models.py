@@ -1,32 +1,58 @@
 """
 console/models.py
 Defines ORM models for the console app:
-- generate_unique_id: helper to produce a unique random integer for fields.
+- generate_unique_id: next non-guessable 7-digit id for a field (sequence + permutation, console/ids.py).
+- save_with_unique_id: saves an instance, assigning its 7-digit id first if needed.
 - Channel: model with auto-generated unique channel_id, name, and ManyToMany link to User.
 - User: custom user model mapping to 'users' table with credentials and role.
 - SuperAdmin: model for storing super admin credentials and user limits.
+- ChannelMembership: normalized channel/user membership (source of truth for access).
 """
 
 from django.db import models
 import uuid
 
 import random
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
 from django.core.exceptions import ValidationError
 
-MIN_ID = 1000000
-MAX_ID = 9999999
+from .ids import MIN_ID, MAX_ID, next_public_id
+
+# شناسه‌هایی که پیش از sequence به صورت تصادفی ساخته شده‌اند ممکن است با یک شناسه جدید برابر باشند
+LEGACY_COLLISION_RETRIES = 3
 
-def generate_unique_id(model, field_name):
+def generate_unique_id(model, field_name, using=None):
     """
-    Generate a random integer between MIN_ID and MAX_ID that is unique
-    for the given model field (e.g. Channel.channel_id).
+    Return the next 7-digit id for the given model field (e.g. Channel.channel_id).
+    On PostgreSQL the id comes from a sequence mapped through a keyed permutation, so no
+    lookup query is needed; other databases fall back to random values checked with exists().
     """
+    using = using or router.db_for_write(model)
+    if connections[using].vendor == 'postgresql':
+        return next_public_id(model, field_name, using)
     while True:
         value = random.randint(MIN_ID, MAX_ID)
-        if not model.objects.filter(**{field_name: value}).exists():
+        if not model.objects.using(using).filter(**{field_name: value}).exists():
             return value
 
+def save_with_unique_id(instance, field_name, save, using=None):
+    """
+    Run save() after assigning instance.<field_name> when it is empty.
+    A unique violation with an id from the old random scheme is retried with the next id
+    inside a savepoint.
+    """
+    if getattr(instance, field_name):
+        return save()
+    using = using or router.db_for_write(type(instance), instance=instance)
+    for attempt in range(LEGACY_COLLISION_RETRIES):
+        setattr(instance, field_name, generate_unique_id(type(instance), field_name, using))
+        try:
+            with transaction.atomic(using=using):
+                return save()
+        except IntegrityError:
+            if attempt == LEGACY_COLLISION_RETRIES - 1:
+                raise
+
 class Channel(models.Model):
     """
     Channel model with:
@@ -47,16 +73,13 @@ class Channel(models.Model):
     )
 
     def save(self, *args, **kwargs):
-        # On first save, assign a unique channel_id
-        if not self.channel_id:
-            self.channel_id = generate_unique_id(Channel, 'channel_id')
-        # Validate channel_id remains within defined bounds
-        if not (MIN_ID <= self.channel_id <= MAX_ID):
+        # Validate an explicitly set channel_id remains within defined bounds
+        if self.channel_id and not (MIN_ID <= self.channel_id <= MAX_ID):
             raise ValidationError(
                 f'channel_id must be between {MIN_ID} and {MAX_ID}'
             )
-        # Proceed with normal save
-        super().save(*args, **kwargs)
+        # On first save, assign a unique channel_id and proceed with normal save
+        save_with_unique_id(self, 'channel_id', lambda: super(Channel, self).save(*args, **kwargs), kwargs.get('using'))
 
     def __str__(self):
         # String representation returns channel name
@@ -71,6 +94,7 @@ class User(models.Model):
     - active: account status flag
     - created_at: timestamp of account creation
     - allowed_channels: list of channel UIDs
+    - created_by: username of the super admin whose quota the user counts against
     """
     uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     username = models.CharField(max_length=255, unique=True)
@@ -78,6 +102,7 @@ class User(models.Model):
     active = models.BooleanField(default=True)
     allowed_channels = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.CharField(max_length=150, null=True, blank=True)
 
     class Meta:
         db_table = 'users'
@@ -114,9 +139,32 @@ class SuperAdmin(models.Model):
 
     def save(self, *args, **kwargs):
         # On first save, assign a unique super_admin_id
-        if not self.super_admin_id:
-            self.super_admin_id = generate_unique_id(SuperAdmin, 'super_admin_id')
-        super().save(*args, **kwargs)
+        save_with_unique_id(self, 'super_admin_id', lambda: super(SuperAdmin, self).save(*args, **kwargs), kwargs.get('using'))
 
     def __str__(self):
         return self.admin_super_user
+
+class ChannelMembership(models.Model):
+    """
+    Normalized membership table, one row per (channel, user) pair:
+    - channel_uid: uid of the channel in the 'channels' table
+    - user_uid: uid of the user in the 'users' table
+    - created_at: when the membership was granted
+    users.allowed_channels and channels.allowed_users are derived from this
+    table by database triggers and kept only for read compatibility.
+    """
+    channel_uid = models.CharField(max_length=50)
+    user_uid = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'channel_membership'
+        constraints = [
+            models.UniqueConstraint(fields=['channel_uid', 'user_uid'], name='channel_membership_channel_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user_uid', 'channel_uid'], name='channel_membership_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel_uid}:{self.user_uid}"
@@ -0,0 +1,188 @@
+"""
+console/pagination.py
+Keyset (cursor) pagination for list endpoints that proxy PostgREST tables:
+- KeysetPagination: parses limit/cursor/fields/count query params and builds the
+  matching PostgREST query string and Range/Prefer headers.
+- PaginationError: raised for invalid query params (mapped to HTTP 400 by the views).
+
+Pages are ordered by the ordering keys (users: (created_at, uid); channels: (uid,), the
+channels table has no created_at column) and continued with an opaque cursor holding the
+last row's key, so every page costs the same regardless of its position in the table.
+The last key must be unique and non-null; the leading key may repeat or be NULL (NULLs sort
+last, as PostgreSQL does for ascending order).
+"""
+
+import base64
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+FIELD_NAME_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+COUNT_MODES = ('exact', 'estimated')
+
+
+class PaginationError(ValueError):
+    """پارامترهای صفحه‌بندی نامعتبر"""
+
+
+@dataclass
+class PageRequest:
+    limit: int
+    cursor: Optional[List[Any]] = None
+    fields: List[str] = field(default_factory=list)
+    count: Optional[str] = None
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("cursor نامعتبر است")
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError("cursor نامعتبر است")
+    return values
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    """تبدیل پارامتر fields=a,b به لیست ستون‌ها (فقط نام ستون ساده مجاز است)"""
+    if not value:
+        return []
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    for name in fields:
+        if not FIELD_NAME_RE.match(name):
+            raise PaginationError(f"نام فیلد نامعتبر است: {name}")
+    return list(dict.fromkeys(fields))
+
+
+def select_clause(fields: List[str]) -> str:
+    return ','.join(fields) if fields else '*'
+
+
+def _quote_value(value: Any) -> str:
+    # مقدارها داخل or=(...) در کوتیشن قرار می‌گیرند تا کاراکترهای رزرو شده مشکلی ایجاد نکنند
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+
+class KeysetPagination:
+    """
+    صفحه‌بندی بر اساس کلید (created_at, uid) یا فقط (uid,) برای جداول PostgREST
+    """
+    default_limit = 100
+    max_limit = 1000
+
+    def __init__(self, ordering: Tuple[str, ...] = ('created_at', 'uid')):
+        if not 1 <= len(ordering) <= 2:
+            raise ValueError("ordering باید یک یا دو ستون داشته باشد")
+        self.ordering = tuple(ordering)
+
+    def is_requested(self, query_params) -> bool:
+        return 'limit' in query_params or 'cursor' in query_params
+
+    def parse(self, query_params) -> PageRequest:
+        limit = query_params.get('limit')
+        if limit in (None, ''):
+            limit = self.default_limit
+        else:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise PaginationError("limit باید عدد صحیح باشد")
+            if limit < 1:
+                raise PaginationError("limit باید بزرگتر از صفر باشد")
+            limit = min(limit, self.max_limit)
+
+        cursor = query_params.get('cursor')
+        count = query_params.get('count') or None
+        if count is not None and count not in COUNT_MODES:
+            raise PaginationError("count باید exact یا estimated باشد")
+
+        return PageRequest(
+            limit=limit,
+            cursor=decode_cursor(cursor, len(self.ordering)) if cursor else None,
+            fields=parse_fields(query_params.get('fields')),
+            count=count,
+        )
+
+    def build_query(self, page: PageRequest) -> Tuple[str, Dict[str, str]]:
+        """
+        ساخت query string و هدرهای PostgREST برای یک صفحه
+        یک سطر بیشتر از limit درخواست می‌شود تا وجود صفحه بعد مشخص شود
+        """
+        fields = page.fields
+        if fields:
+            # ستون‌های کلید برای ساخت cursor صفحه بعد لازم هستند
+            fields = fields + [key for key in self.ordering if key not in fields]
+        params = [
+            f"select={select_clause(fields)}",
+            f"order={','.join(f'{key}.asc' for key in self.ordering)}",
+        ]
+        if page.cursor:
+            condition = f"({','.join(self._after_cursor(page.cursor))})"
+            params.append(f"or={quote(condition, safe='(),.')}")
+
+        headers = {
+            'Range-Unit': 'items',
+            'Range': f"0-{page.limit}",
+        }
+        if page.count and not page.cursor:
+            headers['Prefer'] = f"count={page.count}"
+        return '&'.join(params), headers
+
+    def _after_cursor(self, cursor: List[Any]) -> List[str]:
+        """
+        شرط‌های سطرهای پس از cursor (ترکیب با or)
+        ستون اول ممکن است تکراری یا NULL باشد؛ NULL ها در ترتیب صعودی در انتها قرار می‌گیرند
+        """
+        last = self.ordering[-1]
+        last_value = _quote_value(cursor[-1])
+        if len(self.ordering) == 1:
+            return [f"{last}.gt.{last_value}"]
+
+        first = self.ordering[0]
+        if cursor[0] is None:
+            return [f"and({first}.is.null,{last}.gt.{last_value})"]
+        first_value = _quote_value(cursor[0])
+        return [
+            f"{first}.gt.{first_value}",
+            f"and({first}.eq.{first_value},{last}.gt.{last_value})",
+            f"{first}.is.null",
+        ]
+
+    def count_query(self, page: PageRequest) -> Tuple[str, Dict[str, str]]:
+        """query و هدرها برای شمارش کل سطرها (وقتی cursor داده شده است)"""
+        return f"select={self.ordering[-1]}", {
+            'Range-Unit': 'items',
+            'Range': '0-0',
+            'Prefer': f"count={page.count}",
+        }
+
+    @staticmethod
+    def parse_total(content_range: Optional[str]) -> Optional[int]:
+        """استخراج تعداد کل از هدر Content-Range (مثلاً 0-24/3573)"""
+        if not content_range or '/' not in content_range:
+            return None
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+
+    def page_body(self, page: PageRequest, rows: List[Dict[str, Any]], total: Optional[int] = None) -> Dict[str, Any]:
+        next_cursor = None
+        if len(rows) > page.limit:
+            rows = rows[:page.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([last.get(key) for key in self.ordering])
+        body = {
+            'results': rows,
+            'next_cursor': next_cursor,
+        }
+        if page.count:
+            body['count'] = total
+        return body
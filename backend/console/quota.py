@@ -0,0 +1,80 @@
+"""
+console/quota.py
+User quota of super admins (SuperAdmin.user_limit / user_count):
+- reserve: takes slots for new users in one conditional UPDATE
+  (user_count = user_count + n WHERE user_count + n <= user_limit).
+- release: gives slots back after a delete or a failed create.
+- quota_owner: the SuperAdmin account of the session user, if any.
+- OWNER_COLUMN: users.created_by records the SuperAdmin charged for each user, so a delete
+  releases the slot of the owning admin, whoever sends the request (row_owner).
+
+A create without a resolvable owner (anonymous request, or a session user that is not a
+SuperAdmin) is rejected: reserve() returns False instead of skipping the limit.
+
+The check and the increment happen in a single statement, so concurrent creates and
+bulk imports can never push user_count above user_limit. There is no read-modify-write
+and no COUNT(*) over the users table.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import SuperAdmin
+
+logger = logging.getLogger(__name__)
+
+DATABASE_ALIAS = 'supabase'
+OWNER_COLUMN = 'created_by'
+
+
+def quota_owner(request) -> Optional[str]:
+    """
+    نام کاربری سوپر ادمین صاحب سهمیه برای درخواست فعلی
+    (کاربر session در Django، حتی اگر view احراز هویت DRF نداشته باشد)
+    """
+    django_request = getattr(request, '_request', request)
+    user = getattr(django_request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.get_username()
+
+
+def row_owner(row: Optional[Dict[str, Any]]) -> Optional[str]:
+    """سوپر ادمینی که سهمیه کاربر (سطر users) از او کسر شده است"""
+    if not isinstance(row, dict):
+        return None
+    return row.get(OWNER_COLUMN) or None
+
+
+def reserve(admin_username: Optional[str], count: int = 1) -> bool:
+    """
+    گرفتن count جای خالی از سهمیه سوپر ادمین به صورت اتمیک
+    بدون سوپر ادمین (یا با نامی که سوپر ادمین نیست) False برمی‌گردد؛ سقف هرگز دور زده نمی‌شود
+    """
+    if count <= 0:
+        return True
+    if not admin_username:
+        logger.warning("سوپر ادمین صاحب سهمیه برای این درخواست یافت نشد")
+        return False
+    admins = SuperAdmin.objects.using(DATABASE_ALIAS).filter(admin_super_user=admin_username)
+    if admins.filter(user_count__lte=F('user_limit') - count).update(user_count=F('user_count') + count):
+        return True
+    # فقط در مسیر شکست: آیا اصلاً سوپر ادمینی با این نام وجود دارد؟
+    if not admins.exists():
+        logger.warning("%s سوپر ادمین نیست و سهمیه‌ای برای ساخت کاربر ندارد", admin_username)
+    else:
+        logger.warning("سهمیه کاربران سوپر ادمین %s برای %s کاربر جدید کافی نیست", admin_username, count)
+    return False
+
+
+def release(admin_username: Optional[str], count: int = 1) -> None:
+    """بازگرداندن count جای خالی به سهمیه (user_count هیچ‌گاه منفی نمی‌شود)"""
+    if not admin_username or count <= 0:
+        return
+    SuperAdmin.objects.using(DATABASE_ALIAS).filter(admin_super_user=admin_username).update(
+        user_count=Greatest(F('user_count') - count, 0)
+    )
+
@@ -0,0 +1,730 @@
+"""
+console/repository.py
+Data-access backends for the channel/user views (console/views.py):
+- RestRepository: reads and writes through Kong/PostgREST (views._make_request).
+- DirectRepository: raw SQL on a Django database alias (settings.DATABASES['supabase']),
+  with membership changes in one transaction under SELECT ... FOR UPDATE row locks.
+- get_repository: the configured backend (settings.CONSOLE_REPOSITORY).
+
+Both backends keep the _make_request contract: lists of row dicts shaped like PostgREST
+JSON (uuid/timestamps as strings), None on error. Auth (GoTrue) calls are not data access
+and always stay on HTTP. Per-operation call counts and timings are kept in stats() so the
+two backends can be compared on /api/metrics/.
+"""
+
+import datetime
+import decimal
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from .cache import get_row_cache
+from .log import Preview
+from .pagination import KeysetPagination, PageRequest, select_clause
+
+logger = logging.getLogger(__name__)
+
+# نوع ستون uid در هر جدول (برای cast پارامترها در SQL مستقیم)
+UID_TYPES = {'channels': 'text', 'users': 'uuid'}
+TABLES = ('channels', 'users')
+# حداکثر سطر در هر INSERT چند سطری (محدودیت اندازه بدنه PostgREST و تعداد پارامترهای Postgres)
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+def _bulk_chunks(rows: list, size: int = BULK_INSERT_CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _membership_column(column: str) -> str:
+    if column not in ('channel_uid', 'user_uid'):
+        raise ValueError(f"ستون عضویت نامعتبر: {column}")
+    return column
+
+
+def _membership_rows(pairs) -> List[Dict[str, Any]]:
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return [
+        {'channel_uid': str(channel_uid), 'user_uid': str(user_uid), 'created_at': created_at}
+        for channel_uid, user_uid in dict.fromkeys(pairs)
+    ]
+
+
+class Repository(ABC):
+    """رابط مشترک backendهای دسترسی به داده کانال‌ها و کاربران"""
+    backend = 'none'
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._timings: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def _timed(self, operation: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                entry = self._timings.setdefault(operation, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            operations = {
+                name: {'calls': calls, 'total_ms': round(total * 1000, 3),
+                       'avg_ms': round(total * 1000 / calls, 3) if calls else 0}
+                for name, (calls, total) in self._timings.items()
+            }
+        return {'backend': self.backend, 'operations': operations}
+
+    # خواندن
+    @abstractmethod
+    def get_rows(self, table: str, uid: str) -> Optional[list]:
+        """سطر با uid: لیست یک عضوی، لیست خالی یا None در صورت خطا"""
+
+    @abstractmethod
+    def find(self, table: str, column: str, value: Any) -> Optional[list]:
+        """سطرهای column = value"""
+
+    @abstractmethod
+    def rows_in(self, table: str, column: str, values: list, select: str = '*') -> Optional[list]:
+        """سطرهایی که مقدار column آن‌ها در values است؛ None اگر هر بخشی از جستجو با خطا مواجه شود"""
+
+    @abstractmethod
+    def member_ids(self, column: str, value: str) -> Optional[list]:
+        """
+        شناسه‌های طرف دیگر عضویت از channel_membership
+        column=channel_uid: شناسه کاربران کانال، column=user_uid: شناسه کانال‌های کاربر
+        """
+
+    @abstractmethod
+    def list_rows(self, table: str, fields: List[str]) -> Optional[list]:
+        """همه سطرهای جدول (بدون صفحه‌بندی)"""
+
+    @abstractmethod
+    def list_page(self, table: str, pagination: KeysetPagination, page: PageRequest) -> Optional[Tuple[list, Optional[int]]]:
+        """یک صفحه (limit + 1 سطر) و تعداد کل در صورت درخواست count؛ None در صورت خطا"""
+
+    # نوشتن
+    @abstractmethod
+    def insert(self, table: str, row: Dict[str, Any]) -> Optional[list]:
+        """سطر درج شده (لیست) یا None در صورت خطا"""
+
+    @abstractmethod
+    def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> list:
+        """
+        درج چند سطر با INSERT چند سطری (همه سطرها باید ستون‌های یکسان داشته باشند)
+        خروجی سطرهای درج شده؛ در صورت خطا فقط سطرهایی که واقعاً درج شده‌اند، تا فراخواننده
+        سهمیه، عضویت‌ها و کاربران Auth را برای هر سطر بر اساس نتیجه واقعی آن تنظیم کند
+        """
+
+    @abstractmethod
+    def update(self, table: str, uid: str, changes: Dict[str, Any]) -> Optional[list]:
+        """سطر به‌روز شده (لیست) یا None در صورت خطا"""
+
+    @abstractmethod
+    def rename_channels(self, names: Dict[str, str]) -> Optional[list]:
+        """تغییر نام چند کانال (uid -> نام جدید) با یک دستور؛ سطرهای به‌روز شده یا None در صورت خطا"""
+
+    @abstractmethod
+    def delete(self, table: str, uid: str) -> bool:
+        """حذف سطر با uid"""
+
+    @abstractmethod
+    def delete_many(self, table: str, uids: list) -> bool:
+        """حذف چند سطر با فیلتر uid in (...)"""
+
+    @abstractmethod
+    def delete_memberships(self, column: str, value: str) -> bool:
+        """حذف همه عضویت‌های یک کانال (column=channel_uid) یا یک کاربر (column=user_uid)"""
+
+    @abstractmethod
+    def delete_memberships_in(self, column: str, values: list) -> bool:
+        """حذف همه عضویت‌های چند کانال یا چند کاربر با یک دستور"""
+
+    @abstractmethod
+    def memberships_in(self, column: str, values: list) -> Optional[List[Tuple[str, str]]]:
+        """زوج‌های (channel_uid, user_uid) عضویت‌هایی که مقدار column آن‌ها در values است"""
+
+    @abstractmethod
+    def add_memberships(self, pairs: List[Tuple[str, str]]) -> bool:
+        """
+        افزودن زوج‌های (channel_uid, user_uid) با یک INSERT مجموعه‌ای (زوج‌های تکراری نادیده گرفته می‌شوند)
+        فراخواننده مسئول وجود کانال‌ها و کاربران است
+        """
+
+    @abstractmethod
+    def remove_memberships(self, pairs: List[Tuple[str, str]]) -> bool:
+        """حذف زوج‌های (channel_uid, user_uid) با یک DELETE مجموعه‌ای"""
+
+    # عضویت؛ خروجی تعداد سطرهای یافت شده طرف مقابل یا None در صورت خطا
+    @abstractmethod
+    def add_users_to_channel(self, channel_uid: str, user_uids: list) -> Optional[int]:
+        """افزودن کاربران به کانال"""
+
+    @abstractmethod
+    def remove_users_from_channel(self, channel_uid: str, user_uids: list) -> Optional[int]:
+        """حذف کاربران از کانال"""
+
+    @abstractmethod
+    def add_channels_to_user(self, user_uid: str, channel_uids: list) -> Optional[int]:
+        """افزودن کانال‌ها به کاربر"""
+
+    @abstractmethod
+    def remove_channels_from_user(self, user_uid: str, channel_uids: list) -> Optional[int]:
+        """حذف کانال‌ها از کاربر"""
+
+
+class RestRepository(Repository):
+    """دسترسی به داده از طریق Kong/PostgREST"""
+    backend = 'rest'
+
+    @staticmethod
+    def _views():
+        # views این ماژول را import می‌کند؛ import تنبل از حلقه جلوگیری می‌کند
+        from . import views
+        return views
+
+    def _request(self, *args, **kwargs):
+        return self._views()._make_request(*args, **kwargs)
+
+    def _rpc(self, function: str, params: Dict[str, Any]) -> Optional[Any]:
+        with self._timed(f"rpc:{function}"):
+            return self._request('POST', f"/rest/v1/rpc/{function}", params)
+
+    def get_rows(self, table, uid):
+        with self._timed('get_rows'):
+            return self._request('GET', f"/rest/v1/{table}?uid=eq.{uid}")
+
+    def find(self, table, column, value):
+        with self._timed('find'):
+            return self._request('GET', f"/rest/v1/{table}?{column}=eq.{value}")
+
+    def rows_in(self, table, column, values, select='*'):
+        views = self._views()
+        rows = []
+        with self._timed('rows_in'):
+            for chunk in views._chunks(list(values)):
+                response = self._request('GET', f"/rest/v1/{table}?{column}=in.({views._in_list(chunk)})&select={select}")
+                if not isinstance(response, list):
+                    # نتیجه ناقص با «سطر یافت نشد» اشتباه گرفته می‌شود
+                    return None
+                rows.extend(response)
+        return rows
+
+    def member_ids(self, column, value):
+        other = 'user_uid' if column == 'channel_uid' else 'channel_uid'
+        with self._timed('member_ids'):
+            rows = self._request('GET', f"/rest/v1/channel_membership?{column}=eq.{value}&select={other}")
+        if not isinstance(rows, list):
+            return None
+        return [row[other] for row in rows]
+
+    def list_rows(self, table, fields):
+        path = f"/rest/v1/{table}?select={select_clause(fields)}" if fields else f"/rest/v1/{table}"
+        with self._timed('list_rows'):
+            response = self._request('GET', path, None)
+        if response is True:
+            return []
+        return response if isinstance(response, list) else None
+
+    def list_page(self, table, pagination, page):
+        views = self._views()
+        query, extra_headers = pagination.build_query(page)
+        with self._timed('list_page'):
+            response = views.transport.request('GET', f"/rest/v1/{table}?{query}", headers=views._service_headers(extra_headers))
+            if response.status_code >= 400:
+                logger.error("خطا در دریافت صفحه %s از Supabase: %s - %s", table, response.status_code, Preview(response.text))
+                return None
+
+            total = None
+            if page.count:
+                content_range = response.headers.get('Content-Range')
+                if page.cursor:
+                    count_query, count_headers = pagination.count_query(page)
+                    count_response = views.transport.request('HEAD', f"/rest/v1/{table}?{count_query}", headers=views._service_headers(count_headers))
+                    content_range = count_response.headers.get('Content-Range')
+                total = pagination.parse_total(content_range)
+            return response.json(), total
+
+    def insert(self, table, row):
+        with self._timed('insert'):
+            response = self._request('POST', f"/rest/v1/{table}", row)
+        return response if isinstance(response, list) else None
+
+    def insert_many(self, table, rows):
+        """
+        هر بخش یک درخواست (و یک تراکنش) جداگانه است؛ شکست یک بخش بخش‌های بعدی را متوقف نمی‌کند
+        درخواست ناموفق ممکن است با این حال commit شده باشد (مثلاً پایان زمان خواندن)، پس سطرهای
+        آن بخش با uid دوباره خوانده می‌شوند تا خروجی دقیقاً سطرهای موجود باشد
+        """
+        inserted = []
+        with self._timed('insert_many'):
+            for chunk in _bulk_chunks(list(rows)):
+                response = self._request('POST', f"/rest/v1/{table}", chunk)
+                if isinstance(response, list):
+                    inserted.extend(response)
+                    continue
+                logger.error("خطا در درج گروهی %s سطر در %s", len(chunk), table)
+                uids = [row['uid'] for row in chunk if row.get('uid')]
+                if uids:
+                    inserted.extend(self.rows_in(table, 'uid', uids) or [])
+        return inserted
+
+    def update(self, table, uid, changes):
+        with self._timed('update'):
+            response = self._request('PATCH', f"/rest/v1/{table}?uid=eq.{uid}", changes, returning='representation')
+        return response or None
+
+    def rename_channels(self, names):
+        if not names:
+            return []
+        response = self._rpc('rename_channels', {'p_uids': list(names), 'p_names': list(names.values())})
+        return response if isinstance(response, list) else None
+
+    def delete(self, table, uid):
+        with self._timed('delete'):
+            return self._request('DELETE', f"/rest/v1/{table}?uid=eq.{uid}", returning='minimal') is not None
+
+    def _delete_in(self, operation, resource, column, values):
+        views = self._views()
+        with self._timed(operation):
+            for chunk in views._chunks(list(dict.fromkeys(str(value) for value in values))):
+                if self._request('DELETE', f"/rest/v1/{resource}?{column}=in.({views._in_list(chunk)})", returning='minimal') is None:
+                    return False
+        return True
+
+    def delete_many(self, table, uids):
+        return self._delete_in('delete_many', table, 'uid', uids)
+
+    def delete_memberships(self, column, value):
+        with self._timed('delete_memberships'):
+            return self._request('DELETE', f"/rest/v1/channel_membership?{column}=eq.{value}", returning='minimal') is not None
+
+    def delete_memberships_in(self, column, values):
+        return self._delete_in('delete_memberships_in', 'channel_membership', _membership_column(column), values)
+
+    def memberships_in(self, column, values):
+        views = self._views()
+        pairs = []
+        with self._timed('memberships_in'):
+            for chunk in views._chunks(list(dict.fromkeys(str(value) for value in values))):
+                rows = self._request('GET', f"/rest/v1/channel_membership?{_membership_column(column)}=in.({views._in_list(chunk)})&select=channel_uid,user_uid")
+                if not isinstance(rows, list):
+                    return None
+                pairs.extend((row['channel_uid'], row['user_uid']) for row in rows)
+        return pairs
+
+    def add_memberships(self, pairs):
+        rows = _membership_rows(pairs)
+        with self._timed('add_memberships'):
+            for chunk in _bulk_chunks(rows):
+                response = self._request(
+                    'POST', "/rest/v1/channel_membership?on_conflict=channel_uid,user_uid", chunk,
+                    headers={'Prefer': 'resolution=ignore-duplicates'}, returning='minimal',
+                )
+                if response is None:
+                    return False
+        return True
+
+    def remove_memberships(self, pairs):
+        pairs = list(dict.fromkeys((str(channel_uid), str(user_uid)) for channel_uid, user_uid in pairs))
+        if not pairs:
+            return True
+        return self._rpc('remove_memberships', {
+            'p_channel_uids': [pair[0] for pair in pairs],
+            'p_user_uids': [pair[1] for pair in pairs],
+        }) is not None
+
+    def add_users_to_channel(self, channel_uid, user_uids):
+        return self._rpc('append_channel_to_users', {'p_channel_uid': channel_uid, 'p_user_uids': user_uids})
+
+    def remove_users_from_channel(self, channel_uid, user_uids):
+        return self._rpc('remove_channel_from_users', {'p_channel_uid': channel_uid, 'p_user_uids': user_uids})
+
+    def add_channels_to_user(self, user_uid, channel_uids):
+        return self._rpc('append_user_to_channels', {'p_user_uid': user_uid, 'p_channel_uids': channel_uids})
+
+    def remove_channels_from_user(self, user_uid, channel_uids):
+        return self._rpc('remove_user_from_channels', {'p_user_uid': user_uid, 'p_channel_uids': channel_uids})
+
+
+def _jsonable(value: Any) -> Any:
+    """تبدیل مقدارهای Postgres به همان شکلی که PostgREST در JSON برمی‌گرداند"""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def _db_value(value: Any) -> Any:
+    # ستون‌های jsonb (allowed_users / allowed_channels) به صورت متن JSON ارسال می‌شوند
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class DirectRepository(Repository):
+    """
+    دسترسی مستقیم به Postgres روی یک alias از DATABASES (پیش‌فرض supabase)
+    ترتیب قفل‌ها همیشه ابتدا channels و سپس users است تا تغییرات همزمان عضویت بن‌بست ایجاد نکنند
+    """
+    backend = 'direct'
+
+    def __init__(self, alias: str = 'supabase'):
+        super().__init__()
+        self.alias = alias
+
+    @property
+    def _connection(self):
+        return connections[self.alias]
+
+    def _quote(self, name: str) -> str:
+        return self._connection.ops.quote_name(name)
+
+    def _table(self, table: str) -> str:
+        if table not in TABLES:
+            raise ValueError(f"جدول نامعتبر: {table}")
+        return f"public.{self._quote(table)}"
+
+    def _select(self, fields) -> str:
+        if not fields or fields == '*':
+            return '*'
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        return ', '.join(self._quote(name) for name in fields)
+
+    def _fetch(self, cursor) -> list:
+        columns = [column[0] for column in cursor.description]
+        return [{name: _jsonable(value) for name, value in zip(columns, row)} for row in cursor.fetchall()]
+
+    def _query(self, operation: str, sql: str, params=()) -> Optional[list]:
+        with self._timed(operation):
+            try:
+                with self._connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return self._fetch(cursor) if cursor.description else []
+            except DatabaseError as e:
+                logger.error("خطا در اجرای %s روی دیتابیس %s: %s", operation, self.alias, e)
+                return None
+
+    def _invalidate(self, table: str, uids) -> None:
+        get_row_cache().delete(table, [str(uid) for uid in uids])
+
+    def get_rows(self, table, uid):
+        return self._query('get_rows', f"SELECT * FROM {self._table(table)} WHERE uid = %s", [str(uid)])
+
+    def find(self, table, column, value):
+        return self._query('find', f"SELECT * FROM {self._table(table)} WHERE {self._quote(column)} = %s", [value])
+
+    def rows_in(self, table, column, values, select='*'):
+        values = [str(value) for value in values]
+        if not values:
+            return []
+        cast = UID_TYPES[table] if column == 'uid' else 'text'
+        rows = self._query(
+            'rows_in',
+            f"SELECT {self._select(select)} FROM {self._table(table)} WHERE {self._quote(column)} = ANY(%s::{cast}[])",
+            [values],
+        )
+        return rows
+
+    def member_ids(self, column, value):
+        other = 'user_uid' if column == 'channel_uid' else 'channel_uid'
+        rows = self._query(
+            'member_ids',
+            f"SELECT {other} FROM public.channel_membership WHERE {column} = %s ORDER BY id",
+            [str(value)],
+        )
+        if rows is None:
+            return None
+        return [row[other] for row in rows]
+
+    def list_rows(self, table, fields):
+        return self._query('list_rows', f"SELECT {self._select(fields)} FROM {self._table(table)}")
+
+    def list_page(self, table, pagination, page):
+        fields = page.fields
+        if fields:
+            fields = fields + [key for key in pagination.ordering if key not in fields]
+        keys = [self._quote(key) for key in pagination.ordering]
+        last, last_type = keys[-1], UID_TYPES[table]
+        sql = f"SELECT {self._select(fields)} FROM {self._table(table)}"
+        params: list = []
+        if page.cursor:
+            # همان شرط‌های KeysetPagination._after_cursor نسخه PostgREST
+            if len(keys) == 1:
+                sql += f" WHERE {last} > %s::{last_type}"
+                params.append(page.cursor[-1])
+            elif page.cursor[0] is None:
+                sql += f" WHERE {keys[0]} IS NULL AND {last} > %s::{last_type}"
+                params.append(page.cursor[-1])
+            else:
+                first = keys[0]
+                sql += (
+                    f" WHERE ({first} > %s::timestamptz"
+                    f" OR ({first} = %s::timestamptz AND {last} > %s::{last_type}) OR {first} IS NULL)"
+                )
+                params.extend([page.cursor[0], page.cursor[0], page.cursor[-1]])
+        sql += f" ORDER BY {', '.join(f'{key} ASC NULLS LAST' for key in keys)} LIMIT %s"
+        params.append(page.limit + 1)
+
+        rows = self._query('list_page', sql, params)
+        if rows is None:
+            return None
+        total = None
+        if page.count == 'exact':
+            result = self._query('count', f"SELECT count(*) AS total FROM {self._table(table)}")
+            total = result[0]['total'] if result else None
+        elif page.count == 'estimated':
+            result = self._query('count', "SELECT reltuples::bigint AS total FROM pg_class WHERE oid = %s::regclass", [f"public.{table}"])
+            total = max(result[0]['total'], 0) if result else None
+        return rows, total
+
+    def insert(self, table, row):
+        columns = list(row)
+        sql = (
+            f"INSERT INTO {self._table(table)} ({', '.join(self._quote(name) for name in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) RETURNING *"
+        )
+        return self._query('insert', sql, [_db_value(row[name]) for name in columns])
+
+    def insert_many(self, table, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        columns = list(rows[0])
+        row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+        inserted = []
+        with self._timed('insert_many'):
+            try:
+                # همه بخش‌ها در یک تراکنش: یا همه سطرها درج می‌شوند یا هیچ‌کدام
+                with transaction.atomic(using=self.alias), self._connection.cursor() as cursor:
+                    for chunk in _bulk_chunks(rows):
+                        cursor.execute(
+                            f"INSERT INTO {self._table(table)} ({', '.join(self._quote(name) for name in columns)}) "
+                            f"VALUES {', '.join([row_placeholder] * len(chunk))} RETURNING *",
+                            [_db_value(row.get(name)) for row in chunk for name in columns],
+                        )
+                        inserted.extend(self._fetch(cursor))
+            except DatabaseError as e:
+                logger.error("خطا در درج گروهی %s سطر در %s: %s", len(rows), table, e)
+                return []
+        return inserted
+
+    def update(self, table, uid, changes):
+        if not changes:
+            return self.get_rows(table, uid)
+        columns = list(changes)
+        sql = (
+            f"UPDATE {self._table(table)} SET {', '.join(f'{self._quote(name)} = %s' for name in columns)} "
+            f"WHERE uid = %s RETURNING *"
+        )
+        try:
+            return self._query('update', sql, [_db_value(changes[name]) for name in columns] + [str(uid)]) or None
+        finally:
+            self._invalidate(table, [uid])
+
+    def delete(self, table, uid):
+        try:
+            return self._query('delete', f"DELETE FROM {self._table(table)} WHERE uid = %s", [str(uid)]) is not None
+        finally:
+            self._invalidate(table, [uid])
+
+    def rename_channels(self, names):
+        if not names:
+            return []
+        try:
+            return self._query(
+                'rename_channels',
+                "UPDATE public.channels c SET name = renamed.name "
+                "FROM unnest(%s::text[], %s::text[]) AS renamed(uid, name) WHERE c.uid = renamed.uid RETURNING c.*",
+                [list(names), list(names.values())],
+            )
+        finally:
+            self._invalidate('channels', names)
+
+    def delete_many(self, table, uids):
+        uids = [str(uid) for uid in uids]
+        if not uids:
+            return True
+        try:
+            return self._query(
+                'delete_many',
+                f"DELETE FROM {self._table(table)} WHERE uid = ANY(%s::{UID_TYPES[table]}[])",
+                [uids],
+            ) is not None
+        finally:
+            self._invalidate(table, uids)
+
+    def _delete_memberships_where(self, operation: str, condition: str, params: list) -> bool:
+        # تریگر عضویت آرایه‌های کانال‌ها و کاربران را بازنویسی می‌کند
+        try:
+            with self._timed(operation):
+                with transaction.atomic(using=self.alias), self._connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM public.channel_membership m {condition} RETURNING m.channel_uid, m.user_uid",
+                        params,
+                    )
+                    pairs = cursor.fetchall()
+        except DatabaseError as e:
+            logger.error("خطا در %s: %s", operation, e)
+            return False
+        self._invalidate('channels', {pair[0] for pair in pairs})
+        self._invalidate('users', {pair[1] for pair in pairs})
+        return True
+
+    def delete_memberships(self, column, value):
+        return self._delete_memberships_where(
+            'delete_memberships', f"WHERE m.{_membership_column(column)} = %s", [str(value)],
+        )
+
+    def delete_memberships_in(self, column, values):
+        return self._delete_memberships_where(
+            'delete_memberships_in', f"WHERE m.{_membership_column(column)} = ANY(%s::text[])",
+            [[str(value) for value in values]],
+        )
+
+    def memberships_in(self, column, values):
+        rows = self._query(
+            'memberships_in',
+            f"SELECT channel_uid, user_uid FROM public.channel_membership WHERE {_membership_column(column)} = ANY(%s::text[]) ORDER BY id",
+            [[str(value) for value in values]],
+        )
+        if rows is None:
+            return None
+        return [(row['channel_uid'], row['user_uid']) for row in rows]
+
+    def remove_memberships(self, pairs):
+        pairs = list(dict.fromkeys((str(channel_uid), str(user_uid)) for channel_uid, user_uid in pairs))
+        if not pairs:
+            return True
+        return self._delete_memberships_where(
+            'remove_memberships',
+            "USING unnest(%s::text[], %s::text[]) AS pairs(channel_uid, user_uid) "
+            "WHERE m.channel_uid = pairs.channel_uid AND m.user_uid = pairs.user_uid",
+            [[pair[0] for pair in pairs], [pair[1] for pair in pairs]],
+        )
+
+    def add_memberships(self, pairs):
+        rows = _membership_rows(pairs)
+        if not rows:
+            return True
+        try:
+            with self._timed('add_memberships'):
+                with transaction.atomic(using=self.alias), self._connection.cursor() as cursor:
+                    cursor.execute(
+                        "INSERT INTO public.channel_membership (channel_uid, user_uid, created_at) "
+                        "SELECT pairs.channel_uid, pairs.user_uid, now() FROM unnest(%s::text[], %s::text[]) AS pairs(channel_uid, user_uid) "
+                        "ON CONFLICT (channel_uid, user_uid) DO NOTHING",
+                        [[row['channel_uid'] for row in rows], [row['user_uid'] for row in rows]],
+                    )
+        except DatabaseError as e:
+            logger.error("خطا در افزودن گروهی %s عضویت: %s", len(rows), e)
+            return False
+        finally:
+            self._invalidate('channels', {row['channel_uid'] for row in rows})
+            self._invalidate('users', {row['user_uid'] for row in rows})
+        return True
+
+    def _change_membership(self, operation: str, channel_uids: list, user_uids: list, add: bool, count_side: str) -> Optional[int]:
+        """
+        افزودن/حذف زوج‌های (کانال، کاربر) در یک تراکنش
+        سطرهای کانال و کاربر با SELECT ... FOR UPDATE قفل می‌شوند تا تغییرات همزمان
+        عضویت یک سطر پشت سر هم اجرا شوند؛ خروجی تعداد سطرهای یافت شده در count_side
+        """
+        channel_uids = list(dict.fromkeys(str(uid) for uid in channel_uids))
+        user_uids = list(dict.fromkeys(str(uid) for uid in user_uids))
+        try:
+            with self._timed(operation):
+                with transaction.atomic(using=self.alias), self._connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT uid FROM public.channels WHERE uid = ANY(%s::text[]) ORDER BY uid FOR UPDATE",
+                        [channel_uids],
+                    )
+                    found_channels = [row[0] for row in cursor.fetchall()]
+                    cursor.execute(
+                        "SELECT uid::text FROM public.users WHERE uid = ANY(%s::uuid[]) ORDER BY uid FOR UPDATE",
+                        [user_uids],
+                    )
+                    found_users = [row[0] for row in cursor.fetchall()]
+
+                    if add:
+                        # فقط کانال‌ها/کاربران موجود، مانند توابع RPC مهاجرت 0013
+                        pair_channels = found_channels if count_side == 'channels' else channel_uids
+                        pair_users = found_users if count_side == 'users' else user_uids
+                        cursor.execute(
+                            "INSERT INTO public.channel_membership (channel_uid, user_uid, created_at) "
+                            "SELECT c.uid, u.uid, now() FROM unnest(%s::text[]) AS c(uid) CROSS JOIN unnest(%s::text[]) AS u(uid) "
+                            "ON CONFLICT (channel_uid, user_uid) DO NOTHING",
+                            [pair_channels, pair_users],
+                        )
+                    else:
+                        cursor.execute(
+                            "DELETE FROM public.channel_membership WHERE channel_uid = ANY(%s::text[]) AND user_uid = ANY(%s::text[])",
+                            [channel_uids, user_uids],
+                        )
+        except DatabaseError as e:
+            logger.error("خطا در %s: %s", operation, e)
+            return None
+        finally:
+            self._invalidate('channels', channel_uids)
+            self._invalidate('users', user_uids)
+        return len(found_channels if count_side == 'channels' else found_users)
+
+    def add_users_to_channel(self, channel_uid, user_uids):
+        return self._change_membership('add_users_to_channel', [channel_uid], user_uids, add=True, count_side='users')
+
+    def remove_users_from_channel(self, channel_uid, user_uids):
+        return self._change_membership('remove_users_from_channel', [channel_uid], user_uids, add=False, count_side='users')
+
+    def add_channels_to_user(self, user_uid, channel_uids):
+        return self._change_membership('add_channels_to_user', channel_uids, [user_uid], add=True, count_side='channels')
+
+    def remove_channels_from_user(self, user_uid, channel_uids):
+        return self._change_membership('remove_channels_from_user', channel_uids, [user_uid], add=False, count_side='channels')
+
+
+_repository_lock = threading.Lock()
+_repository: Optional[Repository] = None
+
+
+def _build_repository() -> Repository:
+    config = getattr(settings, 'CONSOLE_REPOSITORY', {})
+    backend = config.get('BACKEND', 'rest')
+    if backend == 'direct':
+        return DirectRepository(alias=config.get('ALIAS', 'supabase'))
+    if backend != 'rest':
+        logger.warning("backend دسترسی به داده ناشناخته است (%s)؛ از rest استفاده می‌شود", backend)
+    return RestRepository()
+
+
+def get_repository() -> Repository:
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = _build_repository()
+    return _repository
+
+
+def reset_repository() -> None:
+    """ساخت دوباره backend بر اساس تنظیمات فعلی (برای تست‌ها)"""
+    global _repository
+    with _repository_lock:
+        _repository = None
@@ -26,13 +26,11 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """Create a new user with validated data"""
-        print(f"CREATE - IN SERIALIZER: {validated_data.get('password', 'No password')[:20]}...")  # Debug
         # password handled in views.py through create_user function
         return super().create(validated_data)
     
     def update(self, instance, validated_data):
         """Update a user with validated data"""
-        print(f"UPDATE - IN SERIALIZER: {validated_data.get('password', 'No password')[:20]}...")  # Debug
         
         # حذف فیلد password از validated_data اگر مقدار آن خالی یا undefined است
         if 'password' in validated_data and (validated_data['password'] is None or validated_data['password'] == '' or validated_data['password'] == 'undefined'):
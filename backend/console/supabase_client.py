@@ -8,13 +8,16 @@ import traceback
 import datetime
 import uuid
 
-# تنظیم لاگر
-logging.basicConfig(level=logging.DEBUG)
+from . import transport
+from .cache import invalidate_for_write
+from .log import Preview, log_bodies
+
+# سطح و مقصد لاگ در settings.LOGGING تعیین می‌شود (admin_panel/logging_config.py)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-_base_url = "http://kong:8000"
+_base_url = transport.BASE_URL
 _api_key = os.getenv("SERVICE_ROLE_KEY")
 
 if not _api_key:
@@ -31,86 +34,81 @@ headers = {
 def _make_request(method: str, endpoint: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
     url = f"{_base_url}{endpoint}"
     try:
-        logger.info(f"ارسال درخواست {method} به {url}")
-        logger.info(f"هدرها: {json.dumps(headers, ensure_ascii=False)}")
-        if data:
-            logger.info(f"داده‌های ارسالی: {json.dumps(data, ensure_ascii=False)}")
+        logger.debug("ارسال درخواست %s به %s", method, url)
+        bodies = log_bodies(logger)
+        if bodies and data:
+            logger.debug("داده‌های ارسالی: %s", Preview(data))
         
-        response = requests.request(method, url, headers=headers, json=data)
+        try:
+            response = transport.request(method, url, headers=headers, json=data)
+        finally:
+            invalidate_for_write(method, endpoint, data)
         
-        logger.info(f"کد وضعیت: {response.status_code}")
-        logger.info(f"پاسخ دریافتی: {response.text}")
+        logger.debug("کد وضعیت %s برای %s %s", response.status_code, method, endpoint)
+        if bodies:
+            logger.debug("پاسخ دریافتی: %s", Preview(response.text))
         
         if response.status_code >= 400:
-            error_data = {}
-            try:
-                error_data = response.json()
-            except:
-                error_data = {"error": response.text}
-                
-            logger.error(f"خطا در درخواست: {response.status_code}")
-            logger.error(f"متن خطا: {json.dumps(error_data, ensure_ascii=False)}")
+            logger.error("خطا در درخواست: %s - %s", response.status_code, Preview(response.text))
             return None
             
         response.raise_for_status()
         
         # اگر پاسخ خالی است و درخواست موفق بود، True برگردان
         if response.status_code in [200, 201, 204] and not response.text.strip():
-            logger.info("درخواست موفق اما پاسخ خالی")
+            logger.debug("درخواست موفق اما پاسخ خالی")
             return True
             
         # برای درخواست‌های DELETE، اگر کد وضعیت 200 است و پاسخ خالی است، True برگردان
         if method == "DELETE" and response.status_code == 200:
             if not response.text.strip():
-                logger.info("درخواست DELETE با موفقیت انجام شد")
+                logger.debug("درخواست DELETE با موفقیت انجام شد")
                 return True
             else:
                 logger.error("پاسخ غیرمنتظره برای درخواست DELETE")
                 return None
             
-        result = response.json()
-        logger.info(f"پاسخ پردازش شده: {json.dumps(result, ensure_ascii=False)}")
-        return result
+        return response.json()
     except requests.exceptions.RequestException as e:
-        logger.error(f"خطا در ارسال درخواست: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            try:
-                error_data = e.response.json()
-                logger.error(f"متن پاسخ خطا: {json.dumps(error_data, ensure_ascii=False)}")
-            except:
-                logger.error(f"متن پاسخ خطا: {e.response.text}")
+        logger.error("خطا در ارسال درخواست: %s", e)
+        if getattr(e, 'response', None) is not None:
+            logger.error("متن پاسخ خطا: %s", Preview(e.response.text))
         return None
 
-def create_user(username: str, password: str, role: str = 'user', active: bool = True, allowed_channels: list = None) -> Optional[Dict[str, Any]]:
+def auth_email(username: str) -> str:
+    """ایمیل کاربر در Auth؛ نام‌های کاربری بدون @ با دامنه example.com تبدیل می‌شوند"""
+    return username if '@' in username else f"{username}@example.com"
+
+def auth_user_payload(username: str, password: str, role: str = 'user', active: bool = True, allowed_channels: list = None) -> Dict[str, Any]:
+    """بدنه درخواست POST /auth/v1/admin/users برای یک کاربر"""
+    return {
+        "email": auth_email(username),
+        "password": password,
+        "email_confirm": True,
+        "user_metadata": {
+            "role": role,
+            "active": active,
+            "allowed_channels": allowed_channels or [],
+            "email_verified": True  # برای اجتناب از نیاز به تأیید ایمیل
+        }
+    }
+
+def create_user(username: str, password: str, role: str = 'user', active: bool = True, allowed_channels: list = None,
+                created_by: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     ایجاد کاربر جدید در Supabase Auth
     تبدیل نام کاربری به فرمت ایمیل با افزودن @example.com در صورت لزوم
+    created_by: سوپر ادمین صاحب سهمیه کاربر (ستون users.created_by)
     """
     auth_response = None
     try:
-        logger.info("شروع فرآیند ثبت کاربر جدید")
-        logger.info(f"اطلاعات ورودی: username={username}, role={role}, active={active}, allowed_channels={allowed_channels}")
+        logger.info("شروع فرآیند ثبت کاربر جدید: username=%s, role=%s", username, role)
         
         # تبدیل نام کاربری به فرمت ایمیل اگر در قالب ایمیل نیست
-        email = username
-        if '@' not in username:
-            email = f"{username}@example.com"
-            logger.info(f"نام کاربری به فرمت ایمیل تبدیل شد: {email}")
+        email = auth_email(username)
         
         # ساخت کاربر در Auth
-        auth_data = {
-            "email": email,
-            "password": password,
-            "email_confirm": True,
-            "user_metadata": {
-                "role": role,
-                "active": active,
-                "allowed_channels": allowed_channels or [],
-                "email_verified": True  # برای اجتناب از نیاز به تأیید ایمیل
-            }
-        }
-        
-        logger.info(f"داده‌های ارسالی به Auth: {auth_data}")
+        auth_data = auth_user_payload(username, password, role, active, allowed_channels)
         
         headers = {
             "apikey": _api_key,
@@ -120,40 +118,36 @@ def create_user(username: str, password: str, role: str = 'user', active: bool =
             "X-Client-Info": "supabase-js/1.0.0"
         }
         
-        logger.info(f"ارسال درخواست POST به http://kong:8000/auth/v1/admin/users")
-        logger.info(f"هدرها: {json.dumps(headers)}")
-        logger.info(f"داده‌های ارسالی: {json.dumps(auth_data)}")
+        logger.debug("ارسال درخواست POST به %s/auth/v1/admin/users", _base_url)
         
-        response = requests.post(
+        response = transport.request(
+            "POST",
             f"{_base_url}/auth/v1/admin/users",
             headers=headers,
             json=auth_data
         )
         
-        logger.info(f"کد وضعیت: {response.status_code}")
+        logger.debug("کد وضعیت: %s", response.status_code)
         
         # اگر پاسخ خالی باشد یا کد وضعیت مناسب نباشد، خطا برمی‌گرداند
         if response.status_code != 200 and response.status_code != 201:
-            logger.error(f"خطا در ساخت کاربر: {response.text}")
+            logger.error("خطا در ساخت کاربر: %s", Preview(response.text))
             return None
             
         try:
             auth_response = response.json()
-            logger.info(f"پاسخ دریافتی: {response.text}")
-            logger.info(f"پاسخ پردازش شده: {json.dumps(auth_response)}")
         except json.JSONDecodeError:
             logger.error("خطا در پردازش پاسخ JSON از Auth API")
-            logger.error(f"محتوای پاسخ: {response.text}")
+            logger.error("محتوای پاسخ: %s", Preview(response.text))
             auth_response = {"id": None, "email": email, "created_at": datetime.datetime.now().isoformat()}
         
         if not auth_response or "id" not in auth_response:
             logger.error("پاسخ Auth خالی است یا شناسه کاربر وجود ندارد")
             if response.text:
-                logger.error(f"متن پاسخ: {response.text}")
+                logger.error("متن پاسخ: %s", Preview(response.text))
             return None
             
-        logger.info(f"کاربر با موفقیت در Auth ثبت شد. شناسه کاربر: {auth_response['id']}")
-        logger.info(f"پاسخ کامل Auth: {auth_response}")
+        logger.info("کاربر با موفقیت در Auth ثبت شد. شناسه کاربر: %s", auth_response['id'])
         
         # ذخیره کاربر در جدول users
         user_data = {
@@ -163,25 +157,24 @@ def create_user(username: str, password: str, role: str = 'user', active: bool =
             "active": active,
             "allowed_channels": allowed_channels or []
         }
+        if created_by:
+            user_data["created_by"] = created_by
         
-        logger.info(f"ارسال درخواست POST به http://kong:8000/rest/v1/users")
-        logger.info(f"هدرها: {json.dumps(headers)}")
-        logger.info(f"داده‌های ارسالی: {json.dumps(user_data)}")
+        logger.debug("ارسال درخواست POST به %s/rest/v1/users", _base_url)
         
-        rest_response = requests.post(
+        rest_response = transport.request(
+            "POST",
             f"{_base_url}/rest/v1/users",
             headers=headers,
             json=user_data
         )
         
-        logger.info(f"کد وضعیت: {rest_response.status_code}")
+        logger.debug("کد وضعیت: %s", rest_response.status_code)
         
         # ذخیره موفقیت‌آمیز در جدول users
         if rest_response.status_code == 201 or rest_response.status_code == 200:
             try:
                 rest_data = rest_response.json()
-                logger.info(f"پاسخ دریافتی: {rest_response.text}")
-                logger.info(f"پاسخ پردازش شده: {json.dumps(rest_data)}")
                 logger.info("کاربر با موفقیت در جدول users ثبت شد")
                 
                 # اگر پاسخ یک لیست است، آیتم اول را برمی‌گرداند
@@ -194,20 +187,21 @@ def create_user(username: str, password: str, role: str = 'user', active: bool =
                 return user_data
         else:
             # اگر ذخیره در جدول users با خطا مواجه شود، کاربر را از Auth حذف می‌کند
-            logger.error(f"خطا در ذخیره کاربر در جدول users: {rest_response.text}")
+            logger.error("خطا در ذخیره کاربر در جدول users: %s", Preview(rest_response.text))
             
             # حذف کاربر از Auth
-            delete_response = requests.delete(
+            delete_response = transport.request(
+                "DELETE",
                 f"{_base_url}/auth/v1/admin/users/{auth_response['id']}",
                 headers=headers
             )
             
-            logger.error(f"حذف کاربر از Auth: {delete_response.status_code}")
+            logger.error("حذف کاربر از Auth: %s", delete_response.status_code)
             return None
             
     except Exception as e:
-        logger.error(f"خطا در ساخت کاربر: {e}")
-        logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+        logger.error("خطا در ساخت کاربر: %s", e)
+        logger.error("جزئیات خطا: %s", traceback.format_exc())
         
         # اگر کاربر در Auth ساخته شده اما در جدول users با خطا مواجه شده، کاربر را از Auth حذف می‌کند
         if auth_response and "id" in auth_response:
@@ -218,14 +212,15 @@ def create_user(username: str, password: str, role: str = 'user', active: bool =
                     "Content-Type": "application/json"
                 }
                 
-                delete_response = requests.delete(
+                delete_response = transport.request(
+                    "DELETE",
                     f"{_base_url}/auth/v1/admin/users/{auth_response['id']}",
                     headers=headers
                 )
                 
-                logger.error(f"حذف کاربر از Auth به دلیل خطا: {delete_response.status_code}")
+                logger.error("حذف کاربر از Auth به دلیل خطا: %s", delete_response.status_code)
             except Exception as delete_error:
-                logger.error(f"خطا در حذف کاربر از Auth: {delete_error}")
+                logger.error("خطا در حذف کاربر از Auth: %s", delete_error)
         
         return None
 
@@ -235,7 +230,7 @@ def create_channel(name: str, allowed_users: Optional[List[str]] = None) -> Dict
     با ساخت شناسه uid که با uuid باشد
     """
     try:
-        logger.info(f"شروع فرآیند ایجاد کانال: name={name}")
+        logger.info("شروع فرآیند ایجاد کانال: name=%s", name)
         
         # ایجاد یک uid منحصر به فرد با استفاده از uuid
         unique_uid = str(uuid.uuid4())
@@ -247,7 +242,7 @@ def create_channel(name: str, allowed_users: Optional[List[str]] = None) -> Dict
             "allowed_users": allowed_users or []
         }
         
-        logger.info(f"داده‌های کانال ارسالی: {channel}")
+        logger.debug("داده‌های کانال ارسالی: %s", Preview(channel))
         
         response = _make_request(
             "POST",
@@ -287,8 +282,8 @@ def create_channel(name: str, allowed_users: Optional[List[str]] = None) -> Dict
             
         return response
     except Exception as e:
-        logger.error(f"خطا در ساخت کانال: {e}")
-        logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+        logger.error("خطا در ساخت کانال: %s", e)
+        logger.error("جزئیات خطا: %s", traceback.format_exc())
         return None
 
 def get_user_by_email(email: str) -> Dict[str, Any]:
@@ -299,7 +294,7 @@ def get_user_by_email(email: str) -> Dict[str, Any]:
         )
         return response[0] if response else None
     except Exception as e:
-        print(f"خطا در دریافت اطلاعات کاربر: {e}")
+        logger.error("خطا در دریافت اطلاعات کاربر: %s", e)
         return None
 
 def update_user(user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -311,7 +306,7 @@ def update_user(user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         )
         return response
     except Exception as e:
-        print(f"خطا در به‌روزرسانی کاربر: {e}")
+        logger.error("خطا در به‌روزرسانی کاربر: %s", e)
         return None
 
 def delete_user(user_id: str) -> bool:
@@ -319,34 +314,34 @@ def delete_user(user_id: str) -> bool:
     حذف کاربر از هر دو جدول users و Supabase Auth
     """
     try:
-        logger.info(f"شروع فرآیند حذف کاربر {user_id}")
+        logger.info("شروع فرآیند حذف کاربر %s", user_id)
         
         # حذف از جدول users
-        logger.info(f"حذف کاربر {user_id} از جدول users")
+        logger.info("حذف کاربر %s از جدول users", user_id)
         db_response = _make_request(
             "DELETE",
             f"/rest/v1/users?uid=eq.{user_id}"
         )
         
         if db_response is None:
-            logger.error(f"خطا در حذف کاربر {user_id} از جدول users")
+            logger.error("خطا در حذف کاربر %s از جدول users", user_id)
             return False
             
-        logger.info(f"کاربر {user_id} با موفقیت از جدول users حذف شد")
+        logger.info("کاربر %s با موفقیت از جدول users حذف شد", user_id)
         
         # حذف از Supabase Auth
-        logger.info(f"حذف کاربر {user_id} از Auth")
+        logger.info("حذف کاربر %s از Auth", user_id)
         auth_response = _make_request(
             "DELETE",
             f"/auth/v1/admin/users/{user_id}"
         )
         
         if auth_response is None:
-            logger.error(f"خطا در حذف کاربر {user_id} از Auth")
+            logger.error("خطا در حذف کاربر %s از Auth", user_id)
             return False
             
-        logger.info(f"کاربر {user_id} با موفقیت از Auth حذف شد")
+        logger.info("کاربر %s با موفقیت از Auth حذف شد", user_id)
         return True
     except Exception as e:
-        logger.error(f"خطا در حذف کاربر {user_id}: {e}")
+        logger.error("خطا در حذف کاربر %s: %s", user_id, e)
         return False
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+console/tasks.py
+Background job handlers for membership work moved out of the request path (jobs app):
+- console.add_users_to_channel: memberships of a new channel (ChannelViewSet.create)
+- console.add_channels_to_user: memberships of a new user (UserViewSet.create)
+- console.delete_memberships: memberships of a deleted channel or user (destroy)
+- job_response: the 202 body returned with the job id and status URL
+
+Handlers raise on upstream errors so the worker retries them; all of them are idempotent
+(membership inserts ignore duplicates, deleting missing rows is a no-op).
+"""
+
+from typing import Any, Dict
+
+from django.urls import reverse
+
+from jobs.queue import enqueue, register
+
+from .repository import get_repository
+
+
+class MembershipJobError(Exception):
+    pass
+
+
+@register('console.add_users_to_channel')
+def add_users_to_channel(channel_uid: str, user_uids: list) -> Dict[str, Any]:
+    found = get_repository().add_users_to_channel(channel_uid, user_uids)
+    if found is None:
+        raise MembershipJobError(f"خطا در افزودن کاربران به کانال {channel_uid}")
+    return {'channel_uid': channel_uid, 'users_found': found}
+
+
+@register('console.add_channels_to_user')
+def add_channels_to_user(user_uid: str, channel_uids: list) -> Dict[str, Any]:
+    found = get_repository().add_channels_to_user(user_uid, channel_uids)
+    if found is None:
+        raise MembershipJobError(f"خطا در افزودن کانال‌ها به کاربر {user_uid}")
+    return {'user_uid': user_uid, 'channels_found': found}
+
+
+@register('console.delete_memberships')
+def delete_memberships(column: str, value: str) -> Dict[str, Any]:
+    if not get_repository().delete_memberships(column, value):
+        raise MembershipJobError(f"خطا در حذف عضویت‌های {column}={value}")
+    return {column: value}
+
+
+def enqueue_membership_job(kind: str, idempotency_key: str, **payload):
+    """افزودن کار عضویت به صف؛ درخواست تکراری با همان کلید همان کار قبلی را برمی‌گرداند"""
+    job, _ = enqueue(kind, payload, idempotency_key=idempotency_key)
+    return job
+
+
+def job_response(job) -> Dict[str, Any]:
+    """فیلدهای کار که به بدنه پاسخ 202 اضافه می‌شوند"""
+    return {
+        'job_id': str(job.id),
+        'job_status': job.status,
+        'job_status_url': reverse('job-status', kwargs={'job_id': job.id}),
+    }
@@ -1,28 +1,71 @@
-from django.test import TestCase, Client
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, Client, override_settings
 from unittest.mock import patch, MagicMock, call
+from asgiref.sync import async_to_sync
+import httpx
+import asyncio
+import copy
+import io
 import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import MD5PasswordHasher, PBKDF2PasswordHasher, make_password
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
 from django.urls import reverse
 from rest_framework import status
-from .views import ChannelViewSet
+from .views import ChannelViewSet, UserViewSet, _in_list, _prefer_return, _validate_channel_ids, _validate_user_ids
+from . import async_views, db_pool, login as super_admin_login, quota, transport
+from admin_panel.db_settings import apply_connection_settings, default_database
+from admin_panel.logging_config import QueueListenerHandler, build_logging
+from admin_panel.middleware import CustomCsrfMiddleware, RequestTracingMiddleware, SessionRefreshMiddleware
+from .pagination import KeysetPagination, PaginationError, decode_cursor
+from .bulk import CSVParser, apply_channel_operations, parse_channel_operations, parse_rows, provision_users
+from .export import iter_json_array
+from .fanout import fan_out
+from .log import Preview, log_bodies, redact_headers
+from .cache import MemoryRowCache, get_row_cache, invalidate_for_write, reset_row_cache
+from .ids import MAX_ID, MIN_ID, FeistelPermutation, get_permutation
+from .models import SuperAdmin, generate_unique_id
+from .management.commands.benchmark_login import percentile
+from jobs.models import Job
+from .repository import BULK_INSERT_CHUNK_SIZE, DirectRepository, RestRepository, get_repository, reset_repository
+
+# cache داخل process برای آزمون‌هایی که رفتار cache را بررسی می‌کنند (پیش‌فرض با چند worker none است)
+MEMORY_ROW_CACHE = {'BACKEND': 'memory', 'TTL': 30, 'MAX_ENTRIES': 1024}
 
 # Create your tests here.
+
 class ChannelTestCase(TestCase):
     """آزمون‌های مربوط به عملکرد کانال‌ها"""
+
+    def setUp(self):
+        reset_row_cache()
     
     @patch('console.views._make_request')
-    @patch('console.views.create_channel')
-    def test_channel_creation_updates_user_allowed_channels(self, mock_create_channel, mock_make_request):
+    def test_channel_creation_updates_user_allowed_channels(self, mock_make_request):
         """
         تست این عملکرد که وقتی کانال جدید ایجاد می‌شود و کاربران مجاز به آن تخصیص می‌یابند،
         کانال به لیست کانال‌های مجاز آن کاربران هم اضافه می‌شود.
         """
         # شبیه‌سازی کاربران و کانال برای تست
-        user1_id = "user1-uuid"
-        user2_id = "user2-uuid"
+        user1_id = "5b1f0e3c-2d4a-4c6e-9f8a-1b2c3d4e5f60"
+        user2_id = "8c7d6e5f-4a3b-4d2c-8e1f-0a9b8c7d6e5f"
         channel_id = "channel-uuid"
         
-        # شبیه‌سازی پاسخ‌ها برای تابع create_channel
-        mock_create_channel.return_value = {
+        # سطر برگشتی POST کانال (return=representation)
+        created_channel = {
             "name": "کانال تست",
             "uid": channel_id,
             "id": channel_id,
@@ -31,8 +74,12 @@ class ChannelTestCase(TestCase):
         
         # شبیه‌سازی پاسخ‌ها برای تابع _make_request
         # وقتی اطلاعات کاربران خوانده می‌شود
-        def mock_get_user(method, endpoint, data=None):
-            if method == 'GET' and f"/rest/v1/users?uid=eq.{user1_id}" in endpoint:
+        def mock_get_user(method, endpoint, data=None, headers=None):
+            if method == 'POST' and endpoint == "/rest/v1/channels":
+                return [created_channel]
+            elif method == 'GET' and endpoint.startswith("/rest/v1/users?uid=in."):
+                return [{"uid": user1_id}, {"uid": user2_id}]
+            elif method == 'GET' and f"/rest/v1/users?uid=eq.{user1_id}" in endpoint:
                 return [{"uid": user1_id, "username": "user1", "allowed_channels": []}]
             elif method == 'GET' and f"/rest/v1/users?uid=eq.{user2_id}" in endpoint:
                 return [{"uid": user2_id, "username": "user2", "allowed_channels": []}]
@@ -67,12 +114,17 @@ class ChannelTestCase(TestCase):
                 response = view.create(request)
                 
                 # بررسی فراخوانی تابع _update_user_channels
-                mock_update_user_channels.assert_called_once_with(channel_id, [user1_id, user2_id])
+                mock_update_user_channels.assert_called_once()
+                args, kwargs = mock_update_user_channels.call_args
+                self.assertEqual(args, (channel_id, [user1_id, user2_id]))
+                # سطر برگشتی POST به unit of work داده می‌شود تا کانال دوباره خوانده نشود
+                self.assertEqual(kwargs['uow'].get('channels', channel_id)['uid'], channel_id)
                 
     @patch('console.views._make_request')
     def test_update_user_channels_functionality(self, mock_make_request):
         """
         تست نحوه عملکرد تابع _update_user_channels برای اضافه کردن کانال به لیست کانال‌های مجاز کاربران
+        افزودن کانال به همه کاربران با یک فراخوانی RPC اتمیک انجام می‌شود
         """
         # شبیه‌سازی کاربران و کانال برای تست
         user1_id = "user1-uuid"
@@ -80,27 +132,15 @@ class ChannelTestCase(TestCase):
         channel_id = "channel-uuid"
         
         # شبیه‌سازی پاسخ‌ها برای تابع _make_request
-        def mock_api_request(method, endpoint, data=None):
+        def mock_api_request(method, endpoint, data=None, headers=None):
             if method == 'GET' and endpoint == f"/rest/v1/channels?uid=eq.{channel_id}":
                 return [{
                     "uid": channel_id,
                     "name": "کانال تست",
                     "allowed_users": [user1_id, user2_id]
                 }]
-            elif method == 'GET' and endpoint == f"/rest/v1/users?uid=eq.{user1_id}":
-                return [{
-                    "uid": user1_id, 
-                    "username": "user1", 
-                    "allowed_channels": []
-                }]
-            elif method == 'GET' and endpoint == f"/rest/v1/users?uid=eq.{user2_id}":
-                return [{
-                    "uid": user2_id, 
-                    "username": "user2", 
-                    "allowed_channels": ["other-channel"]
-                }]
-            elif method == 'PATCH':
-                return True
+            elif method == 'POST' and endpoint == "/rest/v1/rpc/append_channel_to_users":
+                return 2
             else:
                 return []
         
@@ -109,20 +149,1314 @@ class ChannelTestCase(TestCase):
         # ایجاد نمونه ChannelViewSet
         viewset = ChannelViewSet()
         
-        # فراخوانی تابع _update_user_channels
-        result = viewset._update_user_channels(channel_id, [user1_id, user2_id])
+        # فراخوانی تابع _update_user_channels (شناسه تکراری فقط یک بار ارسال می‌شود)
+        result = viewset._update_user_channels(channel_id, [user1_id, user2_id, user1_id])
         
         # بررسی نتیجه
         self.assertTrue(result)
         
-        # بررسی فراخوانی‌های _make_request
+        # بررسی فراخوانی‌های _make_request: تعداد درخواست‌ها مستقل از تعداد کاربران است
         expected_calls = [
             call('GET', f"/rest/v1/channels?uid=eq.{channel_id}"),
-            call('GET', f"/rest/v1/users?uid=eq.{user1_id}"),
-            call('PATCH', f"/rest/v1/users?uid=eq.{user1_id}", {'allowed_channels': [channel_id]}),
-            call('GET', f"/rest/v1/users?uid=eq.{user2_id}"),
-            call('PATCH', f"/rest/v1/users?uid=eq.{user2_id}", {'allowed_channels': ["other-channel", channel_id]})
+            call(
+                'POST',
+                "/rest/v1/rpc/append_channel_to_users",
+                {'p_channel_uid': channel_id, 'p_user_uids': [user1_id, user2_id]}
+            ),
         ]
         
         # بررسی تمام فراخوانی‌های مورد انتظار
         self.assertEqual(mock_make_request.call_args_list, expected_calls)
+
+
+    @patch('console.views._make_request')
+    def test_destroy_removes_memberships_with_filtered_delete(self, mock_make_request):
+        """
+        حذف کانال نباید کل جدول users را بخواند؛ عضویت‌ها با یک DELETE فیلتر شده حذف می‌شوند
+        """
+        channel_id = "channel-uuid"
+
+        def mock_api_request(method, endpoint, data=None, headers=None, returning='representation'):
+            if method == 'GET' and endpoint == f"/rest/v1/channels?uid=eq.{channel_id}":
+                return [{"uid": channel_id, "name": "کانال تست", "allowed_users": ["user1-uuid"]}]
+            elif method == 'DELETE':
+                return True
+            return []
+
+        mock_make_request.side_effect = mock_api_request
+
+        response = ChannelViewSet().destroy(MagicMock(), pk=channel_id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_make_request.call_args_list, [
+            call('GET', f"/rest/v1/channels?uid=eq.{channel_id}"),
+            call('DELETE', f"/rest/v1/channel_membership?channel_uid=eq.{channel_id}", returning='minimal'),
+            call('DELETE', f"/rest/v1/channels?uid=eq.{channel_id}", returning='minimal'),
+        ])
+
+
+class BackgroundJobTestCase(TestCase):
+    """آزمون سپردن پاک‌سازی عضویت‌ها به صف کارهای پس‌زمینه"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    @patch('console.views.get_repository')
+    @patch('console.views._cached_rows', return_value=[{'uid': 'c1', 'name': 'one'}])
+    def test_channel_destroy_returns_202_with_job(self, mock_cached_rows, mock_repository):
+        mock_repository.return_value.delete.return_value = True
+
+        with self.settings(JOBS={'ENABLED': True}):
+            response = ChannelViewSet().destroy(MagicMock(), pk='c1')
+            again = ChannelViewSet().destroy(MagicMock(), pk='c1')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        mock_repository.return_value.delete.assert_called_with('channels', 'c1')
+        mock_repository.return_value.delete_memberships.assert_not_called()
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.kind, job.payload), ('console.delete_memberships', {'column': 'channel_uid', 'value': 'c1'}))
+        self.assertEqual(response.data['job_status_url'], f"/api/jobs/{job.id}/")
+        # کلید idempotency: درخواست تکراری همان کار را برمی‌گرداند
+        self.assertEqual(again.data['job_id'], response.data['job_id'])
+
+
+class ChannelUpdateUnitOfWorkTestCase(TestCase):
+    """ویرایش کانال باید هر سطر را یک بار بخواند و یک بار بنویسد"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    @patch('console.views._make_request')
+    def test_update_reads_channel_once_and_patches_once(self, mock_make_request):
+        u1, u2 = "5b1f0e3c-2d4a-4c6e-9f8a-1b2c3d4e5f60", "8c7d6e5f-4a3b-4d2c-8e1f-0a9b8c7d6e5f"
+        channel = {"uid": "c1", "name": "old", "allowed_users": [u1]}
+
+        def fake_request(method, path, data=None, headers=None, returning='representation'):
+            if method == 'GET' and path == "/rest/v1/channels?uid=eq.c1":
+                return [dict(channel)]
+            if method == 'GET' and path.startswith("/rest/v1/channels?name=eq."):
+                return []
+            if method == 'GET' and path.startswith("/rest/v1/channel_membership"):
+                return [{"user_uid": u1}]
+            if method == 'GET' and path.startswith("/rest/v1/users?uid=in."):
+                return [{"uid": u2}]
+            if method == 'PATCH':
+                return [{**channel, **data}]
+            if method == 'POST':
+                return 1
+            return []
+
+        mock_make_request.side_effect = fake_request
+        request = MagicMock()
+        request.data = {"name": "new", "allowed_users": [u2]}
+
+        response = ChannelViewSet().update(request, pk="c1")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "new")
+        self.assertEqual(response.data["allowed_users"], [u2])
+        methods = [(c.args[0], c.args[1]) for c in mock_make_request.call_args_list]
+        self.assertEqual(methods.count(('GET', "/rest/v1/channels?uid=eq.c1")), 1)
+        patches = [c for c in mock_make_request.call_args_list if c.args[0] == 'PATCH']
+        self.assertEqual(len(patches), 1)
+        self.assertEqual(patches[0].args[2], {"name": "new"})
+        self.assertEqual(patches[0].kwargs, {'returning': 'representation'})
+
+
+class ChannelValidationTestCase(TestCase):
+    """آزمون اعتبارسنجی گروهی شناسه کانال‌ها"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    @patch('console.views._make_request')
+    def test_validate_channel_ids_uses_single_query(self, mock_make_request):
+        mock_make_request.return_value = [{"uid": "c1"}, {"uid": "c3"}]
+
+        valid, unknown = _validate_channel_ids(["c1", "c2", "c3", "c1"])
+
+        self.assertEqual(valid, ["c1", "c3"])
+        self.assertEqual(unknown, ["c2"])
+        mock_make_request.assert_called_once_with('GET', "/rest/v1/channels?uid=in.(c1,c2,c3)&select=uid")
+
+    @override_settings(CONSOLE_ROW_CACHE=MEMORY_ROW_CACHE)
+    @patch('console.views._make_request', return_value=[{"uid": "c2"}])
+    def test_cached_rows_are_still_checked(self, mock_make_request):
+        """سطری که هنوز در cache است ولی در پایگاه داده حذف شده معتبر شمرده نمی‌شود"""
+        get_row_cache().set('channels', 'c1', {'uid': 'c1', 'name': 'stale'})
+
+        self.assertEqual(_validate_channel_ids(["c1", "c2"]), (["c2"], ["c1"]))
+        mock_make_request.assert_called_once_with('GET', "/rest/v1/channels?uid=in.(c1,c2)&select=uid")
+
+    @patch('console.views._make_request', return_value=[{"uid": "7d4f6a52-1f49-4c8b-9d0e-2f8a6c3b1e90"}])
+    def test_invalid_user_uuids_are_unknown_without_query(self, mock_make_request):
+        user_uid = "7d4f6a52-1f49-4c8b-9d0e-2f8a6c3b1e90"
+
+        self.assertEqual(_validate_user_ids([user_uid, "not-a-uuid"]), ([user_uid], ["not-a-uuid"]))
+        mock_make_request.assert_called_once_with('GET', f"/rest/v1/users?uid=in.({user_uid})&select=uid")
+
+    def test_failed_lookup_aborts_channel_update_without_writes(self):
+        """خطای جستجوی کاربران به معنی «کاربر ناشناخته» نیست؛ عضویت فعلی حذف نمی‌شود"""
+        u1, u2 = "7d4f6a52-1f49-4c8b-9d0e-2f8a6c3b1e90", "0b9c2f4e-6a1d-4e8f-8c3b-5d7e9f1a2b3c"
+        writes = []
+
+        def request(method, path, data=None, headers=None, returning='representation'):
+            if method != 'GET':
+                writes.append((method, path))
+                return True
+            if path.startswith('/rest/v1/channels?uid=eq.c1'):
+                return [{'uid': 'c1', 'name': 'ops', 'allowed_users': [u1, u2]}]
+            if path.startswith('/rest/v1/channel_membership'):
+                return [{'user_uid': u1}, {'user_uid': u2}]
+            return None
+
+        view = ChannelViewSet.as_view({'put': 'update'})
+        http_request = RequestFactory().put(
+            '/api/channels/c1/', data=json.dumps({'allowed_users': [u1, u2, 'not-a-uuid']}), content_type='application/json',
+        )
+        http_request.user = get_user_model().objects.create_user('admin')
+        http_request._dont_enforce_csrf_checks = True
+        with patch('console.views._make_request', side_effect=request):
+            response = view(http_request, pk='c1')
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(writes, [])
+
+
+class ReturnPreferenceTestCase(TestCase):
+    """تست هدر Prefer: return=... برای نوشتن در جداول"""
+
+    def test_writes_ask_for_representation_or_minimal(self):
+        self.assertEqual(_prefer_return('PATCH', "/rest/v1/users?uid=eq.u1", None, 'representation'),
+                         {'Prefer': 'return=representation'})
+        self.assertEqual(_prefer_return('DELETE', "/rest/v1/users?uid=eq.u1", {'Prefer': 'count=exact'}, 'minimal'),
+                         {'Prefer': 'count=exact,return=minimal'})
+        # هدر صریح فراخواننده، GET و rpc تغییر نمی‌کنند
+        self.assertEqual(_prefer_return('POST', "/rest/v1/users", {'Prefer': 'return=minimal'}, 'representation'),
+                         {'Prefer': 'return=minimal'})
+        self.assertIsNone(_prefer_return('GET', "/rest/v1/users", None, 'representation'))
+        self.assertIsNone(_prefer_return('POST', "/rest/v1/rpc/append_channel_to_users", None, 'representation'))
+        with self.assertRaises(ValueError):
+            _prefer_return('PATCH', "/rest/v1/users", None, 'headers-only')
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TransportTestCase(TestCase):
+    """آزمون‌های استخر اتصال مشترک HTTP"""
+
+    def setUp(self):
+        transport.reset_session()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/rest/v1/users"
+
+    def tearDown(self):
+        transport.reset_session()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        """درخواست‌های پشت سر هم باید از یک اتصال TCP استفاده کنند"""
+        self.assertIs(transport.get_session(), transport.get_session())
+
+        for _ in range(3):
+            response = transport.request("GET", self.url)
+            self.assertEqual(response.json(), [])
+
+        stats = transport.pool_stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 2)
+        host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.assertEqual(stats["hosts"], {host: {"requests": 3, "hits": 2, "misses": 1}})
+
+
+class LoggingTestCase(TestCase):
+    """آزمون‌های لاگ ساختاریافته"""
+
+    def test_preview_truncates_and_masks_passwords(self):
+        self.assertEqual(str(Preview('x' * 20, limit=5)), 'xxxxx... (20 chars)')
+        rendered = str(Preview({'username': 'ali', 'password': 'secret'}))
+        self.assertIn('ali', rendered)
+        self.assertNotIn('secret', rendered)
+
+    def test_preview_is_lazy(self):
+        body = MagicMock()
+        logger = logging.getLogger('console.tests.lazy')
+        logger.setLevel(logging.INFO)
+        logger.debug("بدنه: %s", Preview(body))
+        body.__str__.assert_not_called()
+        self.assertFalse(log_bodies(logger))
+
+    def test_redact_headers(self):
+        headers = redact_headers({'apikey': 'k', 'Authorization': 'Bearer k', 'Prefer': 'return=minimal'})
+        self.assertEqual(headers, {'apikey': '***', 'Authorization': '***', 'Prefer': 'return=minimal'})
+
+    def test_queue_handler_writes_on_listener_thread(self):
+        stream = io.StringIO()
+        handler = QueueListenerHandler(stream=stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        threads = []
+
+        class Recorder(logging.Filter):
+            def filter(self, record):
+                threads.append(threading.current_thread())
+                return True
+
+        handler.target.addFilter(Recorder())
+        logger = logging.getLogger('console.tests.queue')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            logger.warning("پیام %s", 1)
+        finally:
+            logger.removeHandler(handler)
+            handler.stop()
+        self.assertEqual(stream.getvalue(), 'WARNING پیام 1\n')
+        self.assertNotEqual(threads, [threading.current_thread()])
+
+    def test_queue_handler_snapshots_message_and_traceback(self):
+        stream = io.StringIO()
+        handler = QueueListenerHandler(stream=stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        release = threading.Event()
+        handler.target.addFilter(lambda record: release.wait(5))
+        logger = logging.getLogger('console.tests.queue')
+        logger.propagate = False
+        logger.addHandler(handler)
+        ids = ['u1']
+        try:
+            logger.warning("شناسه‌ها %s", ids)
+            try:
+                raise RuntimeError('boom')
+            except RuntimeError:
+                logger.exception("خطا")
+            # تغییر args پس از ثبت رکورد نباید در خروجی دیده شود
+            ids.append('u2')
+            release.set()
+        finally:
+            logger.removeHandler(handler)
+            handler.stop()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], "WARNING شناسه‌ها ['u1']")
+        self.assertEqual(lines[1], 'ERROR خطا')
+        self.assertEqual(lines[-1], 'RuntimeError: boom')
+
+    def test_build_logging_from_environment(self):
+        with patch.dict(os.environ, {'LOG_LEVEL': 'warning', 'LOG_FORMAT': 'json', 'LOG_ASYNC': 'False'}):
+            config = build_logging(debug=True)
+        self.assertEqual(config['root']['level'], 'WARNING')
+        self.assertEqual(config['handlers']['console'], {'formatter': 'json', 'class': 'logging.StreamHandler'})
+        with patch.dict(os.environ, {}, clear=True):
+            config = build_logging(debug=False)
+        self.assertEqual(config['root']['level'], 'INFO')
+        self.assertIn('()', config['handlers']['console'])
+
+
+class MiddlewareTestCase(TestCase):
+    """آزمون‌های میدل‌ورهای پروژه"""
+
+    def test_csrf_exempt_paths(self):
+        middleware = CustomCsrfMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        for path, exempt in [('/api/users/abc/', True), ('/api/auth/login/', True), ('/api/channels/', False)]:
+            request = factory.post(path)
+            middleware.process_view(request, None, (), {})
+            self.assertEqual(getattr(request, '_dont_enforce_csrf_checks', False), exempt, path)
+
+    def test_tracing_disabled_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestTracingMiddleware(lambda request: HttpResponse())
+
+    @override_settings(REQUEST_TRACE_SAMPLE_RATE=1)
+    def test_tracing_does_not_load_user(self):
+        middleware = RequestTracingMiddleware(lambda request: HttpResponse(status=204))
+        request = RequestFactory().get('/api/channels/')
+        request.user = MagicMock()
+        with self.assertLogs('admin_panel.middleware', level='INFO') as logs:
+            response = middleware(request)
+
+        self.assertEqual(response.status_code, 204)
+        trace = logs.records[0].trace
+        self.assertEqual((trace['method'], trace['path'], trace['status'], trace['user']), ('GET', '/api/channels/', 204, None))
+        request.user.is_authenticated.__bool__.assert_not_called()
+
+    def _session_request(self, session_key, touch=True):
+        def view(request):
+            if touch:
+                request.session.get('user_id')
+            return HttpResponse()
+
+        middleware = SessionMiddleware(SessionRefreshMiddleware(view))
+        request = RequestFactory().get('/api/channels/')
+        request.COOKIES['sessionid'] = session_key
+        return middleware(request)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db', SESSION_REFRESH_FRACTION=0.5,
+                       SESSION_COOKIE_AGE=1000)
+    def test_session_refreshed_only_after_fraction_of_ttl(self):
+        session = SessionStore()
+        session['user_id'] = 1
+        session[SessionRefreshMiddleware.REFRESHED_AT_KEY] = 10_000
+        session.create()
+
+        with patch('admin_panel.middleware.time.time', return_value=10_400):
+            response = self._session_request(session.session_key)
+        self.assertNotIn('sessionid', response.cookies)
+
+        with patch('admin_panel.middleware.time.time', return_value=10_600):
+            response = self._session_request(session.session_key)
+        self.assertIn('sessionid', response.cookies)
+        self.assertEqual(SessionStore(session.session_key)[SessionRefreshMiddleware.REFRESHED_AT_KEY], 10_600)
+
+        # سشنی که view آن را نخوانده بارگذاری و ذخیره نمی‌شود
+        with patch('admin_panel.middleware.time.time', return_value=20_000):
+            response = self._session_request(session.session_key, touch=False)
+        self.assertNotIn('sessionid', response.cookies)
+
+    @override_settings(REQUEST_TRACE_SAMPLE_RATE=1)
+    def test_tracing_skips_untraced_paths(self):
+        middleware = RequestTracingMiddleware(lambda request: HttpResponse())
+        with self.assertNoLogs('admin_panel.middleware', level='INFO'):
+            middleware(RequestFactory().get('/static/app.js'))
+
+    @override_settings(REQUEST_TRACE_SAMPLE_RATE=1)
+    def test_middleware_runs_natively_under_asgi(self):
+        async def view(request):
+            request.session['user_id'] = 1
+            return HttpResponse(status=204)
+
+        middleware = RequestTracingMiddleware(SessionRefreshMiddleware(view))
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get('/api/channels/')
+        request.session = SessionStore()
+        with patch('admin_panel.middleware.time.time', return_value=10_000), \
+                self.assertLogs('admin_panel.middleware', level='INFO') as logs:
+            response = async_to_sync(middleware)(request)
+
+        self.assertEqual((response.status_code, logs.records[0].trace['status']), (204, 204))
+        self.assertEqual(request.session[SessionRefreshMiddleware.REFRESHED_AT_KEY], 10_000)
+
+
+class DatabaseSettingsTestCase(TestCase):
+    """آزمون تنظیمات اتصال پایدار و استخر اتصال پایگاه داده"""
+
+    def _databases(self):
+        return {
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'},
+            'supabase': {'ENGINE': 'django.db.backends.postgresql', 'USER': 'postgres', 'HOST': 'db', 'PORT': '5432'},
+        }
+
+    def test_persistent_connections_by_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            databases = apply_connection_settings(self._databases())
+        self.assertEqual(databases['supabase']['CONN_MAX_AGE'], 60)
+        self.assertTrue(databases['supabase']['CONN_HEALTH_CHECKS'])
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(databases['supabase']['HOST'], 'db')
+
+    def test_pool_through_pooler(self):
+        env = {'DB_POOL': 'True', 'DB_POOL_MAX_SIZE': '4', 'DB_POOLER_HOST': 'supavisor', 'POOLER_TENANT_ID': 'tenant'}
+        with patch.dict(os.environ, env, clear=True):
+            databases = apply_connection_settings(self._databases())
+        supabase = databases['supabase']
+        self.assertEqual(supabase['OPTIONS']['pool']['max_size'], 4)
+        # استخر Django با اتصال پایدار سازگار نیست
+        self.assertEqual(supabase['CONN_MAX_AGE'], 0)
+        self.assertEqual((supabase['HOST'], supabase['PORT'], supabase['USER']), ('supavisor', '6543', 'postgres.tenant'))
+        self.assertTrue(supabase['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('OPTIONS', databases['default'])
+
+    def test_pooler_only_for_listed_aliases(self):
+        databases = self._databases()
+        databases['default'] = {
+            'ENGINE': 'django.db.backends.postgresql', 'USER': 'postgres', 'HOST': 'db', 'PORT': '5432',
+            'OPTIONS': {'options': '-c search_path=django'},
+        }
+        with patch.dict(os.environ, {'DB_POOLER_HOST': 'supavisor'}, clear=True):
+            routed = apply_connection_settings(copy.deepcopy(databases))
+        self.assertEqual(routed['supabase']['HOST'], 'supavisor')
+        self.assertEqual((routed['default']['HOST'], routed['default']['PORT']), ('db', '5432'))
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', routed['default'])
+
+        env = {'DB_POOLER_HOST': 'supavisor', 'DB_POOLER_PORT': '5432', 'DB_POOLER_ALIASES': 'default, supabase'}
+        with patch.dict(os.environ, env, clear=True):
+            routed = apply_connection_settings(copy.deepcopy(databases))
+        self.assertEqual((routed['default']['HOST'], routed['default']['PORT']), ('supavisor', '5432'))
+
+    def test_default_database_from_environment(self):
+        with patch.dict(os.environ, {}, clear=True):
+            sqlite = default_database(Path('/app'))
+        self.assertEqual(sqlite['NAME'], Path('/app/db.sqlite3'))
+        self.assertIn('journal_mode=WAL', sqlite['OPTIONS']['init_command'])
+        self.assertEqual(sqlite['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+        env = {'DEFAULT_DB_ENGINE': 'postgres', 'POSTGRES_HOST': 'db', 'DEFAULT_DB_SCHEMA': 'django'}
+        with patch.dict(os.environ, env, clear=True):
+            postgres = default_database(Path('/app'))
+        self.assertEqual((postgres['ENGINE'], postgres['HOST']), ('django.db.backends.postgresql', 'db'))
+        self.assertEqual(postgres['OPTIONS']['options'], '-c search_path=django')
+
+    def test_migrate_default_db_copies_sqlite_file(self):
+        get_user_model().objects.create_user('operator', password='secret')
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            connection.ensure_connection()
+            # تصویر پایگاه داده آزمون (شامل تراکنش باز آزمون) به عنوان فایل SQLite قدیمی
+            with open(source, 'wb') as sqlite_file:
+                sqlite_file.write(connection.connection.serialize())
+            get_user_model().objects.all().delete()
+
+            with self.assertRaises(CommandError):
+                call_command('migrate_default_db', source=os.path.join(directory, 'missing.sqlite3'), stdout=io.StringIO())
+            # alias موقت فایل مبدأ که فرمان در حین اجرا اضافه می‌کند
+            with patch.object(type(self), 'databases', {'default', 'sqlite_source'}):
+                call_command('migrate_default_db', source=source, verbosity=0, stdout=io.StringIO())
+
+        user = get_user_model().objects.get(username='operator')
+        self.assertTrue(user.check_password('secret'))
+
+    def test_pool_stats_report_every_alias(self):
+        stats = db_pool.pool_stats()
+        self.assertEqual(stats['default']['vendor'], 'sqlite')
+        self.assertNotIn('pool', stats['default'])
+
+    def test_pool_stats_do_not_create_pools(self):
+        existing_pool = MagicMock()
+        existing_pool.get_stats.return_value = {'pool_max': 4, 'pool_size': 2, 'pool_available': 1}
+
+        class Wrapper:
+            vendor = 'postgresql'
+            settings_dict = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True}
+            connection = None
+            _connection_pools = {'used': existing_pool}
+
+            @property
+            def pool(self):
+                raise AssertionError('pool must not be created by pool_stats')
+
+        with patch('console.db_pool.connections', {'used': Wrapper(), 'unused': Wrapper()}):
+            stats = db_pool.pool_stats()
+        self.assertEqual((stats['used']['pool']['in_use'], stats['used']['pool']['utilization']), (1, 0.25))
+        self.assertNotIn('pool', stats['unused'])
+
+
+@override_settings(CONSOLE_ROW_CACHE=MEMORY_ROW_CACHE)
+class RowCacheTestCase(TestCase):
+    """آزمون‌های cache سطرهای کانال و کاربر"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    def test_ttl_and_lru_eviction(self):
+        row_cache = MemoryRowCache(ttl=60, max_entries=2)
+        row_cache.set('channels', 'a', {'uid': 'a'})
+        row_cache.set('channels', 'b', {'uid': 'b'})
+        row_cache.get('channels', 'a')
+        row_cache.set('channels', 'c', {'uid': 'c'})
+
+        self.assertIsNotNone(row_cache.get('channels', 'a'))
+        self.assertIsNone(row_cache.get('channels', 'b'))
+
+        row_cache.ttl = 0
+        row_cache.set('channels', 'd', {'uid': 'd'})
+        self.assertIsNone(row_cache.get('channels', 'd'))
+
+    @patch('console.views._make_request')
+    def test_lookups_are_cached_until_a_write(self, mock_make_request):
+        from .views import _cached_rows
+        mock_make_request.return_value = [{'uid': 'c1', 'name': 'news'}]
+
+        self.assertEqual(_cached_rows('channels', 'c1'), [{'uid': 'c1', 'name': 'news'}])
+        self.assertEqual(_cached_rows('channels', 'c1'), [{'uid': 'c1', 'name': 'news'}])
+        self.assertEqual(mock_make_request.call_count, 1)
+
+        invalidate_for_write('PATCH', '/rest/v1/channels?uid=eq.c1', {'name': 'sport'})
+        _cached_rows('channels', 'c1')
+        self.assertEqual(mock_make_request.call_count, 2)
+
+        stats = get_row_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_membership_writes_invalidate_both_tables(self):
+        row_cache = get_row_cache()
+        row_cache.set('channels', 'c1', {'uid': 'c1'})
+        row_cache.set('users', 'u1', {'uid': 'u1'})
+        row_cache.set('users', 'u2', {'uid': 'u2'})
+
+        invalidate_for_write('POST', '/rest/v1/rpc/append_channel_to_users', {'p_channel_uid': 'c1', 'p_user_uids': ['u1']})
+
+        self.assertIsNone(row_cache.get('channels', 'c1'))
+        self.assertIsNone(row_cache.get('users', 'u1'))
+        self.assertIsNotNone(row_cache.get('users', 'u2'))
+
+        invalidate_for_write('DELETE', '/rest/v1/channel_membership?channel_uid=eq.c9')
+        self.assertIsNone(row_cache.get('users', 'u2'))
+
+
+class PublicIdTestCase(TestCase):
+    """آزمون شناسه‌های 7 رقمی مبتنی بر sequence و جایگشت Feistel"""
+
+    def test_permutation_is_a_bijection(self):
+        permutation = FeistelPermutation(b'test-key', 5000)
+        outputs = [permutation.permute(value) for value in range(5000)]
+        self.assertEqual(sorted(outputs), list(range(5000)))
+        self.assertTrue(all(permutation.invert(output) == value for value, output in enumerate(outputs)))
+        # خروجی‌های پشت سر هم ترتیبی نیستند
+        self.assertNotEqual(outputs[:10], sorted(outputs[:10]))
+
+        full = FeistelPermutation(b'test-key', MAX_ID - MIN_ID + 1)
+        sample = [full.permute(value) for value in range(2000)]
+        self.assertEqual(len(set(sample)), len(sample))
+        self.assertTrue(all(0 <= value <= MAX_ID - MIN_ID for value in sample))
+
+    def test_postgres_ids_come_from_sequence_without_lookup(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = (1,)
+        connection = MagicMock(vendor='postgresql')
+        connection.cursor.return_value.__enter__.return_value = cursor
+
+        with patch('console.models.connections', {'supabase': connection}), \
+                patch('console.ids.connections', {'supabase': connection}), \
+                patch.object(SuperAdmin.objects, 'filter') as mock_filter:
+            value = generate_unique_id(SuperAdmin, 'super_admin_id', using='supabase')
+
+        self.assertEqual(value, MIN_ID + get_permutation().permute(0))
+        cursor.execute.assert_called_once_with("SELECT nextval(%s)", ['super_admin_super_admin_id_seq'])
+        mock_filter.assert_not_called()
+
+
+class QuotaTestCase(TestCase):
+    """آزمون سهمیه کاربران سوپر ادمین"""
+
+    @patch('console.quota.SuperAdmin')
+    def test_reserve_checks_and_increments_in_one_update(self, mock_super_admin):
+        admins = mock_super_admin.objects.using.return_value.filter.return_value
+        admins.filter.return_value.update.return_value = 1
+
+        self.assertTrue(quota.reserve('admin', 3))
+
+        mock_super_admin.objects.using.assert_called_once_with('supabase')
+        admins.filter.assert_called_once_with(user_count__lte=F('user_limit') - 3)
+        admins.filter.return_value.update.assert_called_once_with(user_count=F('user_count') + 3)
+        admins.exists.assert_not_called()
+
+        # سهمیه پر: هیچ سطری به‌روز نمی‌شود
+        admins.filter.return_value.update.return_value = 0
+        admins.exists.return_value = True
+        self.assertFalse(quota.reserve('admin'))
+
+        # بدون سوپر ادمین سقف دور زده نمی‌شود
+        admins.exists.return_value = False
+        self.assertFalse(quota.reserve('not-an-admin'))
+        self.assertFalse(quota.reserve(None))
+
+    @patch('console.views.create_user')
+    @patch('console.quota.reserve')
+    def test_anonymous_create_is_rejected(self, mock_reserve, mock_create_user):
+        request = MagicMock()
+        request.data = {"username": "ali", "password": "secret"}
+        request._request.user.is_authenticated = False
+
+        response = UserViewSet().create(request)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        mock_reserve.assert_not_called()
+        mock_create_user.assert_not_called()
+
+    @patch('console.views.fan_out')
+    @patch('console.views._make_request', return_value=True)
+    @patch('console.views._cached_rows', return_value=[{'uid': 'u1', 'username': 'ali', 'created_by': 'owner'}])
+    @patch('console.quota.release')
+    def test_destroy_releases_owner_quota(self, mock_release, mock_rows, mock_make_request, mock_fan_out):
+        mock_fan_out.return_value = {'users': MagicMock(get=MagicMock(return_value=True))}
+        request = MagicMock()
+        request._request.user.is_authenticated = True
+        request._request.user.get_username.return_value = 'other-admin'
+
+        with patch('console.views.job_queue.is_enabled', return_value=True), \
+                patch('console.views.tasks.enqueue_membership_job'), \
+                patch('console.views.tasks.job_response', return_value={}):
+            response = UserViewSet().destroy(request, pk='u1')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        mock_release.assert_called_once_with('owner')
+
+    @patch('console.views.create_user')
+    @patch('console.quota.reserve', return_value=False)
+    def test_create_is_rejected_when_quota_is_full(self, mock_reserve, mock_create_user):
+        request = MagicMock()
+        request.data = {"username": "ali", "password": "secret"}
+        request._request.user.is_authenticated = True
+        request._request.user.get_username.return_value = 'admin'
+
+        response = UserViewSet().create(request)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        mock_reserve.assert_called_once_with('admin')
+        mock_create_user.assert_not_called()
+
+
+class FastPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 1
+
+
+FAST_HASHERS = ['console.tests.FastPBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginTestCase(TestCase):
+    """آزمون مسیر ورود سوپر ادمین"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def _admin(self, mock_super_admin, encoded):
+        admin = MagicMock(pk=7, admin_super_password=encoded)
+        query = mock_super_admin.objects.using.return_value
+        query.only.return_value.filter.return_value.first.return_value = admin
+        return query
+
+    @patch('console.login.SuperAdmin')
+    def test_login_hashes_once_and_caches_user(self, mock_super_admin):
+        query = self._admin(mock_super_admin, make_password('secret'))
+
+        with patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode', wraps=FastPBKDF2PasswordHasher().encode) as encode:
+            user = super_admin_login.authenticate_super_admin('admin', 'secret')
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(user.username, 'admin')
+        self.assertFalse(user.has_usable_password())
+        query.filter.return_value.update.assert_not_called()
+
+        # ورود دوم کاربر Django را از cache می‌خواند
+        with self.assertNumQueries(0):
+            self.assertEqual(super_admin_login.authenticate_super_admin('admin', 'secret').pk, user.pk)
+        self.assertIsNone(super_admin_login.authenticate_super_admin('admin', 'wrong'))
+
+    @patch('console.login.SuperAdmin')
+    def test_login_upgrades_old_hash(self, mock_super_admin):
+        query = self._admin(mock_super_admin, MD5PasswordHasher().encode('secret', 'salt'))
+
+        self.assertIsNotNone(super_admin_login.authenticate_super_admin('admin', 'secret'))
+
+        query.filter.assert_called_with(pk=7)
+        upgraded = query.filter.return_value.update.call_args.kwargs['admin_super_password']
+        self.assertTrue(upgraded.startswith('pbkdf2_sha256$1$'))
+
+    @patch('console.login.make_password')
+    @patch('console.login.SuperAdmin')
+    def test_unknown_admin_costs_one_hash(self, mock_super_admin, mock_make_password):
+        mock_super_admin.objects.using.return_value.only.return_value.filter.return_value.first.return_value = None
+
+        self.assertIsNone(super_admin_login.authenticate_super_admin('ghost', 'secret'))
+        mock_make_password.assert_called_once_with('secret')
+        self.assertFalse(get_user_model().objects.filter(username='ghost').exists())
+
+    def test_percentile(self):
+        values = sorted(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 99), percentile([], 99)), (50, 99, 0.0))
+
+
+class BulkUserTestCase(TestCase):
+    """آزمون ساخت گروهی کاربران"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    def test_csv_rows_are_parsed(self):
+        rows = parse_rows(CSVParser().parse(
+            io.BytesIO("username,password,role,active,allowed_channels\nali,p1,admin,false,c1;c2\n,,,,\nsara,p2,,,\n".encode()),
+        ))
+        self.assertEqual(rows, [
+            {'username': 'ali', 'password': 'p1', 'role': 'admin', 'active': False, 'allowed_channels': ['c1', 'c2']},
+            {'username': 'sara', 'password': 'p2', 'role': 'regular', 'active': True, 'allowed_channels': []},
+        ])
+
+    @patch('console.bulk.quota')
+    @patch('console.bulk.get_repository')
+    @patch('console.bulk.transport.request')
+    @patch('console.views._validate_channel_ids', return_value=(['c1'], ['missing']))
+    def test_batch_uses_one_insert_and_one_membership_write(self, mock_validate, mock_request, mock_repository, mock_quota):
+        def auth_response(method, url, headers=None, json=None):
+            response = MagicMock()
+            if json['email'].startswith('taken'):
+                response.status_code = 422
+                response.json.return_value = {'msg': 'already registered'}
+            else:
+                response.status_code = 200
+                response.json.return_value = {'id': f"id-{json['email'].split('@')[0]}"}
+            return response
+
+        mock_request.side_effect = auth_response
+        mock_quota.reserve.return_value = True
+        repository = mock_repository.return_value
+        repository.insert_many.side_effect = lambda table, rows: rows
+        repository.add_memberships.return_value = True
+
+        rows = parse_rows([
+            {'username': 'ali', 'password': 'p', 'allowed_channels': ['c1', 'missing']},
+            {'username': 'taken', 'password': 'p'},
+            {'username': 'ALI', 'password': 'p'},
+            {'username': 'sara', 'password': 'p', 'allowed_channels': ['c1']},
+        ])
+        error, results = provision_users(rows, 'admin')
+
+        self.assertIsNone(error)
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'error', 'created'])
+        self.assertEqual(results[0]['unknown_channels'], ['missing'])
+        self.assertIn('already registered', results[1]['detail'])
+        mock_validate.assert_called_once_with(['c1', 'missing'])
+        mock_quota.reserve.assert_called_once_with('admin', count=3)
+        mock_quota.release.assert_called_once_with('admin', 1)
+        repository.insert_many.assert_called_once()
+        self.assertEqual([row['uid'] for row in repository.insert_many.call_args[0][1]], ['id-ali', 'id-sara'])
+        self.assertEqual({row['created_by'] for row in repository.insert_many.call_args[0][1]}, {'admin'})
+        repository.add_memberships.assert_called_once_with([('c1', 'id-ali'), ('c1', 'id-sara')])
+
+    @patch('console.bulk.quota')
+    @patch('console.bulk.get_repository')
+    @patch('console.bulk.transport.request')
+    @patch('console.views._make_request', return_value=True)
+    def test_auth_users_are_removed_when_insert_fails(self, mock_make_request, mock_request, mock_repository, mock_quota):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'id': 'id-1'}
+        mock_quota.reserve.return_value = True
+        mock_repository.return_value.insert_many.return_value = []
+
+        error, results = provision_users(parse_rows([{'username': 'ali', 'password': 'p'}]), 'admin')
+
+        self.assertIsNone(error)
+        self.assertEqual(results[0]['status'], 'error')
+        mock_make_request.assert_called_once_with('DELETE', '/auth/v1/admin/users/id-1')
+        mock_quota.release.assert_called_once_with('admin', 1)
+        mock_repository.return_value.add_memberships.assert_not_called()
+
+    @patch('console.fanout.DEFAULT_TIMEOUT', 0.05)
+    @patch('console.bulk.quota')
+    @patch('console.bulk.get_repository')
+    @patch('console.bulk.transport.request')
+    def test_auth_request_running_past_deadline_is_recorded(self, mock_request, mock_repository, mock_quota):
+        """درخواست Auth که پس از مهلت fan_out کامل می‌شود به عنوان خطا ثبت نمی‌شود (کاربر یتیم نمی‌ماند)"""
+        def auth_response(method, url, headers=None, json=None):
+            username = json['email'].split('@')[0]
+            if username == 'slow':
+                threading.Event().wait(0.3)
+            response = MagicMock(status_code=200)
+            response.json.return_value = {'id': f"id-{username}"}
+            return response
+
+        mock_request.side_effect = auth_response
+        mock_quota.reserve.return_value = True
+        repository = mock_repository.return_value
+        repository.insert_many.side_effect = lambda table, rows: rows
+
+        error, results = provision_users(parse_rows([
+            {'username': 'fast', 'password': 'p'}, {'username': 'slow', 'password': 'p'},
+        ]), 'admin')
+
+        self.assertIsNone(error)
+        self.assertEqual([result['status'] for result in results], ['created', 'created'])
+        self.assertEqual([row['uid'] for row in repository.insert_many.call_args[0][1]], ['id-fast', 'id-slow'])
+        mock_quota.release.assert_not_called()
+
+
+class ChannelBatchTestCase(TestCase):
+    """آزمون عملیات گروهی کانال‌ها"""
+
+    def test_in_filter_quotes_reserved_values(self):
+        self.assertEqual(_in_list(['a-1', 'x,y']), 'a-1,%22x%2Cy%22')
+
+    @patch('console.bulk.get_repository')
+    @patch('console.views._validate_user_ids', return_value=(['u1'], ['u2']))
+    def test_batch_uses_one_request_per_kind_of_write(self, mock_validate, mock_repository):
+        repository = mock_repository.return_value
+
+        def rows_in(table, column, values, select='*'):
+            if column == 'uid':
+                return [{'uid': uid, 'name': f"name-{uid}"} for uid in values if uid != 'c9']
+            return [{'uid': 'c4', 'name': 'taken'}, {'uid': 'c3', 'name': 'freed'}]
+
+        repository.rows_in.side_effect = rows_in
+        repository.insert_many.side_effect = lambda table, rows: rows
+        repository.rename_channels.side_effect = lambda names: [{'uid': uid, 'name': name} for uid, name in names.items()]
+        repository.delete_memberships_in.return_value = True
+        repository.delete_many.return_value = True
+        repository.memberships_in.return_value = [('c1', 'u3')]
+        repository.remove_memberships.return_value = True
+        repository.add_memberships.return_value = True
+
+        results = apply_channel_operations(parse_channel_operations({'operations': [
+            {'op': 'create', 'name': 'A', 'allowed_users': ['u1', 'u2']},
+            {'op': 'update', 'uid': 'c1', 'name': 'freed', 'allowed_users': ['u1']},
+            {'op': 'update', 'uid': 'c2', 'name': 'taken'},
+            {'op': 'delete', 'uid': 'c3'},
+            {'op': 'create', 'name': 'A'},
+            {'op': 'update', 'uid': 'c9', 'name': 'x'},
+        ]}))
+
+        self.assertEqual([result['status'] for result in results], ['created', 'updated', 'error', 'deleted', 'error', 'error'])
+        created_uid = results[0]['uid']
+        self.assertEqual(results[0]['channel']['allowed_users'], ['u1'])
+        self.assertEqual(results[1]['channel'], {'uid': 'c1', 'name': 'freed', 'allowed_users': ['u1']})
+
+        # یک جستجوی uid و یک جستجوی name برای کل دسته
+        self.assertEqual(repository.rows_in.call_count, 2)
+        repository.rows_in.assert_any_call('channels', 'name', ['A', 'freed', 'taken'], select='uid,name')
+        mock_validate.assert_called_once_with(['u1', 'u2'])
+        repository.insert_many.assert_called_once()
+        repository.rename_channels.assert_called_once_with({'c1': 'freed'})
+        repository.delete_memberships_in.assert_called_once_with('channel_uid', ['c3'])
+        repository.delete_many.assert_called_once_with('channels', ['c3'])
+        repository.memberships_in.assert_called_once_with('channel_uid', ['c1'])
+        repository.remove_memberships.assert_called_once_with([('c1', 'u3')])
+        repository.add_memberships.assert_called_once_with(sorted([('c1', 'u1'), (created_uid, 'u1')]))
+
+
+    @patch('console.bulk.get_repository')
+    def test_failed_delete_keeps_its_name_taken(self, mock_repository):
+        repository = mock_repository.return_value
+
+        def rows_in(table, column, values, select='*'):
+            if column == 'uid':
+                return [{'uid': uid, 'name': f"name-{uid}"} for uid in values]
+            names = {'freed': 'c3', 'name-c1': 'c1', 'name-c2': 'c2'}
+            return [{'uid': names[name], 'name': name} for name in values if name in names]
+
+        repository.rows_in.side_effect = rows_in
+        repository.delete_memberships_in.return_value = True
+        repository.delete_many.return_value = False
+
+        results = apply_channel_operations(parse_channel_operations({'operations': [
+            {'op': 'delete', 'uid': 'c3'},
+            {'op': 'update', 'uid': 'c1', 'name': 'name-c2'},
+            {'op': 'update', 'uid': 'c2', 'name': 'freed'},
+            {'op': 'create', 'name': 'name-c1'},
+        ]}))
+
+        # حذف c3 ناموفق است: تغییر نام c2 و در نتیجه تغییر نام c1 و ساخت وابسته به آن انجام نمی‌شوند
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error', 'error'])
+        repository.rename_channels.assert_not_called()
+        repository.insert_many.assert_not_called()
+
+
+class DirectRepositoryTestCase(TestCase):
+    """آزمون backend دسترسی مستقیم به Postgres"""
+
+    def setUp(self):
+        reset_row_cache()
+
+    def test_membership_change_locks_rows_in_one_transaction(self):
+        cursor = MagicMock()
+        cursor.fetchall.side_effect = [[("c1",)], [("u1",), ("u2",)]]
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        get_row_cache().set('users', 'u1', {"uid": "u1"})
+
+        with patch('console.repository.connections', {'supabase': connection}), \
+                patch('console.repository.transaction.atomic') as atomic:
+            found = DirectRepository(alias='supabase').add_users_to_channel("c1", ["u1", "u2", "u3"])
+
+        self.assertEqual(found, 2)
+        atomic.assert_called_once_with(using='supabase')
+        statements = [args.args[0] for args in cursor.execute.call_args_list]
+        # قفل کانال‌ها پیش از کاربران، سپس درج فقط برای کاربران موجود
+        self.assertIn("FROM public.channels", statements[0])
+        self.assertIn("FOR UPDATE", statements[0])
+        self.assertIn("FROM public.users", statements[1])
+        self.assertIn("FOR UPDATE", statements[1])
+        self.assertIn("INSERT INTO public.channel_membership", statements[2])
+        self.assertEqual(cursor.execute.call_args_list[2].args[1], [["c1"], ["u1", "u2"]])
+        self.assertIsNone(get_row_cache().get('users', 'u1'))
+
+    @patch('console.views._make_request')
+    def test_rest_insert_many_reports_rows_per_chunk(self, mock_make_request):
+        """بخش ناموفق بخش‌های بعدی را متوقف نمی‌کند و سطرهای commit شده آن دوباره خوانده می‌شوند"""
+        rows = [{'uid': f'u{index}'} for index in range(2 * BULK_INSERT_CHUNK_SIZE + 1)]
+
+        def request(method, path, data=None, **kwargs):
+            if method == 'GET':
+                # درخواست بخش اول پس از commit یکی از سطرها با خطا تمام شد
+                return [{'uid': 'u0'}] if 'in.(u0,' in path else []
+            return None if data[0]['uid'] == 'u0' else data
+
+        mock_make_request.side_effect = request
+        inserted = RestRepository().insert_many('users', rows)
+
+        self.assertEqual(len(inserted), BULK_INSERT_CHUNK_SIZE + 2)
+        self.assertEqual((inserted[0]['uid'], inserted[1]['uid']), ('u0', f'u{BULK_INSERT_CHUNK_SIZE}'))
+        self.assertEqual([c.args[0] for c in mock_make_request.call_args_list].count('POST'), 3)
+
+    def test_backend_is_chosen_by_setting(self):
+        reset_repository()
+        try:
+            with self.settings(CONSOLE_REPOSITORY={'BACKEND': 'direct', 'ALIAS': 'supabase'}):
+                self.assertIsInstance(get_repository(), DirectRepository)
+        finally:
+            reset_repository()
+        self.assertIsInstance(get_repository(), RestRepository)
+
+
+class FanOutTestCase(TestCase):
+    """آزمون‌های اجرای همزمان فراخوانی‌های مستقل"""
+
+    def test_calls_run_concurrently(self):
+        """زمان کل باید نزدیک به یک فراخوانی باشد نه مجموع آن‌ها"""
+        barrier = threading.Barrier(3, timeout=2)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        results = fan_out({key: (lambda key=key: call(key)) for key in ('a', 'b', 'c')})
+        self.assertEqual({key: result.get() for key, result in results.items()}, {'a': 'a', 'b': 'b', 'c': 'c'})
+
+    def test_errors_and_timeouts_are_per_call(self):
+        """خطا یا پایان زمان یک فراخوانی نتیجه بقیه را از بین نمی‌برد"""
+        release = threading.Event()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        results = fan_out({
+            'ok': lambda: 1,
+            'error': fail,
+            'slow': lambda: release.wait(5),
+        }, timeout=0.2)
+        release.set()
+
+        self.assertEqual(results['ok'].get(), 1)
+        self.assertIsInstance(results['error'].error, RuntimeError)
+        self.assertFalse(results['slow'].ok)
+        with self.assertRaises(RuntimeError):
+            results['error'].get()
+
+    def test_wait_running_returns_result_after_deadline(self):
+        """مهلت برای کل نگاشت است؛ با wait_running نتیجه فراخوانی در حال اجرا از دست نمی‌رود"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'created'
+
+        threading.Timer(0.3, release.set).start()
+        results = fan_out({'fast': lambda: 1, 'slow': slow}, timeout=0.1, wait_running=True)
+
+        self.assertTrue(started.is_set())
+        self.assertEqual((results['fast'].get(), results['slow'].get()), (1, 'created'))
+
+    def test_pool_threads_close_old_connections(self):
+        with patch('console.fanout.close_old_connections') as close_old:
+            results = fan_out({'a': lambda: 1, 'b': lambda: 2})
+        self.assertEqual({key: result.get() for key, result in results.items()}, {'a': 1, 'b': 2})
+        # قبل و بعد از هر فراخوانی در pool
+        self.assertEqual(close_old.call_count, 4)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """آزمون‌های صفحه‌بندی کلیدی لیست کاربران و کانال‌ها"""
+
+    def setUp(self):
+        self.pagination = KeysetPagination(ordering=('created_at', 'uid'))
+
+    def test_first_page_query_and_next_cursor(self):
+        page = self.pagination.parse({'limit': '2', 'fields': 'username', 'count': 'exact'})
+        query, headers = self.pagination.build_query(page)
+
+        self.assertEqual(query, "select=username,created_at,uid&order=created_at.asc,uid.asc")
+        self.assertEqual(headers, {'Range-Unit': 'items', 'Range': '0-2', 'Prefer': 'count=exact'})
+
+        rows = [
+            {'uid': 'a', 'created_at': '2025-01-01T00:00:00+00:00'},
+            {'uid': 'b', 'created_at': '2025-01-02T00:00:00+00:00'},
+            {'uid': 'c', 'created_at': '2025-01-03T00:00:00+00:00'},
+        ]
+        body = self.pagination.page_body(page, rows, self.pagination.parse_total('0-2/57'))
+
+        self.assertEqual([row['uid'] for row in body['results']], ['a', 'b'])
+        self.assertEqual(body['count'], 57)
+        self.assertEqual(decode_cursor(body['next_cursor'], 2), ['2025-01-02T00:00:00+00:00', 'b'])
+
+    def test_cursor_is_forwarded_as_keyset_filter(self):
+        page = self.pagination.parse({'limit': '10', 'cursor': self.pagination.page_body(
+            self.pagination.parse({'limit': '1'}),
+            [{'uid': 'b', 'created_at': '2025-01-02T00:00:00+00:00'}, {'uid': 'c', 'created_at': 'x'}],
+        )['next_cursor']})
+        query, headers = self.pagination.build_query(page)
+
+        self.assertIn(
+            "or=(created_at.gt.%222025-01-02T00%3A00%3A00%2B00%3A00%22,"
+            "and(created_at.eq.%222025-01-02T00%3A00%3A00%2B00%3A00%22,uid.gt.%22b%22),created_at.is.null)",
+            query
+        )
+        self.assertNotIn('Prefer', headers)
+
+    @staticmethod
+    def _postgrest_page(rows, query, limit):
+        """اجرای order و شرط or=(...) صفحه‌بندی روی سطرهای حافظه، مانند PostgREST"""
+        def split(text):
+            parts, depth, start = [], 0, 0
+            for index, char in enumerate(text):
+                depth += {'(': 1, ')': -1}.get(char, 0)
+                if char == ',' and depth == 0:
+                    parts.append(text[start:index])
+                    start = index + 1
+            return parts + [text[start:]]
+
+        def matches(row, condition):
+            if condition.startswith('and('):
+                return all(matches(row, part) for part in split(condition[4:-1]))
+            column, operator, value = condition.split('.', 2)
+            if operator == 'is':
+                return row.get(column) is None
+            value = json.loads(value)
+            if row.get(column) is None:
+                return False
+            return row[column] > value if operator == 'gt' else row[column] == value
+
+        params = dict(parse_qsl(query))
+        ordered = sorted(rows, key=lambda row: tuple((row.get(key) is None, row.get(key) or '') for key in params['order'].replace('.asc', '').split(',')))
+        if 'or' in params:
+            conditions = split(params['or'][1:-1])
+            ordered = [row for row in ordered if any(matches(row, condition) for condition in conditions)]
+        return ordered[:limit + 1]
+
+    def _walk(self, pagination, rows, limit):
+        uids, cursor = [], None
+        for _ in range(len(rows) + 1):
+            page = pagination.parse({'limit': str(limit), **({'cursor': cursor} if cursor else {})})
+            query, _ = pagination.build_query(page)
+            body = pagination.page_body(page, self._postgrest_page(rows, query, limit))
+            uids.extend(row['uid'] for row in body['results'])
+            cursor = body['next_cursor']
+            if not cursor:
+                return uids
+        self.fail("صفحه‌بندی پایان نیافت")
+
+    def test_pages_with_equal_and_null_created_at(self):
+        """سطرهای با created_at یکسان یا NULL نه تکرار می‌شوند و نه از قلم می‌افتند"""
+        rows = [
+            {'uid': 'e', 'created_at': None},
+            {'uid': 'a', 'created_at': '2025-01-02T00:00:00+00:00'},
+            {'uid': 'c', 'created_at': '2025-01-01T00:00:00+00:00'},
+            {'uid': 'b', 'created_at': '2025-01-01T00:00:00+00:00'},
+            {'uid': 'd', 'created_at': None},
+            {'uid': 'f', 'created_at': '2025-01-01T00:00:00+00:00'},
+        ]
+        for limit in (1, 2, 4):
+            self.assertEqual(self._walk(self.pagination, rows, limit), ['b', 'c', 'f', 'a', 'd', 'e'], limit)
+
+    def test_channels_are_paginated_by_uid_only(self):
+        """جدول channels ستون created_at ندارد"""
+        pagination = ChannelViewSet.keyset_pagination
+        query, _ = pagination.build_query(pagination.parse({'limit': '2'}))
+
+        self.assertEqual(query, "select=*&order=uid.asc")
+        self.assertEqual(self._walk(pagination, [{'uid': uid} for uid in 'dbeac'], 2), ['a', 'b', 'c', 'd', 'e'])
+
+    def test_invalid_params_are_rejected(self):
+        for params in ({'limit': 'abc'}, {'limit': '0'}, {'cursor': 'not-a-cursor'}, {'fields': 'uid,users(*)'}, {'count': 'all'}):
+            with self.assertRaises(PaginationError):
+                self.pagination.parse(params)
+
+
+class ExportTestCase(TestCase):
+    """آزمون‌های خروجی stream کاربران"""
+
+    def test_iter_json_array_handles_split_chunks(self):
+        payload = json.dumps([{"uid": "a", "username": "کاربر ۱"}, {"uid": "b", "n": 12345}, 7])
+        chunks = [payload[i:i + 3] for i in range(0, len(payload), 3)]
+
+        self.assertEqual(
+            list(iter_json_array(chunks)),
+            [{"uid": "a", "username": "کاربر ۱"}, {"uid": "b", "n": 12345}, 7]
+        )
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['[{"uid": "a"}, {"uid"']))
+
+    @patch('console.export.transport.request')
+    def test_users_export_streams_ndjson(self, mock_request):
+        upstream = MagicMock(status_code=200)
+        upstream.iter_content.return_value = [b'[{"uid": "a"},', b' {"uid": "b"}]']
+        mock_request.return_value = upstream
+
+        response = Client().get('/api/users/export/', {'format': 'ndjson', 'fields': 'uid'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), b'{"uid": "a"}\n{"uid": "b"}\n')
+        self.assertEqual(mock_request.call_args.args[1], "/rest/v1/users?select=uid&order=created_at.asc,uid.asc")
+        self.assertTrue(mock_request.call_args.kwargs['stream'])
+        upstream.close.assert_called()
+
+
+class _FakeSupabase:
+    """PostgREST ساختگی با حالت در حافظه برای اجرای یک درخواست در هر دو پشته sync و async"""
+
+    def __init__(self):
+        self.tables = {
+            'channels': [{'uid': AsyncViewsTestCase.CHANNEL_UID, 'name': 'ops', 'allowed_users': []}],
+            'users': [{'uid': AsyncViewsTestCase.USER_UID, 'username': 'ali', 'role': 'regular', 'active': True,
+                       'allowed_channels': []}],
+            'channel_membership': [],
+        }
+
+    def request(self, method, path, data=None, headers=None, returning='representation'):
+        parsed = urlsplit(path)
+        table = parsed.path.rsplit('/', 1)[-1]
+        if parsed.path.startswith('/rest/v1/rpc/'):
+            return 1
+        filters = {key: value for key, value in parse_qsl(parsed.query) if key not in ('select', 'order', 'limit')}
+        rows = [row for row in self.tables[table] if self._matches(row, filters)]
+        if method == 'GET':
+            return [dict(row) for row in rows]
+        if method == 'POST':
+            self.tables[table].append(dict(data))
+            return [dict(data)]
+        if method == 'PATCH':
+            for row in rows:
+                row.update(data)
+            return [dict(row) for row in rows]
+        if method == 'DELETE':
+            self.tables[table] = [row for row in self.tables[table] if row not in rows]
+            return True
+        return None
+
+    @staticmethod
+    def _matches(row, filters):
+        for column, condition in filters.items():
+            operator, _, value = condition.partition('.')
+            if operator == 'eq' and str(row.get(column)) != value:
+                return False
+            if operator == 'in' and str(row.get(column)) not in value.strip('()').split(','):
+                return False
+        return True
+
+    async def arequest(self, method, path, data=None, headers=None):
+        return self.request(method, path, data)
+
+
+class AsyncViewsTestCase(TestCase):
+    """هر درخواست در viewset همگام و ویو async اجرا می‌شود و پاسخ‌ها باید یکسان باشند"""
+
+    USER_UID = '7d4f6a52-1f49-4c8b-9d0e-2f8a6c3b1e90'
+    CHANNEL_UID = '0b9c2f4e-6a1d-4e8f-8c3b-5d7e9f1a2b3c'
+    NEW_CHANNEL_UID = '3e5a7c9b-1d2f-4a6b-8c0d-e1f2a3b4c5d6'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('admin', password='secret')
+
+    def _prepare(self, request):
+        request.user = self.user
+        request._dont_enforce_csrf_checks = True
+
+        async def auser():
+            return self.user
+
+        request.auser = auser
+        return request
+
+    def _run(self, run, method, path, body=None):
+        """اجرای درخواست با یک PostgREST ساختگی تازه؛ خروجی (کد وضعیت، بدنه، جداول پس از درخواست)"""
+        reset_row_cache()
+        backend = _FakeSupabase()
+        kwargs = {'data': json.dumps(body), 'content_type': 'application/json'} if body is not None else {}
+        with patch('console.views._make_request', side_effect=backend.request), \
+                patch('console.async_client.make_request', side_effect=backend.arequest), \
+                patch('console.views.uuid.uuid4', return_value=uuid.UUID(self.NEW_CHANNEL_UID)):
+            response = run(method, path, kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.status_code, json.loads(response.content), backend.tables
+
+    def _sync(self, view, pk=None):
+        def run(method, path, kwargs):
+            request = self._prepare(getattr(RequestFactory(), method)(path, **kwargs))
+            return view(request, **({'pk': pk} if pk else {}))
+        return run
+
+    def _async(self, view, pk=None):
+        def run(method, path, kwargs):
+            request = self._prepare(getattr(AsyncRequestFactory(), method)(path, **kwargs))
+            return async_to_sync(view)(request, *([uuid.UUID(pk)] if pk else []))
+        return run
+
+    def assertSameResult(self, sync_view, async_view, method, path, body=None, pk=None):
+        sync_result = self._run(self._sync(sync_view, pk), method, path, body)
+        async_result = self._run(self._async(async_view, pk), method, path, body)
+        self.assertEqual(sync_result, async_result)
+        return sync_result
+
+    def test_channel_requests_match(self):
+        collection = ChannelViewSet.as_view({'get': 'list', 'post': 'create'})
+        detail = ChannelViewSet.as_view({'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'})
+        url = f'/api/channels/{self.CHANNEL_UID}/'
+
+        status_code, body, _ = self.assertSameResult(collection, async_views.channel_collection, 'get', '/api/channels/')
+        self.assertEqual((status_code, body[0]['name']), (200, 'ops'))
+        self.assertSameResult(detail, async_views.channel_detail, 'get', url, pk=self.CHANNEL_UID)
+        status_code, body, tables = self.assertSameResult(
+            collection, async_views.channel_collection, 'post', '/api/channels/',
+            body={'name': 'new', 'allowed_users': [self.USER_UID, 'missing']},
+        )
+        self.assertEqual((status_code, body['allowed_users']), (201, [self.USER_UID]))
+        self.assertSameResult(detail, async_views.channel_detail, 'patch', url, body={'name': 'renamed'}, pk=self.CHANNEL_UID)
+        status_code, _, tables = self.assertSameResult(detail, async_views.channel_detail, 'delete', url, pk=self.CHANNEL_UID)
+        self.assertEqual((status_code, tables['channels']), (200, []))
+
+    def test_user_requests_match(self):
+        collection = UserViewSet.as_view({'get': 'list'})
+        detail = UserViewSet.as_view({'get': 'retrieve', 'patch': 'partial_update'})
+        url = f'/api/users/{self.USER_UID}/'
+
+        self.assertSameResult(collection, async_views.user_collection, 'get', '/api/users/')
+        self.assertSameResult(detail, async_views.user_detail, 'get', url, pk=self.USER_UID)
+        self.assertSameResult(detail, async_views.user_detail, 'get', f'/api/users/{self.NEW_CHANNEL_UID}/', pk=self.NEW_CHANNEL_UID)
+        status_code, body, _ = self.assertSameResult(
+            detail, async_views.user_detail, 'patch', url, body={'role': 'admin'}, pk=self.USER_UID,
+        )
+        self.assertEqual((status_code, body['role']), (200, 'admin'))
+
+    def test_lists_are_delegated_for_direct_backend(self):
+        with patch('console.async_views.get_repository') as mock_repository, \
+                patch('console.async_views._delegate', return_value=HttpResponse()) as delegate:
+            mock_repository.return_value.backend = 'direct'
+            async_to_sync(async_views.user_collection)(self._prepare(AsyncRequestFactory().get('/api/users/')))
+        delegate.assert_called_once()
+
+    def test_list_errors_return_json(self):
+        request = self._prepare(AsyncRequestFactory().get('/api/users/?limit=10'))
+        malformed = MagicMock(status_code=200)
+        malformed.json.side_effect = ValueError('Expecting value')
+        cases = [
+            (httpx.ConnectTimeout('timed out'), 502),
+            (httpx.ConnectError('refused'), 502),
+            (malformed, 502),
+            (RuntimeError('boom'), 500),
+        ]
+        for outcome, expected_status in cases:
+            with self.subTest(outcome=outcome), \
+                    patch('console.async_views.get_repository') as mock_repository, \
+                    patch('console.async_client.request', side_effect=[outcome]):
+                mock_repository.return_value.backend = 'rest'
+                response = async_to_sync(async_views.user_collection)(request)
+            self.assertEqual(response.status_code, expected_status)
+            self.assertEqual(json.loads(response.content), {"detail": "Error fetching users from Supabase API"})
+
@@ -0,0 +1,176 @@
+"""
+console/transport.py
+Process-wide HTTP transport for calls to Supabase (Kong → PostgREST / GoTrue):
+- get_session: pooled keep-alive requests.Session, one per worker process.
+- request: thin wrapper around the session applying default connect/read timeouts.
+- pool_stats: connection-pool hit/miss counters used to confirm connection reuse.
+
+Pool size, keep-alive and timeouts are configured through environment variables
+(SUPABASE_HTTP_POOL_SIZE, SUPABASE_HTTP_KEEPALIVE, SUPABASE_HTTP_CONNECT_TIMEOUT,
+SUPABASE_HTTP_READ_TIMEOUT, SUPABASE_HTTP_RETRIES).
+"""
+
+import os
+import socket
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+BASE_URL = os.getenv("SUPABASE_INTERNAL_URL", "http://kong:8000")
+
+POOL_SIZE = _env_int("SUPABASE_HTTP_POOL_SIZE", 20)
+KEEPALIVE = os.getenv("SUPABASE_HTTP_KEEPALIVE", "True").lower() == "true"
+KEEPALIVE_IDLE = _env_int("SUPABASE_HTTP_KEEPALIVE_IDLE", 60)
+CONNECT_TIMEOUT = _env_float("SUPABASE_HTTP_CONNECT_TIMEOUT", 3.05)
+READ_TIMEOUT = _env_float("SUPABASE_HTTP_READ_TIMEOUT", 30.0)
+MAX_RETRIES = _env_int("SUPABASE_HTTP_RETRIES", 0)
+
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def _socket_options():
+    """گزینه‌های سوکت برای نگه‌داشتن اتصال TCP باز (keep-alive)"""
+    options = list(HTTPConnection.default_socket_options)
+    if not KEEPALIVE:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # این گزینه‌ها فقط در لینوکس موجود هستند
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+    return options
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter با استخر اتصال قابل تنظیم و گزینه‌های keep-alive"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("pool_connections", POOL_SIZE)
+        kwargs.setdefault("pool_maxsize", POOL_SIZE)
+        kwargs.setdefault("max_retries", MAX_RETRIES)
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = _socket_options()
+        super().init_poolmanager(*args, **kwargs)
+        # استخرهای استفاده شده برای pool_stats (بدون خواندن ساختار داخلی PoolManager)
+        self.used_pools = {}
+
+    def _record_pool(self, pool):
+        self.used_pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = pool
+        return pool
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self._record_pool(super().get_connection_with_tls_context(*args, **kwargs))
+
+    def get_connection(self, *args, **kwargs):
+        # requests قدیمی‌تر از 2.32 فقط get_connection را فراخوانی می‌کند
+        return self._record_pool(super().get_connection(*args, **kwargs))
+
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = PooledHTTPAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if KEEPALIVE:
+        session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    بازگرداندن Session مشترک پروسه
+    بعد از fork شدن worker های gunicorn، هر پروسه Session و استخر اتصال خود را می‌سازد
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def reset_session() -> None:
+    """بستن Session فعلی و تمام اتصال‌های باز آن"""
+    global _session, _session_pid
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    ارسال درخواست از طریق Session مشترک
+    اگر url با / شروع شود، به BASE_URL اضافه می‌شود
+    """
+    if url.startswith("/"):
+        url = f"{BASE_URL}{url}"
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    آمار استخر اتصال‌ها برای این پروسه
+    misses: تعداد اتصال‌های TCP جدید، hits: درخواست‌هایی که از اتصال موجود استفاده کردند
+    """
+    stats = {
+        "pid": os.getpid(),
+        "pool_size": POOL_SIZE,
+        "requests": 0,
+        "hits": 0,
+        "misses": 0,
+        "hosts": {},
+    }
+    session = _session
+    if session is None or _session_pid != os.getpid():
+        return stats
+
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        for host, pool in list(getattr(adapter, "used_pools", {}).items()):
+            misses = pool.num_connections
+            total = pool.num_requests
+            stats["hosts"][host] = {
+                "requests": total,
+                "hits": max(total - misses, 0),
+                "misses": misses,
+            }
+            stats["requests"] += total
+            stats["misses"] += misses
+    stats["hits"] = max(stats["requests"] - stats["misses"], 0)
+    return stats
@@ -0,0 +1,115 @@
+"""
+console/unit_of_work.py
+Request-scoped identity map and unit of work for PostgREST rows:
+- UnitOfWork.get / find: memoize rows fetched during one API call, so the same row is
+  read at most once per request.
+- UnitOfWork.update: applies changes to the in-memory row and queues them; repeated
+  updates of one row are merged.
+- UnitOfWork.commit: sends one update per changed row (through console/repository.py)
+  and keeps the returned row.
+
+A UnitOfWork lives only as long as the view call that created it, so it never serves
+another request's data.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RowKey = Tuple[str, str]
+
+
+class UnitOfWork:
+    """
+    fetch_rows(table, uid): دریافت سطر با uid؛ خروجی لیست (یک عضوی یا خالی) یا None در صورت خطا
+    repository: backend دسترسی به داده (console/repository.py) برای find و ذخیره تغییرات
+    """
+
+    def __init__(self, fetch_rows: Callable[[str, str], Optional[list]], repository):
+        self._fetch_rows = fetch_rows
+        self._repository = repository
+        self._lock = threading.Lock()
+        self._rows: Dict[RowKey, Optional[Dict[str, Any]]] = {}
+        self._queries: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self._pending: Dict[RowKey, Dict[str, Any]] = {}
+
+    def _remember(self, table: str, row: Dict[str, Any]) -> None:
+        uid = row.get('uid')
+        if uid is not None:
+            key = (table, str(uid))
+            # تغییرات ثبت نشده روی نسخه تازه هم اعمال می‌شوند
+            self._rows[key] = {**row, **self._pending.get(key, {})}
+
+    def add(self, table: str, row: Dict[str, Any]) -> None:
+        """ثبت سطری که همین درخواست نوشته است (مثلاً پاسخ POST) تا دوباره خوانده نشود"""
+        with self._lock:
+            self._remember(table, row)
+
+    def get(self, table: str, uid: str) -> Optional[Dict[str, Any]]:
+        """سطر با uid (یک بار در هر درخواست خوانده می‌شود)؛ None اگر یافت نشود یا خطا رخ دهد"""
+        key = (table, str(uid))
+        with self._lock:
+            if key in self._rows:
+                row = self._rows[key]
+                return dict(row) if row is not None else None
+
+        rows = self._fetch_rows(table, uid)
+        if not isinstance(rows, list):
+            # خطای upstream ذخیره نمی‌شود تا تلاش بعدی دوباره انجام شود
+            return None
+        with self._lock:
+            if rows:
+                self._remember(table, rows[0])
+            else:
+                self._rows.setdefault(key, None)
+            row = self._rows.get(key)
+        return dict(row) if row is not None else None
+
+    def find(self, table: str, column: str, value: Any) -> List[Dict[str, Any]]:
+        """سطرهای column=eq.value؛ نتیجه و سطرهای آن در identity map ذخیره می‌شوند"""
+        query = (table, column, str(value))
+        with self._lock:
+            if query in self._queries:
+                return [dict(row) for row in self._queries[query]]
+
+        rows = self._repository.find(table, column, value)
+        if not isinstance(rows, list):
+            return []
+        with self._lock:
+            self._queries[query] = rows
+            for row in rows:
+                self._remember(table, row)
+        return [dict(row) for row in rows]
+
+    def update(self, table: str, uid: str, changes: Dict[str, Any]) -> None:
+        """ثبت تغییرات یک سطر؛ تغییرات پشت سر هم یک سطر در یک PATCH ادغام می‌شوند"""
+        if not changes:
+            return
+        key = (table, str(uid))
+        with self._lock:
+            self._pending.setdefault(key, {}).update(changes)
+            if self._rows.get(key) is not None:
+                self._rows[key] = {**self._rows[key], **changes}
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self._pending)
+
+    def commit(self) -> bool:
+        """
+        ارسال تغییرات ثبت شده (یک update برای هر سطر که سطر به‌روز شده را برمی‌گرداند)
+        در صورت خطا False برمی‌گرداند و تغییرات ناموفق برای تلاش دوباره باقی می‌مانند
+        """
+        with self._lock:
+            pending = list(self._pending.items())
+
+        success = True
+        for (table, uid), changes in pending:
+            response = self._repository.update(table, uid, changes)
+            if not response:
+                success = False
+                continue
+            with self._lock:
+                self._pending.pop((table, uid), None)
+                if isinstance(response, list) and response:
+                    self._remember(table, response[0])
+        return success
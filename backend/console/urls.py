@@ -2,13 +2,16 @@
 console/urls.py
 Defines API routes for console app:
 - login_view and logout_view for session auth
-- ChannelViewSet and UserViewSet for channel/user CRUD operations
+- ChannelViewSet and UserViewSet for channel/user CRUD operations (users/bulk/ for bulk user imports, channels/batch/ for batch channel operations)
 - SuperAdminViewSet for managing superadmin credentials and user limits
+- metrics_view for per-worker runtime statistics (HTTP connection pool)
+- async_views for channel/user lists and exports (other operations delegate to the viewsets) when CONSOLE_ASYNC_VIEWS is enabled (ASGI)
 """
+from django.conf import settings
 from django.urls import path, include  # URL helpers
 from rest_framework.routers import DefaultRouter
-from . import views
-from .views import login_view, logout_view, user_view
+from . import async_views, views
+from .views import login_view, logout_view, user_view, metrics_view
 from .views import UserViewSet
 
 
@@ -22,6 +25,22 @@ urlpatterns = [
     path('auth/login/', login_view, name='login'),
     path('auth/logout/', logout_view, name='logout'),
     path('auth/user/', user_view, name='user'),
+    # Per-worker runtime statistics
+    path('metrics/', metrics_view, name='metrics'),
+]
+
+if settings.CONSOLE_ASYNC_VIEWS:
+    # Async channel/user CRUD; other paths (e.g. non-uuid ids) fall through to the viewsets
+    urlpatterns += [
+        path('channels/', async_views.channel_collection, name='async-channel-list'),
+        path('channels/export/', async_views.channel_export, name='async-channel-export'),
+        path('channels/<uuid:pk>/', async_views.channel_detail, name='async-channel-detail'),
+        path('users/', async_views.user_collection, name='async-user-list'),
+        path('users/export/', async_views.user_export, name='async-user-export'),
+        path('users/<uuid:pk>/', async_views.user_detail, name='async-user-detail'),
+    ]
+
+urlpatterns += [
     # ViewSet-generated routes for channels and users
     path('', include(router.urls)),
 ]
@@ -6,24 +6,25 @@ login_view and logout_view handle session login/logout without CSRF enforcement.
 """
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from django.utils.decorators import method_decorator
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from .models import Channel, SuperAdmin
 from .serializers import ChannelSerializer, SuperAdminSerializer, UserSerializer
-from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User as DjangoUser
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
+from rest_framework.parsers import JSONParser
 from django.views.decorators.csrf import csrf_exempt
 import random
+from urllib.parse import quote
 import traceback
 import requests
 import os
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import logging
 import jwt
 import os
@@ -32,43 +33,91 @@ import time
 
 logger = logging.getLogger(__name__)
 
-from .supabase_client import create_user, get_user_by_email, update_user, delete_user, create_channel
+from .supabase_client import create_user, get_user_by_email, update_user, delete_user
+from . import bulk, db_pool, quota, tasks, transport
+from jobs import queue as job_queue
+from .bulk import CSVParser
+from .cache import get_row_cache, invalidate_for_write
+from .fanout import fan_out
+from .unit_of_work import UnitOfWork
+from .log import Preview, log_bodies
+from .login import authenticate_super_admin
+from .repository import get_repository
+from .pagination import KeysetPagination, PaginationError, parse_fields
+from .export import CSVRenderer, NDJSONRenderer, stream_table
 
-def _make_request(method: str, path: str, data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+def _service_headers(headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """
+    هدرهای احراز هویت service role برای درخواست‌های Supabase
+    headers: هدرهای اضافی (مثلاً Prefer) که با هدرهای پیش‌فرض ادغام می‌شوند
+    """
+    service_role_key = os.getenv('SERVICE_ROLE_KEY')
+    if not service_role_key:
+        logger.error("متغیر محیطی SERVICE_ROLE_KEY تنظیم نشده است")
+        return None
+
+    request_headers = {
+        'apikey': service_role_key,
+        'Authorization': f"Bearer {service_role_key}",
+        'Content-Type': 'application/json'
+    }
+    if headers:
+        request_headers.update(headers)
+    return request_headers
+
+RETURN_PREFERENCES = ('representation', 'minimal')
+
+def _prefer_return(method: str, path: str, headers: Optional[Dict[str, str]], returning: str) -> Optional[Dict[str, str]]:
+    """
+    افزودن Prefer: return=... به درخواست‌های نوشتن PostgREST (جداول، نه rpc و auth)
+    representation: سطرهای نوشته شده در پاسخ برگردانده می‌شوند، minimal: پاسخ خالی
+    """
+    if returning not in RETURN_PREFERENCES:
+        raise ValueError(f"returning باید یکی از {RETURN_PREFERENCES} باشد")
+    if method.upper() not in ('POST', 'PATCH', 'PUT', 'DELETE') or not path.startswith('/rest/v1/') or path.startswith('/rest/v1/rpc/'):
+        return headers
+    headers = dict(headers or {})
+    prefer = headers.get('Prefer', '')
+    if 'return=' not in prefer:
+        headers['Prefer'] = ','.join(filter(None, [prefer, f"return={returning}"]))
+    return headers
+
+def _make_request(method: str, path: str, data: Optional[Any] = None, headers: Optional[Dict[str, str]] = None,
+                  returning: str = 'representation') -> Optional[Dict[str, Any]]:
     """
     ارسال درخواست به Supabase API
+    headers: هدرهای اضافی (مثلاً Prefer) که با هدرهای پیش‌فرض ادغام می‌شوند
+    returning: برای نوشتن در جداول، representation (سطر نوشته شده برگردانده می‌شود و GET دوباره لازم نیست)
+    یا minimal (وقتی فراخواننده به سطر نیاز ندارد)
     """
     try:
-        base_url = "http://kong:8000"
-        url = f"{base_url}{path}"
-        service_role_key = os.getenv('SERVICE_ROLE_KEY')
-        if not service_role_key:
-            logger.error("متغیر محیطی SERVICE_ROLE_KEY تنظیم نشده است")
+        url = f"{transport.BASE_URL}{path}"
+        request_headers = _service_headers(_prefer_return(method, path, headers, returning))
+        if request_headers is None:
             return None
-            
-        headers = {
-            'apikey': service_role_key,
-            'Authorization': f"Bearer {service_role_key}",
-            'Content-Type': 'application/json'
-        }
 
-        logger.info(f"ارسال درخواست {method} به {url}")
-        logger.info(f"هدرها: {headers}")
-        if data:
-            logger.info(f"داده‌های ارسالی: {data}")
+        logger.debug("ارسال درخواست %s به %s", method, url)
+        bodies = log_bodies(logger)
+        if bodies and data:
+            logger.debug("داده‌های ارسالی: %s", Preview(data))
 
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=data
-        )
+        try:
+            response = transport.request(
+                method,
+                url,
+                headers=request_headers,
+                json=data
+            )
+        finally:
+            # سطرهایی که این درخواست ممکن است تغییر داده باشد از cache حذف می‌شوند
+            invalidate_for_write(method, path, data)
 
-        logger.info(f"کد وضعیت: {response.status_code}")
-        logger.info(f"پاسخ دریافتی: {response.text}")
+        logger.debug("کد وضعیت %s برای %s %s", response.status_code, method, path)
+        if bodies:
+            logger.debug("پاسخ دریافتی: %s", Preview(response.text))
 
         if response.status_code >= 400:
-            logger.error(f"خطا در درخواست به Supabase: {response.status_code} - {response.text}")
+            logger.error("خطا در درخواست به Supabase: %s - %s", response.status_code, Preview(response.text))
             return None
 
         # اگر درخواست موفق بود و پاسخ خالی است، True برگردان
@@ -83,147 +132,293 @@ def _make_request(method: str, path: str, data: Optional[Dict[str, Any]] = None)
             # اگر پاسخ JSON نباشد، True برگردان
             return True
     except Exception as e:
-        logger.error(f"خطا در ارسال درخواست به Supabase: {e}")
-        logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+        logger.exception("خطا در ارسال درخواست به Supabase: %s", e)
         return None
 
+# حداکثر تعداد شناسه در یک فیلتر in.(...) برای جلوگیری از URL های بیش از حد طولانی
+IN_FILTER_CHUNK_SIZE = 200
+
+def _chunks(values: list, size: int = IN_FILTER_CHUNK_SIZE):
+    """تقسیم لیست به بخش‌های کوچک‌تر"""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+# کاراکترهایی که مقدار را در فیلتر in.(...) PostgREST ملزم به قرار گرفتن داخل "" می‌کنند
+_IN_RESERVED_CHARS = frozenset(',()":\\ ')
+
+def _in_list(values) -> str:
+    """
+    مقادیر فیلتر in.(...) برای query string؛ مقادیر دارای کاراکتر رزرو شده (مثلاً نام کانال‌ها)
+    داخل "" قرار می‌گیرند و همه مقادیر URL-encode می‌شوند (شناسه‌ها بدون تغییر می‌مانند)
+    """
+    items = []
+    for value in values:
+        value = str(value)
+        if any(char in _IN_RESERVED_CHARS for char in value):
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        items.append(quote(value, safe=''))
+    return ','.join(items)
+
+class IdLookupError(Exception):
+    """بررسی وجود شناسه‌ها به دلیل خطای Supabase/پایگاه داده کامل نشد (پاسخ 502)"""
+
+
+def _lookup_failed_response(error: IdLookupError) -> Response:
+    logger.error("%s", error)
+    return Response({"detail": str(error)}, status=status.HTTP_502_BAD_GATEWAY)
+
+def _fetch_rows_in(table: str, column: str, values: list, select: str = '*') -> Optional[list]:
+    """
+    دریافت تمام سطرهایی که مقدار ستون آن‌ها در لیست داده شده است
+    به جای یک درخواست GET برای هر شناسه، از فیلتر in.(...) استفاده می‌شود
+    خروجی None اگر هر یک از بخش‌ها با خطا مواجه شود
+    """
+    return get_repository().rows_in(table, column, values, select)
+
+def _is_uuid(value) -> bool:
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+def _partition_existing_ids(table: str, ids: list) -> Tuple[list, list]:
+    """
+    بررسی وجود شناسه‌ها با یک درخواست uid=in.(...)&select=uid
+    cache سطرها جایگزین این بررسی نمی‌شود: سطری که در worker دیگر یا خارج از این سرویس حذف شده
+    تا پایان TTL در cache می‌ماند
+    شناسه‌های کاربر که uuid معتبر نیستند بدون درخواست ناشناخته شمرده می‌شوند (PostgREST کل فیلتر
+    in.(...) را با یک مقدار نامعتبر رد می‌کند). اگر جستجو با خطا مواجه شود IdLookupError؛ فقط
+    شناسه‌هایی که نبودشان تأیید شده ناشناخته هستند
+    خروجی: (شناسه‌های معتبر، شناسه‌های ناشناخته) با حفظ ترتیب ورودی
+    """
+    ids = list(dict.fromkeys(ids or []))
+    if not ids:
+        return [], []
+    candidates = [value for value in ids if _is_uuid(value)] if table == 'users' else ids
+    found = set()
+    if candidates:
+        rows = _fetch_rows_in(table, 'uid', candidates, select='uid')
+        if rows is None:
+            raise IdLookupError(f"Error checking {table} ids in Supabase")
+        found = {str(row.get('uid')) for row in rows}
+    valid = [value for value in ids if str(value) in found]
+    unknown = [value for value in ids if str(value) not in found]
+    return valid, unknown
+
+def _cached_rows(table: str, uid: str) -> Optional[list]:
+    """
+    دریافت یک سطر با uid از طریق cache سطرها (read-through)
+    خروجی مانند _make_request: لیست یک عضوی، لیست خالی یا None در صورت خطا
+    """
+    loaded = {}
+
+    def load():
+        rows = get_repository().get_rows(table, uid)
+        loaded['rows'] = rows
+        return rows[0] if isinstance(rows, list) and rows else None
+
+    row = get_row_cache().fetch(table, str(uid), load)
+    if row is not None:
+        return [row]
+    return loaded.get('rows')
+
+def _validate_channel_ids(channel_ids: list) -> Tuple[list, list]:
+    """اعتبارسنجی گروهی شناسه کانال‌ها"""
+    valid, unknown = _partition_existing_ids('channels', channel_ids)
+    if unknown:
+        logger.warning("کانال‌های با uid %s یافت نشدند و از لیست کانال‌های کاربر حذف شدند", Preview(unknown))
+    return valid, unknown
+
+def _validate_user_ids(user_ids: list) -> Tuple[list, list]:
+    """اعتبارسنجی گروهی شناسه کاربران"""
+    valid, unknown = _partition_existing_ids('users', user_ids)
+    if unknown:
+        logger.warning("کاربران با شناسه %s یافت نشدند و از لیست کاربران کانال حذف شدند", Preview(unknown))
+    return valid, unknown
+
+def _channel_member_ids(channel_uid: str) -> Optional[list]:
+    """شناسه کاربران عضو یک کانال از جدول channel_membership (جستجوی ایندکس‌دار)"""
+    return get_repository().member_ids('channel_uid', channel_uid)
+
+def _user_channel_ids(user_uid: str) -> Optional[list]:
+    """شناسه کانال‌های یک کاربر از جدول channel_membership (جستجوی ایندکس‌دار)"""
+    return get_repository().member_ids('user_uid', user_uid)
+
+def _list_response(table: str, request, pagination: KeysetPagination) -> Response:
+    """
+    لیست سطرهای یک جدول با صفحه‌بندی کلیدی (limit/cursor)، انتخاب ستون‌ها (fields) و شمارش اختیاری (count)
+    بدون پارامتر limit/cursor همان آرایه کامل قبلی برگردانده می‌شود
+    """
+    query_params = request.query_params
+    try:
+        if not pagination.is_requested(query_params):
+            fields = parse_fields(query_params.get('fields'))
+            response = get_repository().list_rows(table, fields)
+            if not response:
+                logger.warning("پاسخی از Supabase REST API دریافت نشد")
+                return Response([], status=status.HTTP_200_OK)
+            return Response(response, status=status.HTTP_200_OK)
+
+        page = pagination.parse(query_params)
+    except PaginationError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = get_repository().list_page(table, pagination, page)
+    if result is None:
+        return Response(
+            {"detail": f"Error fetching {table} from Supabase API"},
+            status=status.HTTP_502_BAD_GATEWAY
+        )
+
+    rows, total = result
+    return Response(pagination.page_body(page, rows, total), status=status.HTTP_200_OK)
+
+def _export_response(table: str, request, pagination: KeysetPagination):
+    """
+    خروجی کامل جدول به صورت stream با فرمت ndjson یا csv (پارامتر format)
+    """
+    try:
+        fields = parse_fields(request.query_params.get('fields'))
+    except PaginationError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = stream_table(table, request.accepted_renderer.format, fields, _service_headers(), pagination.ordering)
+    if response is None:
+        return Response(
+            {"detail": f"Error exporting {table} from Supabase API"},
+            status=status.HTTP_502_BAD_GATEWAY
+        )
+    return response
+
 class ChannelViewSet(viewsets.ModelViewSet):
     authentication_classes = [SessionAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Channel.objects.using('supabase').none()  # تغییر به none() برای جلوگیری از دسترسی مستقیم
     serializer_class = ChannelSerializer
+    # جدول channels ستون created_at ندارد؛ uid یکتا و غیر NULL است
+    keyset_pagination = KeysetPagination(ordering=('uid',))
 
-    def _update_user_channels(self, channel_id: str, user_ids: list):
-        """به‌روزرسانی کانال‌های کاربران"""
+    def _update_user_channels(self, channel_id: str, user_ids: list, uow: Optional[UnitOfWork] = None):
+        """
+        به‌روزرسانی کانال‌های کاربران
+        uow: identity map درخواست فعلی، برای استفاده دوباره از سطر کانال خوانده شده
+        """
         if not user_ids or not isinstance(user_ids, list) or not channel_id:
-            logger.warning(f"لیست کاربران یا شناسه کانال نامعتبر است: users={user_ids}, channel_id={channel_id}")
+            logger.warning("لیست کاربران یا شناسه کانال نامعتبر است: users=%s, channel_id=%s", Preview(user_ids), channel_id)
             return False
             
         try:
-            logger.info(f"شروع به‌روزرسانی کانال‌های کاربران: channel_id={channel_id}, user_ids={user_ids}")
+            logger.info("شروع به‌روزرسانی کانال‌های کاربران: channel_id=%s, user_ids=%s", channel_id, Preview(user_ids))
             
             # دریافت اطلاعات کانال فقط با استفاده از uid
-            channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-            if channel is True or channel is None or (isinstance(channel, list) and len(channel) == 0):
-                logger.error(f"کانال با uid {channel_id} یافت نشد")
+            channel = uow.get('channels', channel_id) if uow is not None else _cached_rows('channels', channel_id)
+            if channel is True or not channel:
+                logger.error("کانال با uid %s یافت نشد", channel_id)
                 return False
             
-            # استخراج اطلاعات کانال
-            if isinstance(channel, list) and len(channel) > 0:
-                channel = channel[0]
-                logger.info(f"اطلاعات کانال یافت شده: {channel}")
-            else:
-                logger.error(f"فرمت داده کانال نامعتبر است: {channel}")
-                
-            success_count = 0    
-            # برای هر کاربر، لیست کانال‌ها را به‌روزرسانی کن
-            for user_id in user_ids:
-                # دریافت اطلاعات کاربر
-                user = _make_request('GET', f"/rest/v1/users?uid=eq.{user_id}")
-                if user is True or user is None or (isinstance(user, list) and len(user) == 0):
-                    logger.error(f"کاربر با شناسه {user_id} یافت نشد")
-                    continue
-
-                if isinstance(user, list) and len(user) > 0:
-                    user = user[0]
-                
-                channels = user.get('allowed_channels', []) or []
-                logger.info(f"کانال‌های فعلی کاربر {user_id}: {channels}")
-                
-                # اگر کانال در لیست کانال‌های کاربر نیست، اضافه کن
-                if channel_id not in channels:
-                    channels.append(channel_id)
-                    logger.info(f"افزودن کانال {channel_id} به لیست کانال‌های کاربر {user_id}")
-                    result = _make_request('PATCH', f"/rest/v1/users?uid=eq.{user_id}", {'allowed_channels': channels})
-                    if result:
-                        success_count += 1
-                        logger.info(f"کانال {channel_id} با موفقیت به لیست کانال‌های کاربر {user_id} اضافه شد")
-                    else:
-                        logger.error(f"خطا در افزودن کانال {channel_id} به لیست کانال‌های کاربر {user_id}")
-                else:
-                    logger.info(f"کانال {channel_id} از قبل در لیست کانال‌های کاربر {user_id} وجود دارد")
-                    success_count += 1
+            # افزودن اتمیک کانال به آرایه allowed_channels همه کاربران در سمت دیتابیس
+            user_ids = list(dict.fromkeys(user_ids))
+            found_count = get_repository().add_users_to_channel(channel_id, user_ids)
+            if found_count is None:
+                logger.error("خطا در افزودن کانال %s به لیست کانال‌های کاربران", channel_id)
+                return False
 
-            logger.info(f"نتیجه به‌روزرسانی کانال‌های کاربران: {success_count} از {len(user_ids)} کاربر با موفقیت به‌روزرسانی شدند")
-            return success_count > 0
+            logger.info("نتیجه به‌روزرسانی کانال‌های کاربران: %s از %s کاربر با موفقیت به‌روزرسانی شدند", found_count, len(user_ids))
+            return found_count > 0
         except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی کانال‌های کاربران: {e}")
+            logger.error("خطا در به‌روزرسانی کانال‌های کاربران: %s", e)
             logger.error(traceback.format_exc())
             return False
 
-    def _remove_user_channels(self, channel_id: str, user_ids: list):
+    def _remove_user_channels(self, channel_id: str, user_ids: list, uow: Optional[UnitOfWork] = None):
         """حذف کانال از لیست کانال‌های کاربران"""
         if not user_ids or not isinstance(user_ids, list) or not channel_id:
-            logger.warning(f"لیست کاربران یا شناسه کانال نامعتبر است: users={user_ids}, channel_id={channel_id}")
+            logger.warning("لیست کاربران یا شناسه کانال نامعتبر است: users=%s, channel_id=%s", Preview(user_ids), channel_id)
             return False
             
         try:
             # دریافت اطلاعات کانال فقط با استفاده از uid
-            channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-            if channel is True or channel is None or (isinstance(channel, list) and len(channel) == 0):
-                logger.error(f"کانال با uid {channel_id} یافت نشد")
+            channel = uow.get('channels', channel_id) if uow is not None else _cached_rows('channels', channel_id)
+            if channel is True or not channel:
+                logger.error("کانال با uid %s یافت نشد", channel_id)
                 return False
-            
-            # استخراج اطلاعات کانال
-            if isinstance(channel, list) and len(channel) > 0:
-                channel = channel[0]
-                
-            # برای هر کاربر، کانال را از لیست کانال‌ها حذف کن
-            for user_id in user_ids:
-                # دریافت اطلاعات کاربر
-                user = _make_request('GET', f"/rest/v1/users?uid=eq.{user_id}")
-                if user is True or user is None or (isinstance(user, list) and len(user) == 0):
-                    logger.error(f"کاربر با شناسه {user_id} یافت نشد")
-                    continue
-
-                # اگر پاسخ یک لیست است، اولین آیتم را استفاده کن
-                if isinstance(user, list) and len(user) > 0:
-                    user = user[0]
                 
-                channels = user.get('allowed_channels', [])
-                
-                # اگر کانال در لیست کانال‌های کاربر است، حذف کن
-                if channel_id in channels:
-                    channels.remove(channel_id)
-                    _make_request('PATCH', f"/rest/v1/users?uid=eq.{user_id}", {'allowed_channels': channels})
+            # حذف اتمیک کانال از آرایه allowed_channels کاربران در سمت دیتابیس
+            result = get_repository().remove_users_from_channel(channel_id, list(dict.fromkeys(user_ids)))
+            if result is None:
+                logger.error("خطا در حذف کانال %s از لیست کانال‌های کاربران", channel_id)
+                return False
 
             return True
         except Exception as e:
-            logger.error(f"خطا در حذف کانال از لیست کانال‌های کاربران: {e}")
+            logger.error("خطا در حذف کانال از لیست کانال‌های کاربران: %s", e)
             return False
 
     def list(self, request):
         """
         دریافت لیست کانال‌ها از Supabase REST API به جای دسترسی مستقیم به دیتابیس
+        پارامترهای اختیاری: limit، cursor، fields و count=exact|estimated
         """
         try:
-            # استفاده از _make_request برای دریافت کانال‌ها از Supabase REST API
-            response = _make_request('GET', '/rest/v1/channels', None)
-            logger.info(f"دریافت کانال‌ها از Supabase REST API: {response}")
-            
-            # اگر پاسخ وجود ندارد یا خطا دارد، آرایه خالی برگردان
-            if not response:
-                logger.warning("پاسخی از Supabase REST API دریافت نشد")
-                return Response([], status=status.HTTP_200_OK)
-                
-            # اگر پاسخ True است (عملیات موفق اما داده‌ای وجود ندارد)
-            if response is True:
-                logger.info("پاسخ دریافتی True است (عملیات موفق اما داده‌ای وجود ندارد)")
-                return Response([], status=status.HTTP_200_OK)
-                
-            # اگر پاسخ یک لیست است، همه آیتم‌ها را برگردان
-            if isinstance(response, list):
-                return Response(response, status=status.HTTP_200_OK)
-            
-            # اگر پاسخ یک آبجکت است
-            return Response(response, status=status.HTTP_200_OK)
+            return _list_response('channels', request, self.keyset_pagination)
         except Exception as e:
-            logger.error(f"خطا در دریافت کانال‌ها از Supabase: {e}")
+            logger.error("خطا در دریافت کانال‌ها از Supabase: %s", e)
             return Response(
                 {"detail": "Error fetching channels from Supabase API"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        خروجی کامل کانال‌ها به صورت stream (format=ndjson|csv و fields اختیاری)
+        """
+        try:
+            return _export_response('channels', request, self.keyset_pagination)
+        except Exception as e:
+            logger.error("خطا در خروجی گرفتن از کانال‌ها: %s", e)
+            logger.error(traceback.format_exc())
+            return Response(
+                {"detail": "Error exporting channels from Supabase API"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        اجرای گروهی عملیات ساخت، ویرایش و حذف کانال‌ها
+        بدنه: آرایه یا {"operations": [...]} با عملیات {"op": "create|update|delete", "uid", "name", "allowed_users"}
+        پاسخ: نتیجه هر عملیات به ترتیب ورودی؛ 200 اگر همه موفق باشند، 207 اگر بخشی موفق باشند و 400 اگر هیچ‌کدام
+        """
+        try:
+            operations = bulk.parse_channel_operations(request.data)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = bulk.apply_channel_operations(operations)
+            succeeded = sum(1 for result in results if result['status'] != 'error')
+            if succeeded == len(results):
+                response_status = status.HTTP_200_OK
+            elif succeeded:
+                response_status = status.HTTP_207_MULTI_STATUS
+            else:
+                response_status = status.HTTP_400_BAD_REQUEST
+            return Response(
+                {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results},
+                status=response_status
+            )
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
+        except Exception as e:
+            logger.error("خطا در عملیات گروهی کانال‌ها: %s", e)
+            logger.error(traceback.format_exc())
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     def create(self, request, *args, **kwargs):
         """
         ایجاد کانال جدید با استفاده از Supabase REST API
@@ -235,10 +430,20 @@ class ChannelViewSet(viewsets.ModelViewSet):
             name = data.get('name', '')
             allowed_users = data.get('allowed_users', [])
             
+            # بررسی اعتبار کاربران و تکراری بودن نام کانال به صورت همزمان
+            checks = {}
+            if allowed_users and isinstance(allowed_users, list):
+                checks['users'] = lambda: _validate_user_ids(allowed_users)
+            if name:
+                checks['name'] = lambda: get_repository().find('channels', 'name', name)
+            results = fan_out(checks)
+
+            if 'users' in results:
+                allowed_users, _ = results['users'].get()
+            
             # بررسی تکراری بودن نام کانال
             if name:
-                # دریافت تمام کانال‌ها با این نام
-                existing_channels = _make_request('GET', f"/rest/v1/channels?name=eq.{name}")
+                existing_channels = results['name'].get()
                 
                 # اگر کانالی با این نام وجود داشت، خطا بده
                 if existing_channels and (isinstance(existing_channels, list) and len(existing_channels) > 0):
@@ -247,60 +452,56 @@ class ChannelViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            # استفاده از تابع create_channel
-            logger.info(f"ایجاد کانال جدید با نام '{name}'")
-            channel_data = create_channel(name=name, allowed_users=allowed_users)
+            # ایجاد کانال؛ سطر ساخته شده در همان پاسخ برگردانده می‌شود
+            logger.info("ایجاد کانال جدید با نام '%s'", name)
+            created = get_repository().insert('channels', {
+                "name": name,
+                "uid": str(uuid.uuid4()),
+                "allowed_users": allowed_users or [],
+            })
+            channel_data = created[0] if created else None
             
             if not channel_data:
                 return Response(
                     {"detail": "Failed to create channel in Supabase"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-                
-            # اگر channel_data یک boolean است (مثل True)، باید اطلاعات کانال را با یک درخواست GET دریافت کنیم
-            if isinstance(channel_data, bool):
-                logger.info("پاسخ create_channel بولین بود. دریافت اطلاعات کانال با GET...")
-                # در این حالت نیاز به uid داریم که باید از جای دیگری دریافت شود
-                # باید کانال‌ها را بر اساس نام جستجو کنیم
-                
-                channels = _make_request('GET', f"/rest/v1/channels?name=eq.{name}")
-                if isinstance(channels, list) and len(channels) > 0:
-                    channel_data = channels[0]
-                    logger.info(f"کانال با نام {name} یافت شد: {channel_data}")
-                else:
-                    logger.warning(f"کانال با نام {name} پس از ایجاد یافت نشد")
-                    # تولید شناسه جدید برای جلوگیری از خطا
-                    uid = str(uuid.uuid4())
-                    channel_data = {
-                        "id": None,  # ID واقعی در دسترس نیست
-                        "name": name,
-                        "allowed_users": allowed_users,
-                        "uid": uid,
-                        "created_at": datetime.datetime.now().isoformat()
-                    }
             
+            # عضویت کاربران کانال جدید در صف کارهای پس‌زمینه (پاسخ 202 با شناسه کار)
+            if allowed_users and isinstance(allowed_users, list) and job_queue.is_enabled() and channel_data.get('uid'):
+                job = tasks.enqueue_membership_job(
+                    'console.add_users_to_channel', f"channel-create:{channel_data['uid']}",
+                    channel_uid=channel_data['uid'], user_uids=list(dict.fromkeys(allowed_users)),
+                )
+                return Response({**channel_data, **tasks.job_response(job)}, status=status.HTTP_202_ACCEPTED)
+
             # به‌روزرسانی کانال‌های کاربران
             if channel_data and allowed_users and isinstance(allowed_users, list) and len(allowed_users) > 0:
                 try:
                     # استفاده از uid به جای id
                     channel_id = channel_data.get('uid')
-                    logger.info(f"شناسه کانال برای به‌روزرسانی کاربران: {channel_id}")
+                    logger.info("شناسه کانال برای به‌روزرسانی کاربران: %s", channel_id)
                     if channel_id:
-                        logger.info(f"به‌روزرسانی {len(allowed_users)} کاربر با شناسه‌های: {allowed_users}")
-                        result = self._update_user_channels(channel_id, allowed_users)
-                        logger.info(f"نتیجه به‌روزرسانی کانال‌های کاربران: {'موفق' if result else 'ناموفق'}")
+                        logger.info("به‌روزرسانی %s کاربر با شناسه‌های: %s", len(allowed_users), Preview(allowed_users))
+                        # سطر برگشتی POST (return=representation) دوباره خوانده نمی‌شود
+                        uow = UnitOfWork(_cached_rows, get_repository())
+                        uow.add('channels', channel_data)
+                        result = self._update_user_channels(channel_id, allowed_users, uow=uow)
+                        logger.info("نتیجه به‌روزرسانی کانال‌های کاربران: %s", 'موفق' if result else 'ناموفق')
                     else:
                         logger.error("شناسه کانال (uid) در داده‌های کانال یافت نشد")
                         # لاگ کامل داده‌های کانال برای عیب‌یابی
-                        logger.error(f"داده‌های کانال: {channel_data}")
+                        logger.error("داده‌های کانال: %s", Preview(channel_data))
                 except Exception as e:
-                    logger.error(f"خطا در به‌روزرسانی کانال‌های کاربران: {e}")
-                    logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+                    logger.error("خطا در به‌روزرسانی کانال‌های کاربران: %s", e)
+                    logger.error("جزئیات خطا: %s", traceback.format_exc())
                     # این خطا نباید باعث شکست کل عملیات شود
                 
             return Response(channel_data, status=status.HTTP_201_CREATED)
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
         except Exception as e:
-            logger.error(f"خطا در ایجاد کانال در Supabase: {e}")
+            logger.error("خطا در ایجاد کانال در Supabase: %s", e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -311,7 +512,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
         دریافت اطلاعات یک کانال خاص با استفاده از Supabase REST API
         """
         try:
-            response = _make_request('GET', f"/rest/v1/channels?uid=eq.{pk}")
+            response = _cached_rows('channels', pk)
             
             if response is True or response is None or (isinstance(response, list) and len(response) == 0):
                 return Response(
@@ -326,7 +527,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
             # اگر پاسخ یک آبجکت است
             return Response(response, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"خطا در دریافت کانال از Supabase: {e}")
+            logger.error("خطا در دریافت کانال از Supabase: %s", e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -343,64 +544,72 @@ class ChannelViewSet(viewsets.ModelViewSet):
             if 'channel_id' in data:
                 del data['channel_id']
                 
+            # سطرهای خوانده شده در این درخواست فقط یک بار از Supabase دریافت می‌شوند
+            uow = UnitOfWork(_cached_rows, get_repository())
+
             # دریافت اطلاعات کانال فعلی
-            current_channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{pk}")
-            if current_channel is True or current_channel is None or (isinstance(current_channel, list) and len(current_channel) == 0):
+            current_channel = uow.get('channels', pk)
+            if current_channel is None:
                 return Response(
                     {"detail": "Channel not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # اگر پاسخ یک لیست است، اولین آیتم را استفاده کن
-            if isinstance(current_channel, list) and len(current_channel) > 0:
-                current_channel = current_channel[0]
-            
             # بررسی تکراری بودن نام جدید کانال
             if 'name' in data and data['name'] and data['name'] != current_channel.get('name'):
                 # دریافت تمام کانال‌ها با این نام
-                existing_channels = _make_request('GET', f"/rest/v1/channels?name=eq.{data['name']}")
+                existing_channels = uow.find('channels', 'name', data['name'])
                 
                 # اگر کانالی با این نام وجود داشت، خطا بده
-                if existing_channels and (isinstance(existing_channels, list) and len(existing_channels) > 0):
+                if existing_channels:
                     return Response(
                         {"detail": f"کانالی با نام '{data['name']}' از قبل وجود دارد"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            # به‌روزرسانی کانال
-            response = _make_request('PATCH', f"/rest/v1/channels?uid=eq.{pk}", data)
-            
-            if not response:
+            # عضویت کاربران فقط از طریق جدول channel_membership تغییر می‌کند
+            allowed_users = data.pop('allowed_users', None)
+            if allowed_users is not None:
+                # دریافت اعضای فعلی و بررسی اعتبار کاربران جدید به صورت همزمان، پیش از هر نوشتن
+                results = fan_out({
+                    'members': lambda: _channel_member_ids(pk),
+                    'users': lambda: _validate_user_ids(allowed_users),
+                })
+                current_members = results['members'].get()
+                if current_members is None:
+                    current_members = current_channel.get('allowed_users', []) or []
+                allowed_users, _ = results['users'].get()
+
+            # به‌روزرسانی کانال: یک PATCH که سطر به‌روز شده را برمی‌گرداند (بدون GET دوباره)
+            uow.update('channels', pk, data)
+            if not uow.commit():
                 return Response(
                     {"detail": "Failed to update channel in Supabase"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-                
-            # اگر پاسخ True است، داده‌های به‌روزرسانی شده را برگردان
-            if response is True:
-                # دریافت اطلاعات کانال به‌روزرسانی شده
-                updated_channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{pk}")
-                if isinstance(updated_channel, list) and len(updated_channel) > 0:
-                    response = updated_channel[0]
-                else:
-                    # اگر نمی‌توانیم داده‌های به‌روزرسانی شده را دریافت کنیم، از داده‌های ورودی استفاده می‌کنیم
-                    response = {**current_channel, **data}
+            response = uow.get('channels', pk) or {**current_channel, **data}
                 
             # به‌روزرسانی کانال‌های کاربران
-            if 'allowed_users' in data:
-                # حذف کانال از لیست کانال‌های کاربرانی که دیگر مجاز نیستند
-                removed_users = list(set(current_channel.get('allowed_users', [])) - set(data['allowed_users']))
+            if allowed_users is not None:
+                # حذف عضویت کاربرانی که دیگر مجاز نیستند و افزودن کاربران جدید (مستقل از هم)
+                removed_users = list(set(current_members) - set(allowed_users))
+                new_users = list(set(allowed_users) - set(current_members))
+                membership_calls = {}
                 if removed_users:
-                    self._remove_user_channels(pk, removed_users)
-
-                # اضافه کردن کانال به لیست کانال‌های کاربران جدید
-                new_users = list(set(data['allowed_users']) - set(current_channel.get('allowed_users', [])))
+                    membership_calls['remove'] = lambda: self._remove_user_channels(pk, removed_users, uow)
                 if new_users:
-                    self._update_user_channels(pk, new_users)
+                    membership_calls['add'] = lambda: self._update_user_channels(pk, new_users, uow)
+                for key, result in fan_out(membership_calls).items():
+                    if not result.ok:
+                        logger.error("خطا در به‌روزرسانی عضویت کاربران کانال %s (%s): %s", pk, key, result.error)
+
+                response = {**response, 'allowed_users': list(dict.fromkeys(allowed_users))}
                 
             return Response(response, status=status.HTTP_200_OK)
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
         except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی کانال در Supabase: {e}")
+            logger.error("خطا در به‌روزرسانی کانال در Supabase: %s", e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -412,7 +621,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
         با استفاده از uid
         """
         try:
-            logger.info(f"درخواست حذف کانال با شناسه {pk}")
+            logger.info("درخواست حذف کانال با شناسه %s", pk)
             
             # اگر pk خالی است، خطا برگردان
             if not pk:
@@ -423,10 +632,10 @@ class ChannelViewSet(viewsets.ModelViewSet):
                 )
                 
             # ابتدا اطلاعات کانال را دریافت می‌کنیم - از uid استفاده می‌کنیم
-            channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{pk}")
+            channel = _cached_rows('channels', pk)
             
             if not channel or (isinstance(channel, list) and len(channel) == 0):
-                logger.error(f"کانال با شناسه uid={pk} یافت نشد")
+                logger.error("کانال با شناسه uid=%s یافت نشد", pk)
                 return Response(
                     {"detail": "Channel not found"},
                     status=status.HTTP_404_NOT_FOUND
@@ -435,44 +644,50 @@ class ChannelViewSet(viewsets.ModelViewSet):
             # اگر پاسخ یک لیست است، اولین آیتم را استفاده می‌کنیم
             if isinstance(channel, list) and len(channel) > 0:
                 channel = channel[0]
+
+            # حذف سطر کانال در همین درخواست و پاک‌سازی عضویت‌ها در صف کارهای پس‌زمینه
+            if job_queue.is_enabled():
+                if not get_repository().delete('channels', pk):
+                    logger.error("خطا در حذف کانال با uid=%s از جدول channels", pk)
+                    return Response(
+                        {"detail": "Failed to delete channel"},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
+                job = tasks.enqueue_membership_job(
+                    'console.delete_memberships', f"channel-destroy:{pk}", column='channel_uid', value=str(pk),
+                )
+                return Response(
+                    {"detail": f"کانال {pk} حذف شد؛ پاک‌سازی عضویت‌ها در صف است", **tasks.job_response(job)},
+                    status=status.HTTP_202_ACCEPTED
+                )
             
-            # گام 1: حذف کانال از لیست کانال‌های مجاز تمام کاربرانی که به این کانال دسترسی داشته‌اند
+            # گام 1: حذف عضویت‌های این کانال با یک دستور DELETE روی ایندکس channel_uid
+            # (آرایه allowed_channels کاربران عضو توسط trigger به‌روزرسانی می‌شود)
             try:
-                # دریافت تمامی کاربران
-                users = _make_request('GET', f"/rest/v1/users")
-                
-                if users and isinstance(users, list):
-                    for user in users:
-                        user_id = user.get('uid')
-                        allowed_channels = user.get('allowed_channels', [])
-                        
-                        # اگر کانال در لیست کانال‌های مجاز کاربر وجود دارد، آن را حذف کن
-                        if pk in allowed_channels:
-                            allowed_channels.remove(pk)
-                            _make_request('PATCH', f"/rest/v1/users?uid=eq.{user_id}", {'allowed_channels': allowed_channels})
-                            logger.info(f"کانال {pk} از لیست کانال‌های مجاز کاربر {user_id} حذف شد")
+                if not get_repository().delete_memberships('channel_uid', pk):
+                    logger.error("خطا در حذف عضویت‌های کانال %s", pk)
+                else:
+                    logger.info("عضویت‌های کانال %s حذف شدند", pk)
             except Exception as e:
-                logger.error(f"خطا در حذف کانال از لیست کانال‌های مجاز کاربران: {e}")
+                logger.error("خطا در حذف کانال از لیست کانال‌های مجاز کاربران: %s", e)
                 # ادامه اجرا، زیرا این مرحله نباید کل فرآیند را متوقف کند
                 
             # گام 2: حذف کانال از جدول channels با استفاده از uid
-            delete_response = _make_request('DELETE', f"/rest/v1/channels?uid=eq.{pk}")
-            
-            if delete_response is None:
-                logger.error(f"خطا در حذف کانال با uid={pk} از جدول channels")
+            if not get_repository().delete('channels', pk):
+                logger.error("خطا در حذف کانال با uid=%s از جدول channels", pk)
                 return Response(
                     {"detail": "Failed to delete channel"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
                 
-            logger.info(f"کانال با uid={pk} با موفقیت حذف شد")
+            logger.info("کانال با uid=%s با موفقیت حذف شد", pk)
             return Response(
                 {"detail": f"کانال {pk} با موفقیت حذف شد"},
                 status=status.HTTP_200_OK
             )
             
         except Exception as e:
-            logger.error(f"خطا در حذف کانال با uid={pk}: {e}")
+            logger.error("خطا در حذف کانال با uid=%s: %s", pk, e)
             logger.error(traceback.format_exc())
             return Response(
                 {"detail": f"Error deleting channel: {str(e)}"},
@@ -484,118 +699,125 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]  # اجازه دسترسی به همه
     queryset = DjangoUser.objects.using('supabase').none()  # تغییر به none() برای جلوگیری از دسترسی مستقیم
     serializer_class = UserSerializer
+    keyset_pagination = KeysetPagination(ordering=('created_at', 'uid'))
 
     def _update_channel_users(self, user_id: str, channel_ids: list):
         """به‌روزرسانی کاربران مجاز کانال‌ها"""
         if not channel_ids or not isinstance(channel_ids, list) or not user_id:
-            logger.warning(f"لیست کانال‌ها یا شناسه کاربر نامعتبر است: channels={channel_ids}, user_id={user_id}")
+            logger.warning("لیست کانال‌ها یا شناسه کاربر نامعتبر است: channels=%s, user_id=%s", Preview(channel_ids), user_id)
             return False
             
-        success = True
-        logger.info(f"شروع به‌روزرسانی کاربران مجاز کانال‌ها: user_id={user_id}, channel_ids={channel_ids}")
+        logger.info("شروع به‌روزرسانی کاربران مجاز کانال‌ها: user_id=%s, channel_ids=%s", user_id, Preview(channel_ids))
 
         try:
-            # برای هر کانال، لیست کاربران مجاز را به‌روزرسانی کن
-            for channel_id in channel_ids:
-                try:
-                    # دریافت اطلاعات کانال فقط با استفاده از uid
-                    channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-                    if not channel or len(channel) == 0:
-                        logger.error(f"کانال با uid {channel_id} یافت نشد")
-                        success = False
-                        continue
-
-                    channel = channel[0]
-                    allowed_users = channel.get('allowed_users', []) or []
-                    logger.info(f"کاربران مجاز فعلی کانال {channel_id}: {allowed_users}")
-                    
-                    # اگر کاربر در لیست کاربران مجاز نیست، اضافه کن
-                    if user_id not in allowed_users:
-                        allowed_users.append(user_id)
-                        logger.info(f"افزودن کاربر {user_id} به لیست کاربران مجاز کانال {channel_id}")
-                        result = _make_request('PATCH', f"/rest/v1/channels?uid=eq.{channel_id}", {'allowed_users': allowed_users})
-                        if not result:
-                            logger.error(f"خطا در به‌روزرسانی کاربران مجاز برای کانال {channel_id}")
-                            success = False
-                        else:
-                            logger.info(f"کاربر {user_id} با موفقیت به لیست کاربران مجاز کانال {channel_id} اضافه شد")
-                    else:
-                        logger.info(f"کاربر {user_id} از قبل در لیست کاربران مجاز کانال {channel_id} وجود دارد")
-                except Exception as e:
-                    logger.error(f"خطا در پردازش کانال {channel_id}: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    success = False
+            # افزودن اتمیک کاربر به آرایه allowed_users همه کانال‌ها در سمت دیتابیس
+            channel_ids = list(dict.fromkeys(channel_ids))
+            found_count = get_repository().add_channels_to_user(user_id, channel_ids)
+            if found_count is None:
+                logger.error("خطا در به‌روزرسانی کاربران مجاز برای کانال‌های %s", Preview(channel_ids))
+                return False
 
-            return success
+            if found_count < len(channel_ids):
+                logger.error("%s کانال از کانال‌های %s یافت نشد", len(channel_ids) - found_count, Preview(channel_ids))
+                return False
+
+            logger.info("کاربر %s با موفقیت به لیست کاربران مجاز %s کانال اضافه شد", user_id, found_count)
+            return True
         except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی کاربران مجاز کانال‌ها: {e}")
+            logger.error("خطا در به‌روزرسانی کاربران مجاز کانال‌ها: %s", e)
             logger.error(traceback.format_exc())
             return False
 
     def _remove_channel_users(self, user_id: str, channel_ids: list):
         """حذف کاربر از لیست کاربران مجاز کانال‌ها"""
         if not channel_ids or not isinstance(channel_ids, list) or not user_id:
-            logger.warning(f"لیست کانال‌ها یا شناسه کاربر نامعتبر است: channels={channel_ids}, user_id={user_id}")
+            logger.warning("لیست کانال‌ها یا شناسه کاربر نامعتبر است: channels=%s, user_id=%s", Preview(channel_ids), user_id)
             return False
             
-        success = True
-        
         try:
-            # برای هر کانال، کاربر را از لیست کاربران مجاز حذف کن
-            for channel_id in channel_ids:
-                try:
-                    # دریافت اطلاعات کانال فقط با استفاده از uid
-                    channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-                    if not channel or len(channel) == 0:
-                        logger.error(f"کانال با uid {channel_id} یافت نشد")
-                        success = False
-                        continue
-
-                    # اگر پاسخ یک لیست است، اولین آیتم را استفاده کن
-                    if isinstance(channel, list) and len(channel) > 0:
-                        channel = channel[0]
-                    
-                    allowed_users = channel.get('allowed_users', [])
-                    
-                    # اگر کاربر در لیست کاربران مجاز است، حذف کن
-                    if user_id in allowed_users:
-                        allowed_users.remove(user_id)
-                        result = _make_request('PATCH', f"/rest/v1/channels?uid=eq.{channel_id}", {'allowed_users': allowed_users})
-                        if not result:
-                            logger.error(f"خطا در حذف کاربر از کانال {channel_id}")
-                            success = False
-                except Exception as e:
-                    logger.error(f"خطا در پردازش حذف کاربر از کانال {channel_id}: {str(e)}")
-                    success = False
+            # حذف اتمیک کاربر از آرایه allowed_users کانال‌ها در سمت دیتابیس
+            channel_ids = list(dict.fromkeys(channel_ids))
+            found_count = get_repository().remove_channels_from_user(user_id, channel_ids)
+            if found_count is None:
+                logger.error("خطا در حذف کاربر از کانال‌های %s", Preview(channel_ids))
+                return False
 
-            return success
+            if found_count < len(channel_ids):
+                logger.error("%s کانال از کانال‌های %s یافت نشد", len(channel_ids) - found_count, Preview(channel_ids))
+                return False
+
+            return True
         except Exception as e:
-            logger.error(f"خطا در حذف کاربر از لیست کاربران مجاز کانال‌ها: {e}")
+            logger.error("خطا در حذف کاربر از لیست کاربران مجاز کانال‌ها: %s", e)
             return False
 
     def list(self, request):
         """
         دریافت لیست کاربران از Supabase REST API به جای دسترسی مستقیم به دیتابیس
+        پارامترهای اختیاری: limit، cursor، fields و count=exact|estimated
         """
         try:
-            # استفاده از _make_request برای دریافت کاربران از Supabase REST API
-            response = _make_request('GET', '/rest/v1/users', None)
-            logger.info(f"دریافت کاربران از Supabase REST API: {response}")
-
-            # اگر پاسخ وجود ندارد یا خطا دارد، آرایه خالی برگردان
-            if not response:
-                logger.warning("پاسخی از Supabase REST API دریافت نشد")
-                return Response([], status=status.HTTP_200_OK)
-                
-            # برگرداندن پاسخ API به عنوان نتیجه
-            return Response(response, status=status.HTTP_200_OK)
+            return _list_response('users', request, self.keyset_pagination)
         except Exception as e:
-            logger.error(f"خطا در دریافت کاربران از Supabase: {e}")
+            logger.error("خطا در دریافت کاربران از Supabase: %s", e)
             return Response(
                 {"detail": "Error fetching users from Supabase API"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        خروجی کامل کاربران به صورت stream (format=ndjson|csv و fields اختیاری)
+        """
+        try:
+            return _export_response('users', request, self.keyset_pagination)
+        except Exception as e:
+            logger.error("خطا در خروجی گرفتن از کاربران: %s", e)
+            logger.error(traceback.format_exc())
+            return Response(
+                {"detail": "Error exporting users from Supabase API"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, CSVParser])
+    def bulk(self, request):
+        """
+        ساخت گروهی کاربران از بدنه JSON (آرایه یا {"users": [...]}) یا CSV
+        پاسخ: خلاصه و نتیجه هر سطر به ترتیب ورودی
+        201 اگر همه سطرها ساخته شوند، 207 اگر بخشی ساخته شوند و 400 اگر هیچ سطری ساخته نشود
+        """
+        try:
+            rows = bulk.parse_rows(request.data)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            error, results = bulk.provision_users(rows, quota.quota_owner(request))
+            if error:
+                return Response({"detail": error}, status=status.HTTP_403_FORBIDDEN)
+
+            created = sum(1 for result in results if result['status'] == 'created')
+            if created == len(results) and created:
+                response_status = status.HTTP_201_CREATED
+            elif created:
+                response_status = status.HTTP_207_MULTI_STATUS
+            else:
+                response_status = status.HTTP_400_BAD_REQUEST
+            return Response(
+                {"created": created, "failed": len(results) - created, "results": results},
+                status=response_status
+            )
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
+        except Exception as e:
+            logger.error("خطا در ساخت گروهی کاربران: %s", e)
+            logger.error(traceback.format_exc())
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     def create(self, request, *args, **kwargs):
         """
         ایجاد کاربر جدید با استفاده از Supabase Auth و REST API
@@ -616,52 +838,73 @@ class UserViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # بررسی اعتبار کانال‌ها
+            # بررسی اعتبار کانال‌ها با یک درخواست
             valid_channels = []
             if channels:
-                try:
-                    for channel_id in channels:
-                        # دریافت اطلاعات کانال فقط با استفاده از uid
-                        channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-                        if channel and len(channel) > 0:
-                            valid_channels.append(channel_id)
-                        else:
-                            logger.warning(f"کانال با uid {channel_id} یافت نشد و از لیست کانال‌های کاربر حذف شد")
-                except Exception as e:
-                    logger.error(f"خطا در بررسی اعتبار کانال‌ها: {e}")
+                valid_channels, _ = _validate_channel_ids(channels)
+            
+            # گرفتن جای خالی از سهمیه سوپر ادمین (بررسی و افزایش user_count در یک دستور)
+            quota_owner = quota.quota_owner(request)
+            if not quota_owner:
+                return Response(
+                    {"detail": "ساخت کاربر فقط برای سوپر ادمین وارد شده ممکن است"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            if not quota.reserve(quota_owner):
+                return Response(
+                    {"detail": "سقف تعداد کاربران مجاز پر شده است"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
             
             # استفاده از create_user برای ساخت کاربر
-            logger.info(f"شروع فرآیند ساخت کاربر با نام کاربری {username}")
+            logger.info("شروع فرآیند ساخت کاربر با نام کاربری %s", username)
             
-            user_data = create_user(
-                username=username,
-                password=password,
-                role=role,
-                active=active,
-                allowed_channels=valid_channels
-            )
+            try:
+                user_data = create_user(
+                    username=username,
+                    password=password,
+                    role=role,
+                    active=active,
+                    allowed_channels=valid_channels,
+                    created_by=quota_owner
+                )
+            except Exception:
+                quota.release(quota_owner)
+                raise
             
             if not user_data:
+                quota.release(quota_owner)
                 return Response(
                     {"detail": "خطا در ساخت کاربر در Supabase"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
                 
+            # عضویت کانال‌های کاربر جدید در صف کارهای پس‌زمینه (پاسخ 202 با شناسه کار)
+            if valid_channels and job_queue.is_enabled() and user_data.get('uid'):
+                job = tasks.enqueue_membership_job(
+                    'console.add_channels_to_user', f"user-create:{user_data['uid']}",
+                    user_uid=str(user_data['uid']), channel_uids=list(dict.fromkeys(valid_channels)),
+                )
+                return Response(
+                    {**UserSerializer(user_data).data, **tasks.job_response(job)},
+                    status=status.HTTP_202_ACCEPTED
+                )
+
             # به‌روزرسانی کانال‌ها برای کاربر جدید
             if valid_channels:
                 try:
                     # استفاده از uid به جای id
                     user_uid = user_data.get('uid')
-                    logger.info(f"شناسه کاربر برای به‌روزرسانی کانال‌ها: {user_uid}")
+                    logger.info("شناسه کاربر برای به‌روزرسانی کانال‌ها: %s", user_uid)
                     if user_uid:
-                        logger.info(f"به‌روزرسانی {len(valid_channels)} کانال با شناسه‌های: {valid_channels}")
+                        logger.info("به‌روزرسانی %s کانال با شناسه‌های: %s", len(valid_channels), Preview(valid_channels))
                         result = self._update_channel_users(user_uid, valid_channels)
-                        logger.info(f"نتیجه به‌روزرسانی کانال‌های کاربر: {'موفق' if result else 'ناموفق'}")
+                        logger.info("نتیجه به‌روزرسانی کانال‌های کاربر: %s", 'موفق' if result else 'ناموفق')
                     else:
                         logger.error("شناسه کاربر (uid) در داده‌های کاربر یافت نشد")
                 except Exception as e:
-                    logger.error(f"خطا در به‌روزرسانی کانال‌های کاربر: {e}")
-                    logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+                    logger.error("خطا در به‌روزرسانی کانال‌های کاربر: %s", e)
+                    logger.error("جزئیات خطا: %s", traceback.format_exc())
                     # این خطا نباید باعث شکست کل عملیات شود
                 
             return Response(
@@ -669,9 +912,11 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_201_CREATED
             )
 
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
         except Exception as e:
-            logger.error(f"خطا در ساخت کاربر در Supabase: {e}")
-            logger.error(f"جزئیات خطا: {traceback.format_exc()}")
+            logger.error("خطا در ساخت کاربر در Supabase: %s", e)
+            logger.error("جزئیات خطا: %s", traceback.format_exc())
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -682,7 +927,7 @@ class UserViewSet(viewsets.ModelViewSet):
         دریافت اطلاعات یک کاربر خاص با استفاده از Supabase REST API
         """
         try:
-            response = _make_request('GET', f"/rest/v1/users?uid=eq.{pk}")
+            response = _cached_rows('users', pk)
             
             if not response or len(response) == 0:
                 return Response(
@@ -692,7 +937,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 
             return Response(response[0], status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"خطا در دریافت کاربر از Supabase: {e}")
+            logger.error("خطا در دریافت کاربر از Supabase: %s", e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -707,8 +952,14 @@ class UserViewSet(viewsets.ModelViewSet):
             data = request.data.copy()
             original_data = data.copy()  # نگهداری داده‌های اصلی برای بازگشت احتمالی
             
-            # دریافت اطلاعات کاربر فعلی
-            current_user = _make_request('GET', f"/rest/v1/users?uid=eq.{pk}")
+            # دریافت اطلاعات کاربر فعلی و بررسی اعتبار کانال‌ها به صورت همزمان
+            lookups = {'user': lambda: _cached_rows('users', pk)}
+            if 'allowed_channels' in data:
+                allowed_channels = data['allowed_channels']
+                lookups['channels'] = lambda: _validate_channel_ids(allowed_channels)
+            results = fan_out(lookups)
+
+            current_user = results['user'].get()
             if not current_user or len(current_user) == 0:
                 return Response(
                     {"detail": "User not found"},
@@ -718,17 +969,8 @@ class UserViewSet(viewsets.ModelViewSet):
             
             # بررسی اعتبار کانال‌ها
             if 'allowed_channels' in data:
-                valid_channels = []
-                for channel_id in data['allowed_channels']:
-                    # دریافت اطلاعات کانال فقط با استفاده از uid
-                    channel = _make_request('GET', f"/rest/v1/channels?uid=eq.{channel_id}")
-                    if channel and len(channel) > 0:
-                        valid_channels.append(channel_id)
-                    else:
-                        logger.warning(f"کانال با uid {channel_id} یافت نشد و از لیست کانال‌های کاربر حذف شد")
-
-                # جایگزینی لیست کانال‌ها با کانال‌های معتبر
-                data['allowed_channels'] = valid_channels
+                # جایگزینی لیست کانال‌ها با کانال‌های معتبر (یک درخواست برای همه کانال‌ها)
+                data['allowed_channels'], _ = results['channels'].get()
             
             # تعیین نیاز به به‌روزرسانی اطلاعات auth
             auth_update_needed = False
@@ -750,6 +992,8 @@ class UserViewSet(viewsets.ModelViewSet):
             users_data = data.copy()
             if 'username' in users_data and '@example.com' in users_data['username']:
                 users_data['username'] = users_data['username'].replace('@example.com', '')
+            # عضویت کانال‌ها فقط از طریق جدول channel_membership تغییر می‌کند
+            users_data.pop('allowed_channels', None)
 
             # فاز 1: به‌روزرسانی اطلاعات در auth
             auth_success = True
@@ -761,15 +1005,15 @@ class UserViewSet(viewsets.ModelViewSet):
 
                     if not auth_response: # انتقال این بلوک به داخل try
                         auth_success = False
-                        logger.error(f"خطا در به‌روزرسانی اطلاعات auth کاربر {pk}")
+                        logger.error("خطا در به‌روزرسانی اطلاعات auth کاربر %s", pk)
                 except Exception as e: # اصلاح تورفتگی این except و بلوک آن
                     auth_success = False
-                    logger.error(f"خطا در به‌روزرسانی auth: {e}")
+                    logger.error("خطا در به‌روزرسانی auth: %s", e)
 
             # فاز 2: به‌روزرسانی اطلاعات در جدول users
             # اگر auth با موفقیت به‌روزرسانی شد یا نیازی به به‌روزرسانی auth نبود
             if auth_success or not auth_update_needed:
-                response = _make_request('PATCH', f"/rest/v1/users?uid=eq.{pk}", users_data)
+                response = get_repository().update('users', pk, users_data) if users_data else current_user
 
                 if not response:
                     # اگر auth با موفقیت به‌روزرسانی شد اما جدول users به‌روزرسانی نشد،
@@ -783,9 +1027,9 @@ class UserViewSet(viewsets.ModelViewSet):
                             
                             if rollback_auth_data:
                                 _make_request('PUT', f"/auth/v1/admin/users?uid=eq.{pk}", rollback_auth_data)
-                                logger.info(f"اطلاعات auth با موفقیت به حالت قبل بازگشت")
+                                logger.info("اطلاعات auth با موفقیت به حالت قبل بازگشت")
                         except Exception as rollback_err:
-                            logger.error(f"خطا در بازگشت تغییرات auth: {rollback_err}")
+                            logger.error("خطا در بازگشت تغییرات auth: %s", rollback_err)
                     
                     return Response(
                         {"detail": "خطا در به‌روزرسانی کاربر در Supabase"},
@@ -795,20 +1039,28 @@ class UserViewSet(viewsets.ModelViewSet):
                 # به‌روزرسانی کانال‌های مجاز کاربران در جدول channels
                 if 'allowed_channels' in data:
                     try:
-                        # حذف کاربر از لیست کاربران مجاز کانال‌هایی که دیگر در لیست کانال‌های کاربر نیستند
-                        removed_channels = list(set(current_user.get('allowed_channels', [])) - set(data['allowed_channels']))
-                        if removed_channels:
-                            self._remove_channel_users(pk, removed_channels)
+                        current_channels = _user_channel_ids(pk)
+                        if current_channels is None:
+                            current_channels = current_user.get('allowed_channels', []) or []
 
-                        # اضافه کردن کاربر به لیست کاربران مجاز کانال‌های جدید
-                        new_channels = list(set(data['allowed_channels']) - set(current_user.get('allowed_channels', [])))
+                        # حذف کاربر از کانال‌هایی که دیگر در لیست نیستند و افزودن به کانال‌های جدید (مستقل از هم)
+                        removed_channels = list(set(current_channels) - set(data['allowed_channels']))
+                        new_channels = list(set(data['allowed_channels']) - set(current_channels))
+                        membership_calls = {}
+                        if removed_channels:
+                            membership_calls['remove'] = lambda: self._remove_channel_users(pk, removed_channels)
                         if new_channels:
-                            self._update_channel_users(pk, new_channels)
+                            membership_calls['add'] = lambda: self._update_channel_users(pk, new_channels)
+                        for result in fan_out(membership_calls).values():
+                            result.get()
                     except Exception as channel_err:
-                        logger.error(f"خطا در به‌روزرسانی کانال‌های مجاز: {channel_err}")
+                        logger.error("خطا در به‌روزرسانی کانال‌های مجاز: %s", channel_err)
                         # ادامه اجرا و بازگشت پاسخ موفق، زیرا کاربر به‌روزرسانی شده است
                         logger.info("کاربر با موفقیت به‌روزرسانی شد اما در به‌روزرسانی کانال‌ها خطا رخ داد")
                 
+                # PATCH با return=representation سطر به‌روز شده را برمی‌گرداند
+                if isinstance(response, list) and len(response) > 0:
+                    response = response[0]
                 return Response(response, status=status.HTTP_200_OK)
             
             # اگر auth با موفقیت به‌روزرسانی نشد
@@ -818,7 +1070,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 clean_data = {}
                 clean_data['username'] = data['username'].replace('@example.com', '')
                 
-                response = _make_request('PATCH', f"/rest/v1/users?uid=eq.{pk}", clean_data)
+                response = get_repository().update('users', pk, clean_data)
                 
                 if not response:
                     return Response(
@@ -836,8 +1088,10 @@ class UserViewSet(viewsets.ModelViewSet):
                 {"detail": "خطا در به‌روزرسانی کاربر در Supabase Auth"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        except IdLookupError as e:
+            return _lookup_failed_response(e)
         except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی کاربر در Supabase: {e}")
+            logger.error("خطا در به‌روزرسانی کاربر در Supabase: %s", e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -849,12 +1103,12 @@ class UserViewSet(viewsets.ModelViewSet):
         با استفاده از الگوی تراکنش دو مرحله‌ای برای تضمین همسانی داده‌ها
         """
         try:
-            logger.info(f"شروع فرایند حذف کاربر با شناسه {pk}")
+            logger.info("شروع فرایند حذف کاربر با شناسه %s", pk)
             
             # مرحله 0: بررسی وجود کاربر
-            user = _make_request('GET', f"/rest/v1/users?uid=eq.{pk}")
+            user = _cached_rows('users', pk)
             if not user or (isinstance(user, list) and len(user) == 0):
-                logger.warning(f"کاربر با شناسه {pk} یافت نشد")
+                logger.warning("کاربر با شناسه %s یافت نشد", pk)
                 return Response(
                     {"detail": "User not found"},
                     status=status.HTTP_404_NOT_FOUND
@@ -867,54 +1121,61 @@ class UserViewSet(viewsets.ModelViewSet):
             # نگهداری داده‌های اصلی برای بازگشت در صورت خطا
             original_user = user.copy()
             
-            # مرحله 1: حذف کاربر از لیست کاربران مجاز تمام کانال‌ها
-            try:
-                # دریافت تمامی کانال‌ها
-                channels = _make_request('GET', f"/rest/v1/channels")
-                
-                if channels and isinstance(channels, list):
-                    for channel in channels:
-                        channel_id = channel.get('uid')
-                        allowed_users = channel.get('allowed_users', [])
-                        
-                        # اگر کاربر در لیست کاربران مجاز کانال وجود دارد، آن را حذف کن
-                        if pk in allowed_users:
-                            allowed_users.remove(pk)
-                            _make_request('PATCH', f"/rest/v1/channels?uid=eq.{channel_id}", {'allowed_users': allowed_users})
-                            logger.info(f"کاربر {pk} از لیست کاربران مجاز کانال {channel_id} حذف شد")
-            except Exception as e:
-                logger.error(f"خطا در حذف کاربر از لیست کاربران مجاز کانال‌ها: {e}")
-                # ادامه اجرا، زیرا این مرحله نباید کل فرآیند را متوقف کند
+            # مراحل 1 و 2 به هم وابسته نیستند و همزمان ارسال می‌شوند
+            # با صف کارهای پس‌زمینه، مرحله 1 پس از حذف سطر users به صف سپرده می‌شود
+            background_cleanup = job_queue.is_enabled()
+            delete_calls = {'users': lambda: get_repository().delete('users', pk)}
+            if not background_cleanup:
+                delete_calls['membership'] = lambda: get_repository().delete_memberships('user_uid', pk)
+            deletes = fan_out(delete_calls)
+
+            # مرحله 1: حذف عضویت‌های کاربر با یک دستور DELETE روی ایندکس user_uid
+            # (آرایه allowed_users کانال‌های مربوط توسط trigger به‌روزرسانی می‌شود)
+            if not background_cleanup:
+                try:
+                    if not deletes['membership'].get():
+                        logger.error("خطا در حذف عضویت‌های کاربر %s", pk)
+                    else:
+                        logger.info("عضویت‌های کاربر %s حذف شدند", pk)
+                except Exception as e:
+                    logger.error("خطا در حذف کاربر از لیست کاربران مجاز کانال‌ها: %s", e)
+                    # ادامه اجرا، زیرا این مرحله نباید کل فرآیند را متوقف کند
             
             # مرحله 2: حذف کاربر از جدول users
             users_deleted = False
             try:
-                logger.info(f"تلاش برای حذف کاربر {pk} از جدول users")
-                users_response = _make_request('DELETE', f"/rest/v1/users?uid=eq.{pk}")
-
-                if users_response is None:
+                logger.info("تلاش برای حذف کاربر %s از جدول users", pk)
+                if not deletes['users'].get():
                     # بررسی آیا کاربر واقعاً حذف شده است
-                    check_user = _make_request('GET', f"/rest/v1/users?uid=eq.{pk}")
+                    check_user = get_repository().get_rows('users', pk)
                     if check_user is None or (isinstance(check_user, list) and len(check_user) == 0):
                         users_deleted = True
-                        logger.info(f"کاربر {pk} با موفقیت از جدول users حذف شد")
+                        logger.info("کاربر %s با موفقیت از جدول users حذف شد", pk)
                     else:
-                        logger.error(f"خطا در حذف کاربر {pk} از جدول users - کاربر همچنان وجود دارد")
+                        logger.error("خطا در حذف کاربر %s از جدول users - کاربر همچنان وجود دارد", pk)
                         return Response(
                             {"detail": "خطا در حذف کاربر از جدول users"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR
                         )
                 else:
                     users_deleted = True
-                    logger.info(f"کاربر {pk} با موفقیت از جدول users حذف شد")
+                    logger.info("کاربر %s با موفقیت از جدول users حذف شد", pk)
                 
             except Exception as users_err:
-                logger.error(f"خطا در حذف کاربر {pk} از جدول users: {users_err}")
+                logger.error("خطا در حذف کاربر %s از جدول users: %s", pk, users_err)
+                
+            # آزاد کردن جای کاربر در سهمیه سوپر ادمین صاحب کاربر (نه درخواست‌دهنده) پس از حذف سطر users
+            quota_owner = quota.row_owner(original_user)
+            if not quota_owner:
+                logger.warning("صاحب سهمیه کاربر %s ثبت نشده است؛ سهمیه‌ای آزاد نمی‌شود", pk)
+            quota_released = users_deleted
+            if users_deleted:
+                quota.release(quota_owner)
                 
             # مرحله 3: حذف کاربر از Supabase Auth (اول Auth حذف می‌کنیم، سپس جدول users)
             auth_deleted = False
             try:
-                logger.info(f"تلاش برای حذف کاربر {pk} از Auth")
+                logger.info("تلاش برای حذف کاربر %s از Auth", pk)
                 auth_response = _make_request('DELETE', f"/auth/v1/admin/users/{pk}")
                 
                 # بررسی نتیجه حذف در Auth
@@ -926,25 +1187,25 @@ class UserViewSet(viewsets.ModelViewSet):
                         isinstance(auth_check, dict) and ('error_code' in auth_check or 'code' in auth_check)
                     ):
                         # کاربر در Auth وجود ندارد، عملیات حذف موفق بوده است
-                        logger.info(f"کاربر {pk} در Auth یافت نشد، احتمالاً حذف شده")
+                        logger.info("کاربر %s در Auth یافت نشد، احتمالاً حذف شده", pk)
                         auth_deleted = True
                     else:
-                        logger.error(f"خطا در حذف کاربر {pk} از Auth - کاربر همچنان وجود دارد")
+                        logger.error("خطا در حذف کاربر %s از Auth - کاربر همچنان وجود دارد", pk)
                         return Response(
                             {"detail": "خطا در حذف کاربر از Auth"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR
                         )
                 else:
                     auth_deleted = True
-                    logger.info(f"کاربر {pk} با موفقیت از Auth حذف شد")
+                    logger.info("کاربر %s با موفقیت از Auth حذف شد", pk)
             
             except Exception as auth_err:
                 error_msg = str(auth_err)
-                logger.error(f"خطا در حذف کاربر {pk} از Auth: {error_msg}")
+                logger.error("خطا در حذف کاربر %s از Auth: %s", pk, error_msg)
                 
                 # اگر خطا مربوط به 'Database error loading user' یا 'not_found' باشد، احتمالاً کاربر قبلاً از Auth حذف شده است
                 if "Database error loading user" in error_msg or "not_found" in error_msg or "unexpected_failure" in error_msg:
-                    logger.info(f"کاربر {pk} احتمالاً قبلاً از Auth حذف شده، ادامه عملیات...")
+                    logger.info("کاربر %s احتمالاً قبلاً از Auth حذف شده، ادامه عملیات...", pk)
                     auth_deleted = True
                 else:
                     # برای سایر خطاها، فرآیند را متوقف می‌کنیم
@@ -953,31 +1214,28 @@ class UserViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
             
-            # مرحله 4: حذف کاربر از جدول users
-            users_deleted = False
-            if auth_deleted:
+            # مرحله 4: تلاش دوباره برای حذف کاربر از جدول users اگر در مرحله 2 حذف نشده باشد
+            if auth_deleted and not users_deleted:
                 try:
-                    logger.info(f"تلاش برای حذف کاربر {pk} از جدول users")
-                    users_response = _make_request('DELETE', f"/rest/v1/users?uid=eq.{pk}")
-
-                    if users_response is None:
+                    logger.info("تلاش برای حذف کاربر %s از جدول users", pk)
+                    if not get_repository().delete('users', pk):
                         # بررسی آیا کاربر واقعاً حذف شده است
-                        check_user = _make_request('GET', f"/rest/v1/users?uid=eq.{pk}")
+                        check_user = get_repository().get_rows('users', pk)
                         if check_user is None or (isinstance(check_user, list) and len(check_user) == 0):
                             users_deleted = True
-                            logger.info(f"کاربر {pk} با موفقیت از جدول users حذف شد")
+                            logger.info("کاربر %s با موفقیت از جدول users حذف شد", pk)
                         else:
-                            logger.error(f"خطا در حذف کاربر {pk} از جدول users - کاربر همچنان وجود دارد")
+                            logger.error("خطا در حذف کاربر %s از جدول users - کاربر همچنان وجود دارد", pk)
                             return Response(
                                 {"detail": "خطا در حذف کاربر از جدول users"},
                                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
                             )
                     else:
                         users_deleted = True
-                        logger.info(f"کاربر {pk} با موفقیت از جدول users حذف شد")
+                        logger.info("کاربر %s با موفقیت از جدول users حذف شد", pk)
                 
                 except Exception as users_err:
-                    logger.error(f"خطا در حذف کاربر {pk} از جدول users: {users_err}")
+                    logger.error("خطا در حذف کاربر %s از جدول users: %s", pk, users_err)
                     
                     # اگر از Auth حذف شده اما از جدول users حذف نشده، یک پیام هشدار برگردان
                     if auth_deleted:
@@ -991,7 +1249,19 @@ class UserViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR
                         )
             
+            # سطر users در مرحله 4 حذف شد
+            if users_deleted and not quota_released:
+                quota.release(quota_owner)
+            
             # مرحله 5: برگرداندن پاسخ نهایی
+            if users_deleted and auth_deleted and background_cleanup:
+                job = tasks.enqueue_membership_job(
+                    'console.delete_memberships', f"user-destroy:{pk}", column='user_uid', value=str(pk),
+                )
+                return Response(
+                    {"detail": f"کاربر {pk} حذف شد؛ پاک‌سازی عضویت‌ها در صف است", **tasks.job_response(job)},
+                    status=status.HTTP_202_ACCEPTED
+                )
             if users_deleted and auth_deleted:
                 return Response(
                     {"detail": f"کاربر {pk} با موفقیت حذف شد"},
@@ -1009,7 +1279,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 )
                 
         except Exception as e:
-            logger.error(f"خطا در حذف کاربر از Supabase: {e}")
+            logger.error("خطا در حذف کاربر از Supabase: %s", e)
             logger.error(traceback.format_exc())
             return Response(
                 {"detail": str(e)},
@@ -1055,21 +1325,15 @@ def login_view(request):
     username = request.data.get('username')
     password = request.data.get('password')
 
-    try:
-        admin_obj = SuperAdmin.objects.using('supabase').get(admin_super_user=username)
-        if check_password(password, admin_obj.admin_super_password):
-            django_user, created = DjangoUser.objects.get_or_create(username=username)
-            if created:
-                django_user.set_password(password)
-                django_user.save()
-            login(request, django_user)
-            response = Response({'success': True})
-            if 'HTTP_ORIGIN' in request.META:
-                response['Access-Control-Allow-Origin'] = request.META['HTTP_ORIGIN']
-                response['Access-Control-Allow-Credentials'] = 'true'
-            return response
-    except SuperAdmin.DoesNotExist:
-        pass
+    # رمز فقط یک بار hash می‌شود؛ نگاشت سوپر ادمین به کاربر Django در cache نگه داشته می‌شود (console/login.py)
+    django_user = authenticate_super_admin(username, password)
+    if django_user is not None:
+        login(request, django_user)
+        response = Response({'success': True})
+        if 'HTTP_ORIGIN' in request.META:
+            response['Access-Control-Allow-Origin'] = request.META['HTTP_ORIGIN']
+            response['Access-Control-Allow-Credentials'] = 'true'
+        return response
 
     return Response({'error': 'نام کاربری یا رمز عبور سوپر ادمین اشتباه است.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1133,3 +1397,17 @@ def user_view(request):
         response['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def metrics_view(request):
+    """
+    آمار داخلی worker فعلی (استخر اتصال HTTP به Supabase، اتصال‌های پایگاه داده، cache سطرها و صف کارها)
+    """
+    return Response({
+        'http_pool': transport.pool_stats(),
+        'database': db_pool.pool_stats(),
+        'row_cache': get_row_cache().stats(),
+        'repository': get_repository().stats(),
+        'jobs': {'enabled': job_queue.is_enabled(), 'counts': job_queue.stats()},
+    })
@@ -7,4 +7,12 @@ set -e
 python manage.py migrate --noinput
 
 # اجرای سرور Django
-exec gunicorn admin_panel.wsgi:application --bind 0.0.0.0:8010 --workers 3
+# خروجی‌های stream طولانی (/api/*/export/) به جای timeout سراسری بالاتر روی workerهای gthread/uvicorn اجرا می‌شوند:
+# در این workerها timeout فقط heartbeat خود worker است و یک خروجی طولانی فقط یک thread (یا هیچ thread در asgi) را نگه می‌دارد
+# SERVER_MODE=asgi: workerهای uvicorn با ویوهای async کانال‌ها و کاربران
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    export CONSOLE_ASYNC_VIEWS="${CONSOLE_ASYNC_VIEWS:-True}"
+    exec gunicorn admin_panel.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:8010 --workers "${GUNICORN_WORKERS:-3}" --timeout "${GUNICORN_TIMEOUT:-30}"
+fi
+
+exec gunicorn admin_panel.wsgi:application -k gthread --threads "${GUNICORN_THREADS:-4}" --bind 0.0.0.0:8010 --workers "${GUNICORN_WORKERS:-3}" --timeout "${GUNICORN_TIMEOUT:-30}"
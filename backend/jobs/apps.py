@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
+    verbose_name = "Background jobs"
+
+    def ready(self):
+        """ثبت handlerهای کار از ماژول tasks هر اپلیکیشن (مثلاً console/tasks.py)"""
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
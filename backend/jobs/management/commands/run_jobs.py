@@ -0,0 +1,48 @@
+"""
+jobs/management/commands/run_jobs.py
+Worker for the background job queue: python manage.py run_jobs [--once] [--batch N] [--poll-interval S]
+Claims due jobs from the 'default' database, runs them and sleeps while the queue is empty.
+"""
+
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="run the jobs that are due now and exit")
+        parser.add_argument('--batch', type=int, default=10, help="jobs claimed per poll")
+        parser.add_argument('--poll-interval', type=float, default=None, help="seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        poll_interval = options['poll_interval'] or queue.job_settings()['POLL_INTERVAL']
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f"worker {worker_id} شروع به کار کرد")
+        processed = 0
+        while not self._stopping:
+            # اتصال‌های قدیمی یا قطع شده بین دورها بسته می‌شوند (مانند پایان یک درخواست HTTP)
+            close_old_connections()
+            count = queue.run_pending(worker_id, options['batch'])
+            processed += count
+            if options['once'] and count < options['batch']:
+                break
+            if not count:
+                time.sleep(poll_interval)
+        self.stdout.write(f"worker {worker_id} متوقف شد؛ {processed} کار اجرا شد")
+
+    def _stop(self, signum, frame):
+        # کار در حال اجرا تمام می‌شود و سپس حلقه متوقف می‌شود
+        self._stopping = True
@@ -0,0 +1,57 @@
+"""
+jobs/models.py
+Defines the background job queue stored on the 'default' database alias:
+- Job: one unit of work (kind + JSON payload) with status, attempt count, retry schedule,
+  worker lock and result/error; idempotency_key makes enqueueing the same work twice
+  return the existing job.
+"""
+
+import uuid
+
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Background job:
+    - kind: name of the registered handler (jobs.queue.register)
+    - payload: keyword arguments passed to the handler
+    - status: queued -> running -> succeeded / failed (queued again between retries)
+    - attempts / max_attempts: executions so far and the retry limit
+    - run_after: earliest time the job may be claimed (retry backoff)
+    - locked_by / locked_at: worker that claimed the job and when
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'jobs_job'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='jobs_job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.id} ({self.status})"
@@ -0,0 +1,180 @@
+"""
+jobs/queue.py
+Database-backed job queue (jobs.models.Job on the 'default' alias):
+- register: decorator that registers a handler for a job kind (handlers live in <app>/tasks.py
+  and are discovered by JobsConfig.ready).
+- enqueue: adds a job; with an idempotency_key the existing job for that key is returned.
+- claim: atomically takes due jobs for a worker with a conditional UPDATE per job, so two
+  workers can never run the same job (no SELECT ... FOR UPDATE needed, works on SQLite too).
+- run_job / run_pending: executes claimed jobs; failures are retried with exponential
+  backoff (settings.JOBS['RETRY_DELAY'] * 2^(attempts-1)) until max_attempts is reached.
+- is_enabled / stats / job_status: settings toggle, per-status counts and the public job view.
+
+Jobs whose worker died are claimed again once settings.JOBS['LOCK_TIMEOUT'] has passed, so
+handlers must be idempotent (the console membership handlers are: inserts ignore duplicates
+and deletes of missing rows are no-ops).
+"""
+
+import datetime
+import logging
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_SETTINGS = {
+    'ENABLED': False,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 5.0,
+    'LOCK_TIMEOUT': 300.0,
+    'POLL_INTERVAL': 1.0,
+}
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+
+
+class UnknownJobKind(Exception):
+    pass
+
+
+def job_settings() -> Dict[str, Any]:
+    return {**DEFAULT_JOBS_SETTINGS, **getattr(settings, 'JOBS', {})}
+
+
+def is_enabled() -> bool:
+    """آیا تغییرات سنگین عضویت به صف کارهای پس‌زمینه سپرده می‌شوند"""
+    return bool(job_settings()['ENABLED'])
+
+
+def register(kind: str):
+    """ثبت handler برای یک نوع کار؛ payload کار به صورت آرگومان‌های keyword به handler داده می‌شود"""
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def get_handler(kind: str) -> Callable[..., Any]:
+    try:
+        return _handlers[kind]
+    except KeyError:
+        raise UnknownJobKind(f"handler برای نوع کار {kind} ثبت نشده است")
+
+
+def enqueue(kind: str, payload: Optional[Dict[str, Any]] = None, idempotency_key: Optional[str] = None,
+            max_attempts: Optional[int] = None, delay: float = 0) -> Tuple[Job, bool]:
+    """
+    افزودن کار به صف
+    خروجی: (کار، ساخته شد)؛ اگر کاری با همین idempotency_key وجود داشته باشد همان کار برگردانده می‌شود
+    """
+    get_handler(kind)
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts or job_settings()['MAX_ATTEMPTS'],
+        run_after=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+    if idempotency_key is None:
+        job.save()
+        return job, True
+    try:
+        with transaction.atomic(using='default'):
+            job.save()
+        return job, True
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key), False
+
+
+def claim(worker_id: str, limit: int = 10) -> List[Job]:
+    """
+    برداشتن حداکثر limit کار آماده برای این worker
+    هر کار با یک UPDATE شرطی روی وضعیت قبلی آن برداشته می‌شود؛ اگر worker دیگری زودتر آن را برداشته باشد
+    UPDATE هیچ سطری را تغییر نمی‌دهد و کار نادیده گرفته می‌شود
+    """
+    now = timezone.now()
+    stale_before = now - datetime.timedelta(seconds=job_settings()['LOCK_TIMEOUT'])
+    due = Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale_before)
+    candidates = Job.objects.filter(due).order_by('run_after').values_list('id', 'status', 'locked_at')[:limit]
+
+    claimed_ids = []
+    for job_id, job_status, locked_at in candidates:
+        updated = Job.objects.filter(id=job_id, status=job_status, locked_at=locked_at).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed_ids.append(job_id)
+    jobs = {job.id: job for job in Job.objects.filter(id__in=claimed_ids)}
+    return [jobs[job_id] for job_id in claimed_ids if job_id in jobs]
+
+
+def run_job(job: Job) -> Job:
+    """اجرای یک کار برداشته شده و ثبت نتیجه یا زمان‌بندی تلاش دوباره"""
+    try:
+        result = get_handler(job.kind)(**job.payload)
+    except Exception as e:
+        job.last_error = f"{e.__class__.__name__}: {e}"
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts < job.max_attempts and not isinstance(e, UnknownJobKind):
+            delay = job_settings()['RETRY_DELAY'] * (2 ** max(job.attempts - 1, 0))
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + datetime.timedelta(seconds=delay)
+            logger.warning("کار %s ناموفق بود (تلاش %s از %s)، تلاش دوباره پس از %s ثانیه: %s", job, job.attempts, job.max_attempts, delay, e)
+        else:
+            job.status = Job.FAILED
+            logger.error("کار %s پس از %s تلاش ناموفق شد: %s", job, job.attempts, e)
+            logger.error(traceback.format_exc())
+        job.save(update_fields=['status', 'run_after', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+        return job
+
+    job.status = Job.SUCCEEDED
+    job.result = result if isinstance(result, (dict, list, str, int, float, bool)) or result is None else str(result)
+    job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'result', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    logger.info("کار %s با موفقیت انجام شد", job)
+    return job
+
+
+def run_pending(worker_id: str, limit: int = 10) -> int:
+    """برداشتن و اجرای کارهای آماده؛ خروجی تعداد کارهای اجرا شده"""
+    jobs = claim(worker_id, limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def job_status(job: Job) -> Dict[str, Any]:
+    """نمایش عمومی وضعیت کار (بدون payload)"""
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.last_error or None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def stats() -> Dict[str, int]:
+    """تعداد کارها در هر وضعیت"""
+    counts = {choice: 0 for choice, _ in Job.STATUS_CHOICES}
+    for row in Job.objects.values('status').annotate(total=Count('id')):
+        counts[row['status']] = row['total']
+    return counts
@@ -0,0 +1,89 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.register('tests.record')
+def record(value, fail_times=0):
+    calls.append(value)
+    if len(calls) <= fail_times:
+        raise RuntimeError("upstream error")
+    return {'value': value}
+
+
+@override_settings(JOBS={'ENABLED': True, 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 0, 'LOCK_TIMEOUT': 60})
+class JobQueueTestCase(TestCase):
+    """آزمون صف کارهای پس‌زمینه"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_is_idempotent(self):
+        first, created = queue.enqueue('tests.record', {'value': 1}, idempotency_key='key-1')
+        second, created_again = queue.enqueue('tests.record', {'value': 2}, idempotency_key='key-1')
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+        with self.assertRaises(queue.UnknownJobKind):
+            queue.enqueue('tests.unknown')
+
+    def test_claim_is_exclusive(self):
+        queue.enqueue('tests.record', {'value': 1})
+
+        self.assertEqual(len(queue.claim('worker-a')), 1)
+        self.assertEqual(queue.claim('worker-b'), [])
+
+        # پس از LOCK_TIMEOUT کار worker از کار افتاده دوباره برداشته می‌شود
+        Job.objects.update(locked_at=timezone.now() - datetime.timedelta(seconds=120))
+        self.assertEqual([job.locked_by for job in queue.claim('worker-b')], ['worker-b'])
+
+    def test_failures_are_retried_until_max_attempts(self):
+        job, _ = queue.enqueue('tests.record', {'value': 1, 'fail_times': 1})
+
+        self.assertEqual(queue.run_pending('worker'), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('upstream error', job.last_error)
+
+        self.assertEqual(queue.run_pending('worker'), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.SUCCEEDED, 2, {'value': 1}))
+
+        failing, _ = queue.enqueue('tests.record', {'value': 2, 'fail_times': 10})
+        queue.run_pending('worker')
+        queue.run_pending('worker')
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Job.FAILED, 2))
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_status_endpoint(self):
+        job, _ = queue.enqueue('tests.record', {'value': 1})
+
+        response = self.client.get(reverse('job-status', kwargs={'job_id': job.id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], Job.QUEUED)
+        self.assertNotIn('payload', response.json())
+
+    @patch('console.tasks.get_repository')
+    def test_console_membership_job_retries_on_upstream_error(self, mock_repository):
+        mock_repository.return_value.delete_memberships.side_effect = [False, True]
+        job, _ = queue.enqueue('console.delete_memberships', {'column': 'channel_uid', 'value': 'c1'})
+
+        queue.run_pending('worker')
+        queue.run_pending('worker')
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(mock_repository.return_value.delete_memberships.call_count, 2)
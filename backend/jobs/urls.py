@@ -0,0 +1,12 @@
+"""
+jobs/urls.py
+Defines API routes for the jobs app:
+- job_status_view for polling a background job returned by a 202 response
+"""
+from django.urls import path
+
+from .views import job_status_view
+
+urlpatterns = [
+    path('<uuid:job_id>/', job_status_view, name='job-status'),
+]
@@ -0,0 +1,23 @@
+"""
+jobs/views.py
+Status endpoint of background jobs: GET /api/jobs/<uuid>/ returns the job's status,
+attempts, result and last error (the payload is not exposed).
+"""
+
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from . import queue
+from .models import Job
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def job_status_view(request, job_id):
+    """وضعیت یک کار پس‌زمینه (شناسه‌ها uuid تصادفی هستند و در پاسخ 202 برگردانده می‌شوند)"""
+    job = get_object_or_404(Job, id=job_id)
+    return Response(queue.job_status(job), status=status.HTTP_200_OK)